@@ -4,10 +4,15 @@ Punto de entrada principal para el monitor de correos electrónicos
 
 import os
 import sys
-import time
+import email
+import asyncio
 import logging
+import mailbox
 from dotenv import load_dotenv
-from src.core import EmailMonitor
+from src.core import EmailMonitor, MultiAccountMonitor
+from src.core.model_registry import load_registry
+from src.core.model_store import ModelStore
+from src.core.user_rules import benchmark_rules
 
 # Configurar logging avanzado
 from src.core import setup_logging, EmailMonitorLogger
@@ -23,12 +28,21 @@ def load_config() -> dict:
     load_dotenv()
 
     required_vars = {
+        "TELEGRAM_TOKEN": os.getenv("TELEGRAM_TOKEN"),
+        "TELEGRAM_CHAT_ID": os.getenv("TELEGRAM_CHAT_ID"),
+    }
+
+    # Con ACCOUNTS_FILE las cuentas IMAP se definen en el fichero
+    accounts_file = os.getenv("ACCOUNTS_FILE", "")
+    imap_vars = {
         "IMAP_SERVER": os.getenv("IMAP_SERVER"),
         "MAIL": os.getenv("MAIL"),
         "PASS": os.getenv("PASS"),
-        "TELEGRAM_TOKEN": os.getenv("TELEGRAM_TOKEN"),
-        "TELEGRAM_CHAT_ID": os.getenv("TELEGRAM_CHAT_ID"),
     }
+    if accounts_file:
+        required_vars.update({k: v or "" for k, v in imap_vars.items()})
+    else:
+        required_vars = {**imap_vars, **required_vars}
 
     # Verificar variables requeridas
     missing_vars = [key for key, value in required_vars.items() if not value]
@@ -45,7 +59,70 @@ def load_config() -> dict:
             "LABEL_CANDIDATES": os.getenv(
                 "LABEL_CANDIDATES", "Urgente,Importante,Otros"
             ),
+            "NOTIFY_KEYWORDS": os.getenv(
+                "NOTIFY_KEYWORDS", "urgente,problema,factura,fallo,error grave"
+            ),
+            "URGENT_KEYWORDS": os.getenv(
+                "URGENT_KEYWORDS",
+                "urgente,emergency,critical,critico,inmediato,importante",
+            ),
+            "IMPORTANT_KEYWORDS": os.getenv(
+                "IMPORTANT_KEYWORDS",
+                "factura,invoice,payment,pago,vencimiento,deadline",
+            ),
+            "CLASSIFIER_MODEL": os.getenv("CLASSIFIER_MODEL", "bart-large-mnli"),
+            "MODEL_REGISTRY_FILE": os.getenv("MODEL_REGISTRY_FILE", ""),
+            "MODEL_DIR": os.getenv("MODEL_DIR", "models/hf"),
+            "MODEL_OFFLINE": os.getenv("MODEL_OFFLINE", "false"),
+            "CLASSIFIER_LATENCY_BUDGET_MS": os.getenv(
+                "CLASSIFIER_LATENCY_BUDGET_MS", "0"
+            ),
+            "CLASSIFIER_DOWNGRADE_BACKLOG": os.getenv(
+                "CLASSIFIER_DOWNGRADE_BACKLOG", "0"
+            ),
+            "CLASSIFIER_BACKEND": os.getenv("CLASSIFIER_BACKEND", "torch"),
+            "CLASSIFIER_THREADS": os.getenv("CLASSIFIER_THREADS", "0"),
+            "ONNX_MODEL_DIR": os.getenv("ONNX_MODEL_DIR", "models/onnx"),
+            "ONNX_QUANTIZATION": os.getenv("ONNX_QUANTIZATION", "auto"),
             "DAILY_SUMMARY_TIME": os.getenv("DAILY_SUMMARY_TIME", "21:00"),
+            "SUMMARY_FILE": os.getenv("SUMMARY_FILE", "data/daily_summary.db"),
+            "IMAP_IDLE": os.getenv("IMAP_IDLE", "true"),
+            "IDLE_TIMEOUT": os.getenv("IDLE_TIMEOUT", "300"),
+            "CHECK_INTERVAL": os.getenv("CHECK_INTERVAL", "5"),
+            "FETCH_BATCH_SIZE": os.getenv("FETCH_BATCH_SIZE", "200"),
+            "FETCH_MODE": os.getenv("FETCH_MODE", "full"),
+            "BODY_FETCH_BYTES": os.getenv("BODY_FETCH_BYTES", "4096"),
+            "SYNC_MODE": os.getenv("SYNC_MODE", "uid"),
+            "STATE_FILE": os.getenv("STATE_FILE", "data/mailbox_state.json"),
+            "ACCOUNTS_FILE": accounts_file,
+            "IMAP_FOLDERS": os.getenv("IMAP_FOLDERS", "inbox"),
+            "PIPELINE_QUEUE_SIZE": os.getenv("PIPELINE_QUEUE_SIZE", "16"),
+            "PARSE_WORKERS": os.getenv("PARSE_WORKERS", "1"),
+            "CLASSIFY_WORKERS": os.getenv("CLASSIFY_WORKERS", "1"),
+            "CLASSIFY_BATCH_SIZE": os.getenv("CLASSIFY_BATCH_SIZE", "8"),
+            "CLASSIFY_CACHE_SIZE": os.getenv("CLASSIFY_CACHE_SIZE", "10000"),
+            "CLASSIFY_CACHE_FILE": os.getenv("CLASSIFY_CACHE_FILE", ""),
+            "TEXT_TOKEN_BUDGET": os.getenv("TEXT_TOKEN_BUDGET", "256"),
+            "CLASSIFIER_WARMUP": os.getenv("CLASSIFIER_WARMUP", "true"),
+            "CLASSIFIER_LOAD_RETRY": os.getenv("CLASSIFIER_LOAD_RETRY", "60"),
+            "CLASSIFIER_IDLE_UNLOAD": os.getenv("CLASSIFIER_IDLE_UNLOAD", "0"),
+            "CLASSIFIER_MIN_RESIDENCY": os.getenv("CLASSIFIER_MIN_RESIDENCY", "10"),
+            "INFERENCE_WORKERS": os.getenv("INFERENCE_WORKERS", "0"),
+            "INFERENCE_TIMEOUT": os.getenv("INFERENCE_TIMEOUT", "60"),
+            "RULES_FILE": os.getenv("RULES_FILE", ""),
+            "CLASSIFY_TIERS": os.getenv(
+                "CLASSIFY_TIERS", "sender_group,domain,keywords,fallback,model"
+            ),
+            "NOTIFY_WORKERS": os.getenv("NOTIFY_WORKERS", "4"),
+            "TELEGRAM_POOL_SIZE": os.getenv("TELEGRAM_POOL_SIZE", "8"),
+            "TELEGRAM_KEEPALIVE": os.getenv("TELEGRAM_KEEPALIVE", "300"),
+            "TELEGRAM_GLOBAL_RATE": os.getenv("TELEGRAM_GLOBAL_RATE", "30"),
+            "TELEGRAM_CHAT_RATE": os.getenv("TELEGRAM_CHAT_RATE", "60"),
+            "TELEGRAM_GROUP_RATE": os.getenv("TELEGRAM_GROUP_RATE", "20"),
+            "TELEGRAM_MAX_RETRIES": os.getenv("TELEGRAM_MAX_RETRIES", "5"),
+            "TELEGRAM_DIGEST_WINDOW": os.getenv("TELEGRAM_DIGEST_WINDOW", "30"),
+            "TELEGRAM_DIGEST_MAX": os.getenv("TELEGRAM_DIGEST_MAX", "20"),
+            "TELEGRAM_DIGEST_KEY": os.getenv("TELEGRAM_DIGEST_KEY", "sender"),
         }
     )
 
@@ -55,14 +132,15 @@ def load_config() -> dict:
 def main():
     """Función principal del programa"""
     logger = EmailMonitorLogger(__name__)
+    monitor = None
 
     try:
         # Cargar configuración
         config = load_config()
         logger.success("Configuración cargada correctamente")
 
-        # Crear monitor de emails
-        monitor = EmailMonitor(config)
+        # Crear monitor de emails (una o varias cuentas en un solo proceso)
+        monitor = MultiAccountMonitor(config)
         logger.success("Monitor de emails inicializado")
 
         # Mostrar información de configuración
@@ -71,8 +149,11 @@ def main():
             for d in config.get("NOTIFY_DOMAINS", "").split(",")
             if d.strip()
         ]
-        logger.info(f"Monitoreando: {config['MAIL']}")
-        logger.info(f"Servidor IMAP: {config['IMAP_SERVER']}")
+        for account in monitor.accounts:
+            logger.info(
+                f"Monitoreando: {account.mail} ({account.imap_server}) "
+                f"carpetas: {account.folders}"
+            )
         logger.info(f"Dominios de notificación: {notify_domains}")
         logger.info(
             f"Grupos configurados: {list(monitor.sender_groups.get_groups().keys())}"
@@ -82,30 +163,34 @@ def main():
         # Iniciar scheduler del resumen diario
         monitor.start_daily_summary_scheduler()
 
-        # Loop principal
+        # Loop principal: cada buzón usa IDLE si el servidor lo soporta y
+        # polling cada CHECK_INTERVAL si no
         logger.info("Iniciando monitor de correos... Presiona Ctrl+C para detener.")
-
-        while True:
-            monitor.check_emails()
-            time.sleep(5)  # Esperar 5 segundos entre verificaciones
+        asyncio.run(monitor.run())
 
     except KeyboardInterrupt:
         logger.info("Monitor detenido por el usuario.")
     except Exception as e:
         logger.error(f"Error fatal: {e}")
         sys.exit(1)
+    finally:
+        if monitor is not None:
+            monitor.close()
 
 
 def test_telegram():
     """Prueba la conexión a Telegram"""
     logger = EmailMonitorLogger(__name__)
+    monitor = None
 
     try:
         config = load_config()
         monitor = EmailMonitor(config)
 
         logger.info("Probando conexión a Telegram...")
-        success = monitor.test_telegram_connection()
+        success = monitor.telegram_notifier.run_sync(
+            monitor.test_telegram_connection()
+        )
 
         if success:
             logger.success("Conexión a Telegram exitosa")
@@ -114,6 +199,9 @@ def test_telegram():
 
     except Exception as e:
         logger.error(f"Error en prueba de Telegram: {e}")
+    finally:
+        if monitor is not None:
+            monitor.close()
 
 
 def test_classification():
@@ -152,6 +240,7 @@ def test_classification():
 def send_manual_summary():
     """Envía manualmente el resumen diario actual"""
     logger = EmailMonitorLogger(__name__)
+    monitor = None
 
     try:
         config = load_config()
@@ -163,6 +252,64 @@ def send_manual_summary():
 
     except Exception as e:
         logger.error(f"Error enviando resumen diario: {e}")
+    finally:
+        if monitor is not None:
+            monitor.close()
+
+
+def download_model(model: str = ""):
+    """Descarga el modelo a MODEL_DIR para arrancar sin conexión"""
+    logger = EmailMonitorLogger(__name__)
+    load_dotenv()
+
+    try:
+        # No necesita la configuración de IMAP ni de Telegram (p. ej. en docker build)
+        registry = load_registry(os.getenv("MODEL_REGISTRY_FILE") or None)
+        spec = registry.get(model or os.getenv("CLASSIFIER_MODEL", "bart-large-mnli"))
+        path = ModelStore(os.getenv("MODEL_DIR", "models/hf")).download(spec.model_id)
+        logger.success(f"Modelo {spec.name} listo en {path}")
+    except Exception as e:
+        logger.error(f"Error descargando el modelo: {e}")
+        sys.exit(1)
+
+
+def load_corpus(path: str) -> list:
+    """Lee un buzón mbox o un directorio de ficheros .eml como EmailMessage"""
+    if os.path.isdir(path):
+        raws = []
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(".eml"):
+                with open(os.path.join(path, name), "rb") as f:
+                    raws.append(f.read())
+    else:
+        box = mailbox.mbox(path, create=False)
+        raws = [box.get_bytes(key) for key in box.keys()]
+    return [
+        EmailMonitor.parse_email(email.message_from_bytes(raw), size=len(raw))
+        for raw in raws
+    ]
+
+
+def benchmark_rules_file(rules_file: str, corpus: str):
+    """Mide la evaluación de un fichero de reglas contra un corpus de correos"""
+    logger = EmailMonitorLogger(__name__)
+
+    try:
+        messages = load_corpus(corpus)
+        result = benchmark_rules(rules_file, messages)
+        logger.info(
+            f"{result.rules} reglas compiladas en {result.compile_ms:.1f} ms; "
+            f"{result.messages} correos de {corpus}"
+        )
+        logger.info(
+            f"Por correo: p50 {result.p50_us:.1f} µs | p99 {result.p99_us:.1f} µs "
+            f"| máx {result.max_us:.1f} µs"
+        )
+        for name, count in result.matches.most_common():
+            logger.info(f"  {name or 'Sin regla'}: {count} correos")
+    except Exception as e:
+        logger.error(f"Error evaluando las reglas: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -175,9 +322,19 @@ if __name__ == "__main__":
             test_classification()
         elif command == "send_summary":
             send_manual_summary()
+        elif command == "download_model":
+            download_model(sys.argv[2] if len(sys.argv) > 2 else "")
+        elif command == "benchmark_rules":
+            if len(sys.argv) < 4:
+                print("Uso: python main.py benchmark_rules <reglas.json> <mbox|dir_eml>")
+                sys.exit(1)
+            benchmark_rules_file(sys.argv[2], sys.argv[3])
         else:
             print(f"Comando desconocido: {command}")
-            print("Comandos disponibles: test_telegram, test_classify, send_summary")
+            print(
+                "Comandos disponibles: test_telegram, test_classify, send_summary, "
+                "download_model, benchmark_rules"
+            )
             sys.exit(1)
     else:
         main()
@@ -4,5 +4,12 @@ Core del sistema - Funcionalidad principal del monitor de correos
 
 from .email_monitor import EmailMonitor, EmailMessage
 from .logging_config import setup_logging, EmailMonitorLogger
+from .multi_account import MultiAccountMonitor
 
-__all__ = ["EmailMonitor", "EmailMessage", "setup_logging", "EmailMonitorLogger"]
+__all__ = [
+    "EmailMonitor",
+    "EmailMessage",
+    "MultiAccountMonitor",
+    "setup_logging",
+    "EmailMonitorLogger",
+]
@@ -0,0 +1,159 @@
+"""
+Caché de clasificaciones por contenido con LRU en memoria y persistencia opcional
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+_DIGITS = re.compile(r"\d+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza un texto para que correos de la misma plantilla coincidan
+
+    Ignora mayúsculas, espacios repetidos y cifras (números de factura,
+    fechas, contadores de alertas...).
+    """
+    text = _DIGITS.sub("0", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+@dataclass
+class CacheStats:
+    """Aciertos, fallos y tiempo de inferencia ahorrado"""
+
+    hits: int = 0
+    misses: int = 0
+    time_saved: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ClassificationCache:
+    """
+    Caché de etiquetas por hash del contenido normalizado
+
+    La clave incluye el modelo, las etiquetas candidatas y el umbral, así que
+    cambiar cualquiera de ellos invalida las entradas anteriores. En memoria se
+    guardan como máximo ``max_entries`` entradas (LRU); con ``path`` las
+    entradas se guardan además en SQLite y sobreviven a los reinicios.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        path: Optional[str] = None,
+        namespace: str = "",
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.path = path or None
+        self.namespace = namespace
+        self.stats = CacheStats()
+        self.logger = logging.getLogger(__name__)
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path:
+            self._db = self._open_db()
+
+    def _open_db(self) -> Optional[sqlite3.Connection]:
+        """Abre (o crea) la base de datos de la caché"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS classifications ("
+                "key TEXT PRIMARY KEY, label TEXT NOT NULL, "
+                "seconds REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            self.logger.warning(f"No se pudo abrir la caché {self.path}: {e}")
+            return None
+
+    def key(self, subject: str, body: str, variant: str = "") -> str:
+        """Clave de caché de un correo (``variant`` distingue p. ej. el umbral)"""
+        digest = hashlib.sha256()
+        digest.update(f"{self.namespace}\0{variant}\0".encode("utf-8"))
+        digest.update(normalize_text(f"{subject}\n{body}").encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Devuelve la etiqueta guardada o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                entry = self._load(key)
+                if entry is not None:
+                    self._remember(key, entry)
+
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            self.stats.time_saved += entry[1]
+            return entry[0]
+
+    def put(self, key: str, label: str, seconds: float) -> None:
+        """Guarda una etiqueta y el tiempo de inferencia que costó obtenerla"""
+        self.put_many([(key, label, seconds)])
+
+    def put_many(self, entries: Iterable[Tuple[str, str, float]]) -> None:
+        """Guarda varias etiquetas con una sola escritura en disco"""
+        entries = list(entries)
+        with self._lock:
+            for key, label, seconds in entries:
+                self._remember(key, (label, seconds))
+            if self._db is not None and entries:
+                now = time.time()
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO classifications VALUES (?, ?, ?, ?)",
+                        [(key, label, seconds, now) for key, label, seconds in entries],
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self.logger.warning(f"No se pudo guardar en la caché: {e}")
+
+    def _remember(self, key: str, entry: Tuple[str, float]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Tuple[str, float]]:
+        try:
+            row = self._db.execute(
+                "SELECT label, seconds FROM classifications WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning(f"No se pudo leer la caché: {e}")
+            return None
+        return (row[0], float(row[1])) if row else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,151 @@
+"""
+Clasificación en cascada: reglas deterministas primero y modelo solo si hace falta
+"""
+
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .keyword_rules import KeywordMatcher
+
+# Niveles disponibles, en el orden por defecto
+TIERS = ("sender_group", "domain", "keywords", "fallback", "model")
+
+# Motivo legible de cada nivel para los logs
+TIER_REASONS = {
+    "sender_group": "Grupo",
+    "domain": "Dominio",
+    "keywords": "Palabras clave",
+    "fallback": "Reglas",
+    "model": "IA",
+    "default": "Sin coincidencias",
+}
+
+
+@dataclass
+class Classification:
+    """Resultado de clasificar un correo y nivel de la cascada que lo decidió"""
+
+    label: str
+    sender_group: str = "Otros"
+    tier: str = "model"
+    # Regla concreta que decidió en los niveles de reglas (p. ej. ``domain:banco.com``)
+    rule: Optional[str] = None
+
+
+def parse_tiers(value: str) -> List[str]:
+    """Lee la lista de niveles de la configuración (p. ej. ``domain,model``)"""
+    tiers = [t.strip().lower() for t in (value or "").split(",") if t.strip()]
+    unknown = [t for t in tiers if t not in TIERS]
+    if unknown:
+        raise ValueError(
+            f"Niveles de clasificación desconocidos: {', '.join(unknown)} "
+            f"(opciones: {', '.join(TIERS)})"
+        )
+    return tiers or ["model"]
+
+
+class ClassificationCascade:
+    """
+    Decide la etiqueta de cada correo con el nivel más barato posible
+
+    Los niveles se evalúan en el orden configurado:
+
+    - ``sender_group``: el remitente pertenece a un grupo de ``SenderGroupManager``
+    - ``domain``: el dominio del remitente está en ``NOTIFY_DOMAINS``
+    - ``keywords``: el asunto o el cuerpo contienen una palabra clave del monitor
+    - ``fallback``: las reglas de ``EmailClassifier`` dan una etiqueta segura
+    - ``model``: el resto se clasifica con el modelo, en un único lote
+
+    En los niveles de reglas la etiqueta es la de las reglas del clasificador
+    (u ``Otros``); la notificación ya está decidida por la propia regla. Sin
+    ``model`` en la lista, lo que no decide ninguna regla queda como ``Otros``.
+    """
+
+    def __init__(
+        self,
+        classifier,
+        sender_groups,
+        notify_domains: Sequence[str] = (),
+        keywords: Sequence[str] = (),
+        tiers: Sequence[str] = TIERS,
+    ):
+        self.classifier = classifier
+        self.sender_groups = sender_groups
+        self.notify_domains = set(notify_domains)
+        self.keywords = KeywordMatcher.from_lists({"notify": list(keywords)})
+        self.tiers = list(tiers)
+        self.counts: Counter = Counter()
+        self.logger = logging.getLogger(__name__)
+
+    def _rule_tier(
+        self, email_msg, sender_group: str
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        Primer nivel de reglas que decide el correo, la regla y la etiqueta
+
+        La etiqueta de las reglas del clasificador se calcula como mucho una
+        vez por correo, y no se calcula si el correo va al modelo.
+        """
+        tier = rule = label = None
+        label_known = False
+        for candidate in self.tiers:
+            if candidate == "sender_group" and sender_group != "Otros":
+                tier, rule = candidate, f"sender_group:{sender_group}"
+            elif candidate == "domain" and email_msg.sender_domain in self.notify_domains:
+                tier, rule = candidate, f"domain:{email_msg.sender_domain}"
+            elif candidate == "keywords":
+                matched = self.keywords.search(email_msg.subject, email_msg.body)
+                if matched:
+                    tier, rule = candidate, matched[0].name
+            elif candidate == "fallback":
+                label = self.classifier.rule_label(email_msg.subject, email_msg.body)
+                label_known = True
+                if label:
+                    tier, rule = candidate, f"label:{label}"
+            if tier is not None:
+                break
+
+        if tier is None and "model" in self.tiers:
+            return None, None, None
+        if not label_known:
+            label = self.classifier.rule_label(email_msg.subject, email_msg.body)
+        return tier, rule, label
+
+    def classify_batch(self, email_msgs: List) -> List[Classification]:
+        """Clasifica un lote; solo los correos ambiguos llegan al modelo"""
+        results: List[Optional[Classification]] = [None] * len(email_msgs)
+        ambiguous: List[int] = []
+
+        for i, email_msg in enumerate(email_msgs):
+            sender_group = self.sender_groups.get_label_for_sender(email_msg.sender)
+            tier, rule, label = self._rule_tier(email_msg, sender_group)
+            if tier is None and "model" in self.tiers:
+                ambiguous.append(i)
+                results[i] = Classification("Otros", sender_group, "model")
+                continue
+            results[i] = Classification(
+                label or "Otros", sender_group, tier or "default", rule
+            )
+
+        if ambiguous:
+            # El modelo recibe el cuerpo original para poder quitar citas y firmas
+            pending = [email_msgs[i] for i in ambiguous]
+            labels = self.classifier.classify_batch(
+                [(msg.subject, msg.raw_body or msg.body) for msg in pending]
+            )
+            for i, label in zip(ambiguous, labels):
+                results[i].label = label
+
+        for result in results:
+            self.counts[result.tier] += 1
+        if email_msgs:
+            self.logger.debug(
+                f"Cascada: {len(ambiguous)}/{len(email_msgs)} correos al modelo"
+            )
+        return results
+
+    def report(self) -> Dict[str, int]:
+        """Correos decididos por cada nivel desde el arranque"""
+        return dict(self.counts)
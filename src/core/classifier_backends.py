@@ -0,0 +1,204 @@
+"""
+Backends de inferencia para el clasificador zero-shot
+
+``torch`` usa el pipeline estándar de transformers. ``onnx`` exporta el modelo
+NLI a ONNX, lo cuantiza a int8 (cuantización dinámica) y lo ejecuta con ONNX
+Runtime en CPU. Ambos devuelven un pipeline ``zero-shot-classification`` con
+el mismo contrato (``labels``/``scores``).
+
+El backend ONNX necesita las dependencias opcionales::
+
+    pip install "optimum[onnxruntime]"
+"""
+
+import os
+import platform
+import re
+import logging
+from typing import Optional
+
+BACKENDS = ("torch", "onnx")
+QUANTIZATION_TARGETS = ("auto", "avx2", "avx512", "avx512_vnni", "arm64", "none")
+
+QUANTIZED_FILE = "model_quantized.onnx"
+
+logger = logging.getLogger(__name__)
+
+
+def onnx_model_dir(base_dir: str, model_name: str, quantization: str) -> str:
+    """Directorio donde se guarda la exportación ONNX de un modelo"""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_name)
+    return os.path.join(base_dir, f"{slug}-{quantization}")
+
+
+def resolve_quantization(quantization: str) -> str:
+    """Elige el juego de instrucciones para la cuantización según la CPU"""
+    quantization = (quantization or "auto").lower()
+    if quantization not in QUANTIZATION_TARGETS:
+        raise ValueError(
+            f"Cuantización ONNX no válida: {quantization} "
+            f"(opciones: {', '.join(QUANTIZATION_TARGETS)})"
+        )
+    if quantization != "auto":
+        return quantization
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    # AVX2 está disponible en prácticamente cualquier CPU x86 de servidor
+    return "avx2"
+
+
+def _session_options(threads: int):
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    if threads > 0:
+        options.intra_op_num_threads = threads
+    # El grafo es secuencial: el paralelismo útil está dentro de cada operador
+    options.inter_op_num_threads = 1
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = (
+        onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    )
+    return options
+
+
+def _export_quantized(model_name: str, target_dir: str, quantization: str) -> str:
+    """Exporta el modelo a ONNX y guarda una copia cuantizada a int8"""
+    from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    logger.info(f"Exportando {model_name} a ONNX en {target_dir}...")
+    model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model.save_pretrained(target_dir)
+    tokenizer.save_pretrained(target_dir)
+
+    if quantization == "none":
+        return "model.onnx"
+
+    factories = {
+        "avx2": AutoQuantizationConfig.avx2,
+        "avx512": AutoQuantizationConfig.avx512,
+        "avx512_vnni": AutoQuantizationConfig.avx512_vnni,
+        "arm64": AutoQuantizationConfig.arm64,
+    }
+    qconfig = factories[quantization](is_static=False, per_channel=False)
+    quantizer = ORTQuantizer.from_pretrained(target_dir)
+    quantizer.quantize(save_dir=target_dir, quantization_config=qconfig)
+    logger.info(f"Modelo cuantizado a int8 ({quantization}) en {target_dir}")
+    return QUANTIZED_FILE
+
+
+def load_onnx_pipeline(
+    model_name: str,
+    base_dir: str = "models/onnx",
+    threads: int = 0,
+    quantization: str = "auto",
+    source: Optional[str] = None,
+):
+    """
+    Crea un pipeline zero-shot sobre ONNX Runtime
+
+    La primera vez exporta y cuantiza el modelo (puede tardar unos minutos);
+    después reutiliza los ficheros de ``base_dir``. ``source`` es la copia
+    local del modelo desde la que exportar, si existe.
+    """
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    quantization = resolve_quantization(quantization)
+    target_dir = onnx_model_dir(base_dir, model_name, quantization)
+    file_name = QUANTIZED_FILE if quantization != "none" else "model.onnx"
+
+    if not os.path.exists(os.path.join(target_dir, file_name)):
+        os.makedirs(target_dir, exist_ok=True)
+        file_name = _export_quantized(source or model_name, target_dir, quantization)
+
+    model = ORTModelForSequenceClassification.from_pretrained(
+        target_dir,
+        file_name=file_name,
+        provider="CPUExecutionProvider",
+        session_options=_session_options(threads),
+    )
+    tokenizer = AutoTokenizer.from_pretrained(target_dir)
+    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+
+class EmbeddingZeroShotPipeline:
+    """
+    Clasificador zero-shot por similitud de embeddings
+
+    Calcula el embedding medio del correo y el de una frase por etiqueta
+    (``hypothesis_template``) y devuelve las etiquetas ordenadas por similitud
+    coseno, normalizada con softmax. Mismo contrato que el pipeline
+    ``zero-shot-classification``; los embeddings de las etiquetas se calculan
+    una sola vez.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        hypothesis_template: str = "Este correo es {}.",
+        temperature: float = 0.05,
+        extractor=None,
+        model_kwargs: Optional[dict] = None,
+    ):
+        if extractor is None:
+            from transformers import pipeline
+
+            extractor = pipeline(
+                "feature-extraction", model=model_id, model_kwargs=model_kwargs or {}
+            )
+        self.extractor = extractor
+        self.hypothesis_template = hypothesis_template
+        self.temperature = temperature
+        self._label_vectors: dict = {}
+
+    def _embed(self, texts, batch_size: int = 8):
+        import numpy as np
+
+        outputs = self.extractor(texts, batch_size=batch_size, truncation=True)
+        vectors = []
+        for output in outputs:
+            # Salida [1][tokens][dim]: media de los tokens y normalización L2
+            tokens = np.asarray(output[0] if len(np.shape(output)) == 3 else output)
+            vector = tokens.mean(axis=0)
+            vectors.append(vector / (np.linalg.norm(vector) or 1.0))
+        return np.stack(vectors)
+
+    def _labels_matrix(self, labels):
+        import numpy as np
+
+        missing = [label for label in labels if label not in self._label_vectors]
+        if missing:
+            vectors = self._embed(
+                [self.hypothesis_template.format(label) for label in missing]
+            )
+            self._label_vectors.update(zip(missing, vectors))
+        return np.stack([self._label_vectors[label] for label in labels])
+
+    def __call__(self, sequences, candidate_labels, batch_size: int = 8, **kwargs):
+        import numpy as np
+
+        single = isinstance(sequences, str)
+        texts = [sequences] if single else list(sequences)
+        labels = list(candidate_labels)
+
+        similarities = self._embed(texts, batch_size) @ self._labels_matrix(labels).T
+        logits = similarities / self.temperature
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+
+        results = []
+        for text, row in zip(texts, probabilities):
+            order = np.argsort(row)[::-1]
+            results.append(
+                {
+                    "sequence": text,
+                    "labels": [labels[i] for i in order],
+                    "scores": [float(row[i]) for i in order],
+                }
+            )
+        return results[0] if single else results
@@ -8,19 +8,69 @@ from email.header import decode_header
 import email.utils
 import os
 import re
-import json
 import time
 import asyncio
 import html
 import schedule
 import threading
+import statistics
+from collections import deque
 from datetime import datetime, date
-from typing import Optional, Dict, List, Tuple
-from dataclasses import dataclass
+from typing import Optional, Deque, Dict, FrozenSet, Iterator, List, Sequence, Tuple
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from transformers import pipeline
+import httpx
 from telegram import Bot
+from telegram.request import HTTPXRequest
 import logging
 
+from .imap_session import IMAPSession, CONNECTION_ERRORS
+from .pipeline import EmailPipeline
+from .classification_cache import ClassificationCache
+from .classifier_backends import (
+    BACKENDS,
+    EmbeddingZeroShotPipeline,
+    load_onnx_pipeline,
+)
+from .inference_pool import InferencePool
+from .model_store import ModelStore
+from .sender_groups import SenderGroupManager
+from .keyword_rules import KeywordMatcher, parse_keywords
+from .notify_decision import NotifyDecisionEngine
+from .user_rules import RuleTable, load_rules
+from .summary_store import SummaryStore
+from .model_memory import ModelLifecycleStats, release_memory, resident_memory_mb
+from .text_reducer import TextReducer, count_tokens
+from .model_registry import ModelRegistry, ModelSpec, load_registry
+from .classification_cascade import (
+    TIER_REASONS,
+    TIERS,
+    Classification,
+    ClassificationCascade,
+    parse_tiers,
+)
+from .notification_queue import NotificationQueue, OutgoingMessage, PERMANENT_ERRORS
+from .notification_coalescer import NotificationCoalescer, PendingNotification
+from .mailbox_sync import (
+    CondstoreSync,
+    MailboxStateStore,
+    UIDWatermarkSync,
+    UnseenSync,
+)
+from .imap_protocol import (
+    TextPart,
+    chunk_uid_sets,
+    decode_partial_body,
+    find_text_part,
+    iter_fetch_responses,
+)
+
+
+# Mensaje descargado: bytes (completo o solo cabeceras), cuerpo ya extraído en
+# descarga parcial y tamaño del mensaje en el servidor (RFC822.SIZE)
+Fetched = Tuple[bytes, Optional[str], Optional[int]]
+
 
 @dataclass
 class EmailMessage:
@@ -32,22 +82,375 @@ class EmailMessage:
     body: str
     message_id: str
     date: str
+    # Cuerpo sin normalizar (con saltos de línea) para el reductor de texto
+    raw_body: str = ""
+    # Nombres de las cabeceras presentes (en minúsculas) y tamaño en bytes
+    headers: FrozenSet[str] = frozenset()
+    size: int = 0
 
 
 class EmailClassifier:
     """Clasificador de emails usando IA y reglas de fallback"""
 
-    def __init__(self, label_candidates: str = "Urgente,Importante,Otros"):
+    DEFAULT_MODEL = "bart-large-mnli"
+    # Espera máxima entre intentos de carga del modelo
+    MAX_LOAD_RETRY = 1800.0
+    # Texto de la inferencia de prueba del calentamiento
+    WARMUP_TEXT = "Prueba\nMensaje de prueba para preparar el modelo."
+
+    def __init__(
+        self,
+        label_candidates: str = "Urgente,Importante,Otros",
+        batch_size: int = 8,
+        cache_size: int = 0,
+        cache_path: Optional[str] = None,
+        backend: str = "torch",
+        threads: int = 0,
+        onnx_dir: str = "models/onnx",
+        onnx_quantization: str = "auto",
+        model: str = DEFAULT_MODEL,
+        registry: Optional[ModelRegistry] = None,
+        latency_budget_ms: float = 0.0,
+        downgrade_backlog: int = 0,
+        token_budget: int = 0,
+        workers: int = 0,
+        worker_timeout: float = 60.0,
+        warmup: bool = False,
+        load_retry: float = 60.0,
+        model_dir: str = "models/hf",
+        offline: bool = False,
+        idle_unload: float = 0.0,
+        min_residency: float = 600.0,
+        urgent_keywords: Optional[Sequence[str]] = None,
+        important_keywords: Optional[Sequence[str]] = None,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"Backend de clasificación no válido: {backend} "
+                f"(opciones: {', '.join(BACKENDS)})"
+            )
         self.label_candidates = label_candidates.split(",")
-        self.classifier = None
+        # Reglas del fallback compiladas una vez: "Urgente" gana a "Importante"
+        self.rules = KeywordMatcher.from_lists(
+            {
+                "Urgente": (
+                    self.URGENT_KEYWORDS if urgent_keywords is None else urgent_keywords
+                ),
+                "Importante": (
+                    self.IMPORTANT_KEYWORDS
+                    if important_keywords is None
+                    else important_keywords
+                ),
+            }
+        )
+        # Correos por pasada del modelo (cada uno genera un par por etiqueta)
+        self.batch_size = max(1, int(batch_size))
         self.logger = logging.getLogger(__name__)
+        self.registry = registry or ModelRegistry()
+        self.model_spec = self._initial_model(model, latency_budget_ms)
+        # Modelo al que se vuelve cuando se vacía la cola
+        self.preferred_spec = self.model_spec
+        # Correos pendientes a partir de los cuales se baja a un modelo más rápido
+        self.downgrade_backlog = max(0, int(downgrade_backlog))
+        self._backlogs: Dict[str, int] = {}
+        # Protege la cola y el cambio de modelo; la inferencia nunca lo retiene
+        self._backlog_lock = threading.Lock()
+        self.backend = backend
+        # Hilos intra-op de la inferencia (0 = los que decida el runtime)
+        self.threads = max(0, int(threads))
+        self.onnx_dir = onnx_dir
+        self.onnx_quantization = onnx_quantization
+        # Copia local de los modelos (MODEL_DIR) y carga sin red
+        self.store = ModelStore(model_dir, offline=offline)
+        self.cache: Optional[ClassificationCache] = None
+        if cache_size > 0:
+            self.cache = ClassificationCache(
+                cache_size,
+                cache_path,
+                namespace=f"{backend}|{','.join(self.label_candidates)}",
+            )
+        # Recorte del texto antes de la inferencia (0 = texto completo)
+        self.reducer: Optional[TextReducer] = (
+            TextReducer(token_budget) if token_budget > 0 else None
+        )
+        # Tiempo por correo de los últimos lotes y tokens antes/después del recorte
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._input_tokens: Deque[Tuple[int, int]] = deque(maxlen=1000)
+        # Procesos de inferencia (0 = el modelo se ejecuta en este proceso)
+        self.pool: Optional[InferencePool] = None
+        if workers > 0:
+            self.pool = InferencePool(
+                load_worker_model,
+                workers=workers,
+                timeout=worker_timeout,
+                load_retry=load_retry,
+                max_load_retry=self.MAX_LOAD_RETRY,
+            )
+        self.classifier = None
+        # Cargar el modelo al arrancar en lugar de con el primer correo
+        self.warmup = warmup
+        # Espera inicial tras un fallo de carga (se duplica en cada fallo)
+        self.load_retry = max(0.0, float(load_retry))
+        self._load_failures = 0
+        self._retry_at = 0.0
+        # Segundos desde la creación hasta tener el modelo listo (None = aún no)
+        self.ready_seconds: Optional[float] = None
+        self._created = time.perf_counter()
+        # Segundos sin uso tras los que se libera el modelo (0 = nunca) y
+        # tiempo mínimo que permanece cargado
+        self.idle_unload = max(0.0, float(idle_unload))
+        self.min_residency = max(0.0, float(min_residency))
+        self.lifecycle = ModelLifecycleStats()
+        self._last_used = time.monotonic()
+        self._loaded_at = 0.0
+        self._idle_thread: Optional[threading.Thread] = None
+        self._closing = threading.Event()
+        # El modelo se comparte entre buzones que se vigilan en hilos distintos
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> "EmailClassifier":
+        """Crea el clasificador a partir de la configuración"""
+        return cls(
+            config.get("LABEL_CANDIDATES", "Urgente,Importante,Otros"),
+            batch_size=int(config.get("CLASSIFY_BATCH_SIZE", 8)),
+            cache_size=int(config.get("CLASSIFY_CACHE_SIZE", 10000)),
+            cache_path=config.get("CLASSIFY_CACHE_FILE") or None,
+            backend=str(config.get("CLASSIFIER_BACKEND", "torch")).lower(),
+            threads=int(config.get("CLASSIFIER_THREADS", 0)),
+            onnx_dir=config.get("ONNX_MODEL_DIR", "models/onnx"),
+            onnx_quantization=config.get("ONNX_QUANTIZATION", "auto"),
+            model=config.get("CLASSIFIER_MODEL", cls.DEFAULT_MODEL),
+            registry=load_registry(config.get("MODEL_REGISTRY_FILE") or None),
+            latency_budget_ms=float(config.get("CLASSIFIER_LATENCY_BUDGET_MS", 0)),
+            downgrade_backlog=int(config.get("CLASSIFIER_DOWNGRADE_BACKLOG", 0)),
+            token_budget=int(config.get("TEXT_TOKEN_BUDGET", 256)),
+            workers=int(config.get("INFERENCE_WORKERS", 0)),
+            worker_timeout=float(config.get("INFERENCE_TIMEOUT", 60)),
+            warmup=str(config.get("CLASSIFIER_WARMUP", "true")).lower()
+            in ("1", "true", "yes", "si"),
+            load_retry=float(config.get("CLASSIFIER_LOAD_RETRY", 60)),
+            model_dir=config.get("MODEL_DIR", "models/hf"),
+            offline=str(config.get("MODEL_OFFLINE", "false")).lower()
+            in ("1", "true", "yes", "si"),
+            idle_unload=float(config.get("CLASSIFIER_IDLE_UNLOAD", 0)) * 60,
+            min_residency=float(config.get("CLASSIFIER_MIN_RESIDENCY", 10)) * 60,
+            urgent_keywords=parse_keywords(
+                config.get("URGENT_KEYWORDS", ",".join(cls.URGENT_KEYWORDS))
+            ),
+            important_keywords=parse_keywords(
+                config.get("IMPORTANT_KEYWORDS", ",".join(cls.IMPORTANT_KEYWORDS))
+            ),
+        )
+
+    @property
+    def model_name(self) -> str:
+        return self.model_spec.model_id
+
+    def _initial_model(self, model: str, latency_budget_ms: float) -> ModelSpec:
+        """Modelo configurado, o el mayor que cabe en el presupuesto de latencia"""
+        spec = self.registry.get(model)
+        if latency_budget_ms <= 0:
+            return spec
+
+        fitting = self.registry.select(
+            latency_budget_ms, multilingual=True if spec.multilingual else None
+        )
+        if fitting is None:
+            self.logger.warning(
+                f"Ningún modelo cabe en {latency_budget_ms:.0f} ms por correo, "
+                f"se usa {spec.name}"
+            )
+            return spec
+        self.logger.info(
+            f"Modelo {fitting.name} elegido para {latency_budget_ms:.0f} ms por correo "
+            f"(p99 {fitting.p99_ms:.0f} ms, {fitting.memory_mb} MB)"
+        )
+        return fitting
+
+    def adjust_for_backlog(self, backlog: int, source: str = "") -> None:
+        """
+        Cambia a un modelo más rápido si se acumulan correos pendientes
+
+        ``source`` identifica el buzón, ya que el clasificador se comparte. Se
+        baja un solo nivel por cada vez que se supera el umbral y, mientras se
+        está en el modelo rápido, no se vuelve a bajar. Al bajar la cola por
+        debajo de una cuarta parte del umbral se vuelve al modelo preferido.
+        No espera a la inferencia en curso: el modelo nuevo se carga en el
+        siguiente uso, así que se puede llamar desde el loop de eventos.
+        """
+        if not self.downgrade_backlog:
+            return
+        with self._backlog_lock:
+            self._backlogs[source] = backlog
+            total = sum(self._backlogs.values())
+            downgraded = self.model_spec is not self.preferred_spec
+            if total >= self.downgrade_backlog and not downgraded:
+                faster = self.registry.faster_than(self.preferred_spec)
+                if faster is not None:
+                    self.logger.warning(
+                        f"⚠️ {total} correos pendientes: cambiando de "
+                        f"{self.model_spec.name} a {faster.name}"
+                    )
+                    self._switch_model(faster)
+            elif total <= self.downgrade_backlog // 4 and downgraded:
+                self.logger.info(
+                    f"Cola normalizada: volviendo a {self.preferred_spec.name}"
+                )
+                self._switch_model(self.preferred_spec)
+
+    def worker_options(self) -> Dict:
+        """Modelo y backend que deben cargar los procesos de inferencia"""
+        return {
+            "spec": asdict(self.model_spec),
+            "backend": self.backend,
+            "threads": self.threads,
+            "onnx_dir": self.onnx_dir,
+            "onnx_quantization": self.onnx_quantization,
+            "model_dir": self.store.base_dir,
+            "offline": self.store.offline,
+        }
+
+    def _switch_model(self, spec: ModelSpec) -> None:
+        """Descarta el modelo cargado; el nuevo se carga en el siguiente uso"""
+        self.model_spec = spec
+        if self.classifier is not None:
+            self.lifecycle.unloads += 1
+        self.classifier = None
+        self._load_failures = 0
+        self._retry_at = 0.0
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """
+        Carga el modelo y ejecuta una inferencia de prueba
+
+        En segundo plano no bloquea el arranque (la conexión IMAP sigue en
+        paralelo); los correos que lleguen antes esperan a que termine la
+        carga en lugar de cargar el modelo otra vez.
+        """
+        if not background:
+            self._warm_up()
+            return None
+        thread = threading.Thread(
+            target=self._warm_up, name="model-warmup", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _warm_up(self) -> None:
+        self.logger.info(f"🔥 Calentando el modelo {self.model_spec.name}...")
+        try:
+            results = self._infer([self.WARMUP_TEXT])
+        except Exception as e:
+            self.logger.warning(f"Falló la inferencia de prueba: {e}")
+            return
+        if results is None:
+            self.logger.warning(
+                "Modelo no disponible tras el calentamiento; se usarán las reglas"
+            )
+            return
+        self.ready_seconds = time.perf_counter() - self._created
+        self.logger.info(
+            f"✅ Modelo {self.model_spec.name} listo en {self.ready_seconds:.1f}s "
+            "desde el arranque"
+        )
 
     def _get_classifier(self):
         """Inicializa el clasificador de manera lazy"""
+        with self._lock:
+            return self._load_classifier()
+
+    def _load_classifier(self):
+        """
+        Carga el pipeline de IA si aún no está cargado
+
+        Tras un fallo no se reintenta hasta que pasa la espera, que se duplica
+        con cada fallo seguido (hasta ``MAX_LOAD_RETRY`` segundos); mientras
+        tanto los correos se clasifican con reglas.
+        """
+        if self.classifier is not None:
+            return self.classifier
+        if time.monotonic() < self._retry_at:
+            return None
+
+        spec = self.model_spec
+        start = time.perf_counter()
+        self._load_model()
+        if self.model_spec is not spec:
+            # El modelo cambió durante la carga (cola de correos): este lote usa
+            # el cargado y el nuevo se carga en el siguiente uso
+            classifier, self.classifier = self.classifier, None
+            return classifier
+        if self.classifier is None:
+            self._load_failures += 1
+            delay = min(
+                self.load_retry * 2 ** (self._load_failures - 1), self.MAX_LOAD_RETRY
+            )
+            self._retry_at = time.monotonic() + delay
+            self.logger.warning(
+                f"⚠️ Nuevo intento de carga del modelo en {delay:.0f}s "
+                f"(fallo {self._load_failures})"
+            )
+        else:
+            elapsed = time.perf_counter() - start
+            self._load_failures = 0
+            self._loaded_at = time.monotonic()
+            self.lifecycle.loads += 1
+            self.lifecycle.load_seconds += elapsed
+            self.logger.info(
+                f"Modelo {self.model_spec.name} cargado en {elapsed:.1f}s"
+            )
+        return self.classifier
+
+    def _load_model(self) -> None:
+        """Crea el pipeline con el backend configurado"""
+        if self.classifier is None and self.model_spec.kind == "embedding":
+            try:
+                source = self.store.resolve(self.model_name)
+                self.classifier = EmbeddingZeroShotPipeline(
+                    source, model_kwargs=self.store.load_kwargs(source)
+                )
+                self.logger.info(
+                    f"Clasificador por embeddings inicializado ({self.model_spec.name})"
+                )
+            except Exception as e:
+                self.logger.warning(
+                    f"No se pudo inicializar el clasificador de IA: {e}"
+                )
+                self.logger.info("Continuando sin clasificación automática")
+            return
+
+        if self.classifier is None and self.backend == "onnx":
+            try:
+                self.classifier = load_onnx_pipeline(
+                    self.model_name,
+                    self.onnx_dir,
+                    threads=self.threads,
+                    quantization=self.onnx_quantization,
+                    source=self.store.resolve(self.model_name),
+                )
+                self.logger.info(
+                    "Clasificador de IA inicializado con ONNX Runtime (int8)"
+                )
+            except ImportError as e:
+                self.logger.warning(
+                    f"ONNX Runtime no disponible ({e}), usando PyTorch. "
+                    'Instala "optimum[onnxruntime]" para el backend onnx.'
+                )
+            except Exception as e:
+                self.logger.warning(
+                    f"No se pudo cargar el modelo ONNX: {e}. Usando PyTorch."
+                )
+
         if self.classifier is None:
             try:
+                if self.threads:
+                    self._set_torch_threads(self.threads)
+                source = self.store.resolve(self.model_name)
                 self.classifier = pipeline(
-                    "zero-shot-classification", model="facebook/bart-large-mnli"
+                    "zero-shot-classification",
+                    model=source,
+                    model_kwargs=self.store.load_kwargs(source),
                 )
                 self.logger.info("Clasificador de IA inicializado correctamente")
             except Exception as e:
@@ -55,114 +458,589 @@ class EmailClassifier:
                     f"No se pudo inicializar el clasificador de IA: {e}"
                 )
                 self.logger.info("Continuando sin clasificación automática")
-        return self.classifier
+
+    def _set_torch_threads(self, threads: int) -> None:
+        """Limita los hilos intra-op de PyTorch"""
+        try:
+            import torch
+
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
 
     def classify(self, subject: str, body: str, threshold: float = 0.5) -> str:
         """Clasifica un email usando IA o reglas básicas como fallback"""
-        # Intentar usar IA
+        return self.classify_batch([(subject, body)], threshold)[0]
+
+    def classify_batch(
+        self, messages: List[Tuple[str, str]], threshold: float = 0.5
+    ) -> List[str]:
+        """
+        Clasifica varios emails ``(asunto, cuerpo)`` en una sola llamada al modelo
+
+        Los pares premisa×hipótesis de todos los correos se agrupan en lotes de
+        ``batch_size`` correos; los textos se ordenan por longitud para que el
+        relleno de cada lote sea mínimo. Las etiquetas se devuelven en el
+        orden de entrada. Con caché, los correos ya vistos (misma plantilla)
+        no pasan por el modelo.
+        """
+        if not messages:
+            return []
+
+        if self.reducer is not None:
+            reduced = [self.reducer.reduce(subject, body) for subject, body in messages]
+            self._input_tokens.extend(
+                (count_tokens(f"{s} {b}"), count_tokens(f"{rs} {rb}"))
+                for (s, b), (rs, rb) in zip(messages, reduced)
+            )
+            messages = reduced
+
+        labels: List[Optional[str]] = [None] * len(messages)
+        keys: List[str] = []
+        if self.cache is not None:
+            variant = f"{self.model_name}|{threshold}"
+            keys = [self.cache.key(subject, body, variant) for subject, body in messages]
+            labels = [self.cache.get(key) for key in keys]
+
+        pending = [i for i, label in enumerate(labels) if label is None]
+        if pending:
+            computed = self._classify_uncached([messages[i] for i in pending], threshold)
+            for i, label in zip(pending, computed):
+                labels[i] = label
+        return labels
+
+    def _classify_uncached(
+        self, messages: List[Tuple[str, str]], threshold: float
+    ) -> List[str]:
+        """Clasifica con el modelo (o con reglas si no está disponible)"""
+        texts = [f"{subject}\n{body}" for subject, body in messages]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        start = time.perf_counter()
+        try:
+            # Intentar usar IA
+            results = self._infer([texts[i] for i in order])
+        except Exception as e:
+            self.logger.warning(f"Error en clasificación IA: {e}. Usando fallback.")
+            results = None
+        if results is None:
+            return [self._classify_fallback(subject, body) for subject, body in messages]
+        per_message = (time.perf_counter() - start) / len(texts)
+        self._latencies.append(per_message)
+
+        if isinstance(results, dict):
+            results = [results]
+        if not isinstance(results, list) or len(results) != len(texts):
+            self.logger.warning(
+                "Error en la clasificación de email - resultado inválido"
+            )
+            return [self._classify_fallback(subject, body) for subject, body in messages]
+
+        labels: List[str] = [""] * len(texts)
+        to_cache = []
+        for index, result in zip(order, results):
+            subject, body = messages[index]
+            label = self._label_from_result(result, threshold)
+            if label is None:
+                labels[index] = self._classify_fallback(subject, body)
+                continue
+            labels[index] = label
+            if self.cache is not None:
+                to_cache.append(
+                    (
+                        self.cache.key(subject, body, f"{self.model_name}|{threshold}"),
+                        label,
+                        per_message,
+                    )
+                )
+
+        # Solo se guardan los resultados del modelo, no los del fallback
+        if to_cache:
+            self.cache.put_many(to_cache)
+        return labels
+
+    def _infer(self, texts: List[str]):
+        """Ejecuta el modelo en este proceso o en el pool (None si no hay modelo)"""
+        batch_size = self.batch_size * len(self.label_candidates)
+        self._last_used = time.monotonic()
+        self._watch_idle()
+        if self.pool is not None:
+            if not self.pool.running:
+                self._loaded_at = time.monotonic()
+                self.lifecycle.loads += 1
+            return self.pool.classify(
+                self.worker_options(), texts, self.label_candidates, batch_size
+            )
         classifier = self._get_classifier()
-        if classifier is not None:
-            try:
-                full_text = f"{subject}\n{body}"
-                result = classifier(full_text, candidate_labels=self.label_candidates)
+        if classifier is None:
+            return None
+        with self._lock:
+            return classifier(
+                texts, candidate_labels=self.label_candidates, batch_size=batch_size
+            )
 
-                if not result or not isinstance(result, dict):
-                    self.logger.warning(
-                        "Error en la clasificación de email - resultado inválido"
-                    )
-                    return self._classify_fallback(subject, body)
+    def _model_resident(self) -> bool:
+        if self.pool is not None:
+            return self.pool.running
+        return self.classifier is not None
 
-                labels = result.get("labels", [])
-                scores = result.get("scores", [])
+    def _watch_idle(self) -> None:
+        """Arranca el hilo que descarga el modelo tras ``idle_unload`` sin uso"""
+        if not self.idle_unload or self._closing.is_set():
+            return
+        if self._idle_thread is not None and self._idle_thread.is_alive():
+            return
+        self._idle_thread = threading.Thread(
+            target=self._idle_loop, name="model-idle", daemon=True
+        )
+        self._idle_thread.start()
 
-                if not labels or not scores:
-                    self.logger.warning(
-                        "Error en la clasificación de email - sin etiquetas o puntuaciones"
-                    )
-                    return self._classify_fallback(subject, body)
+    def _idle_loop(self) -> None:
+        interval = min(60.0, max(1.0, self.idle_unload / 4))
+        while not self._closing.wait(interval):
+            if self.unload_if_idle():
+                return
 
-                top_label = labels[0]
-                top_score = scores[0]
-                self.logger.info(
-                    f"[IA] Clasificado como: {top_label} (score: {top_score:.2f})"
-                )
-                return str(top_label) if top_score >= threshold else "Otros"
+    def unload_if_idle(self) -> bool:
+        """
+        Libera el modelo si lleva ``idle_unload`` segundos sin uso
 
-            except Exception as e:
-                self.logger.warning(f"Error en clasificación IA: {e}. Usando fallback.")
-                return self._classify_fallback(subject, body)
-        else:
-            return self._classify_fallback(subject, body)
+        Nunca antes de ``min_residency`` segundos desde la carga, para no
+        recargarlo una y otra vez con tráfico intermitente. La siguiente
+        clasificación lo vuelve a cargar.
+        """
+        if not self.idle_unload:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not self._model_resident()
+                or now - self._last_used < self.idle_unload
+                or now - self._loaded_at < self.min_residency
+            ):
+                return False
+            before = resident_memory_mb()
+            if self.pool is not None and not self.pool.release():
+                return False
+            self.classifier = None
+            release_memory()
+            after = resident_memory_mb()
+            self.lifecycle.unloads += 1
+            self.lifecycle.rss_before_unload_mb = before
+            self.lifecycle.rss_after_unload_mb = after
+
+        memory = ""
+        if before is not None and after is not None:
+            memory = f" (RSS {before:.0f} → {after:.0f} MB)"
+        self.logger.info(
+            f"💤 Modelo {self.model_spec.name} descargado tras "
+            f"{(now - self._last_used) / 60:.0f} min sin uso{memory}"
+        )
+        return True
 
-    def _classify_fallback(self, subject: str, body: str) -> str:
-        """Clasificación básica usando palabras clave cuando la IA no está disponible"""
-        text = f"{subject} {body}".lower()
-
-        urgent_keywords = [
-            "urgente",
-            "emergency",
-            "critical",
-            "critico",
-            "inmediato",
-            "importante",
-        ]
-        important_keywords = [
-            "factura",
-            "invoice",
-            "payment",
-            "pago",
-            "vencimiento",
-            "deadline",
-        ]
+    def model_metrics(self) -> Dict[str, object]:
+        """Cargas, descargas y residencia actual del modelo"""
+        return {**self.lifecycle.as_dict(), "resident": self._model_resident()}
 
-        if any(keyword in text for keyword in urgent_keywords):
-            self.logger.info("[FALLBACK] Clasificado como: Urgente")
-            return "Urgente"
-        elif any(keyword in text for keyword in important_keywords):
-            self.logger.info("[FALLBACK] Clasificado como: Importante")
-            return "Importante"
-        else:
-            self.logger.info("[FALLBACK] Clasificado como: Otros")
-            return "Otros"
+    def _label_from_result(self, result, threshold: float) -> Optional[str]:
+        """Convierte la salida del pipeline en una etiqueta (None si no es válida)"""
+        if not result or not isinstance(result, dict):
+            self.logger.warning(
+                "Error en la clasificación de email - resultado inválido"
+            )
+            return None
 
+        labels = result.get("labels", [])
+        scores = result.get("scores", [])
 
-class SenderGroupManager:
-    """Gestor de grupos de remitentes"""
+        if not labels or not scores:
+            self.logger.warning(
+                "Error en la clasificación de email - sin etiquetas o puntuaciones"
+            )
+            return None
 
-    def __init__(self, json_path: str = "sender_groups.json"):
-        self.json_path = json_path
-        self.logger = logging.getLogger(__name__)
-        self.groups = self._load_groups()
+        top_label = labels[0]
+        top_score = scores[0]
+        self.logger.info(
+            f"[IA] Clasificado como: {top_label} (score: {top_score:.2f})"
+        )
+        return str(top_label) if top_score >= threshold else "Otros"
 
-    def _load_groups(self) -> Dict[str, List[str]]:
-        """Carga los grupos de remitentes desde JSON"""
-        try:
-            with open(self.json_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            self.logger.warning(f"No se pudo cargar {self.json_path}: {e}")
-            return {}
+    def inference_report(self) -> Optional[str]:
+        """Mediana del tiempo de inferencia por correo y tamaño medio de la entrada"""
+        if not self._latencies:
+            return None
+        median_ms = statistics.median(self._latencies) * 1000
+        report = (
+            f"⏱️ Inferencia: mediana {median_ms:.0f} ms/correo "
+            f"({len(self._latencies)} lotes)"
+        )
+        if self._input_tokens:
+            before = statistics.mean(t[0] for t in self._input_tokens)
+            after = statistics.mean(t[1] for t in self._input_tokens)
+            report += (
+                f", entrada media {before:.0f} → {after:.0f} tokens "
+                f"(presupuesto {self.reducer.max_tokens})"
+            )
+        if self.idle_unload:
+            report += (
+                f"; modelo cargado {self.lifecycle.loads} veces, "
+                f"descargado {self.lifecycle.unloads} por inactividad o cambio"
+            )
+        if self.pool is not None:
+            health = self.pool.health()
+            report += (
+                f"; procesos {health['alive']}/{health['workers']} vivos, "
+                f"{health['timeouts']} timeouts, {health['restarts']} reinicios"
+            )
+        return report
+
+    def close(self) -> None:
+        """Detiene los procesos de inferencia y cierra la caché"""
+        self._closing.set()
+        if self.pool is not None:
+            self.pool.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def cache_report(self) -> Optional[str]:
+        """Resumen legible de la eficacia de la caché"""
+        if self.cache is None:
+            return None
+        stats = self.cache.stats
+        return (
+            f"🗃️ Caché de clasificación: {stats.hit_rate:.0%} aciertos "
+            f"({stats.hits}/{stats.hits + stats.misses}), "
+            f"{stats.time_saved:.1f}s de inferencia ahorrados"
+        )
+
+    # Palabras clave por defecto (URGENT_KEYWORDS / IMPORTANT_KEYWORDS)
+    URGENT_KEYWORDS = (
+        "urgente",
+        "emergency",
+        "critical",
+        "critico",
+        "inmediato",
+        "importante",
+    )
+    IMPORTANT_KEYWORDS = (
+        "factura",
+        "invoice",
+        "payment",
+        "pago",
+        "vencimiento",
+        "deadline",
+    )
+
+    def rule_label(self, subject: str, body: str) -> Optional[str]:
+        """Etiqueta por palabras clave, o None si ninguna regla coincide"""
+        tags = self.rules.tags(subject, body)
+        if "Urgente" in tags:
+            return "Urgente"
+        if "Importante" in tags:
+            return "Importante"
+        return None
+
+    def _classify_fallback(self, subject: str, body: str) -> str:
+        """Clasificación básica usando palabras clave cuando la IA no está disponible"""
+        label = self.rule_label(subject, body) or "Otros"
+        self.logger.info(f"[FALLBACK] Clasificado como: {label}")
+        return label
 
-    def get_label_for_sender(self, sender: str) -> str:
-        """Busca en qué grupo está un remitente"""
-        for label, senders in self.groups.items():
-            if sender in senders:
-                return label
-        return "Otros"
 
-    def get_groups(self) -> Dict[str, List[str]]:
-        """Retorna todos los grupos"""
-        return self.groups.copy()
+def load_worker_model(options: Dict):
+    """Carga el modelo dentro de un proceso del pool de inferencia"""
+    classifier = EmailClassifier(
+        backend=options["backend"],
+        threads=options["threads"],
+        onnx_dir=options["onnx_dir"],
+        onnx_quantization=options["onnx_quantization"],
+        model_dir=options["model_dir"],
+        offline=options["offline"],
+    )
+    classifier.model_spec = ModelSpec(**options["spec"])
+    return classifier._get_classifier()
 
 
 class TelegramNotifier:
-    """Notificador de Telegram"""
+    """
+    Notificador de Telegram
+
+    Usa un único cliente HTTP con pool de conexiones keep-alive que vive en un
+    solo event loop: el de la aplicación (``await start()``) o, si se usa desde
+    código síncrono, un loop propio en un hilo en segundo plano. Las llamadas
+    desde otros loops o hilos se redirigen a ese loop, así cada notificación
+    reutiliza una conexión ya abierta con api.telegram.org.
+
+    Los envíos pasan por una ``NotificationQueue`` que respeta los límites de
+    Telegram, reintenta los errores transitorios y adelanta las etiquetas más
+    prioritarias. Las ráfagas de correos con la misma clave (remitente, grupo o
+    etiqueta) se agrupan en un único resumen con ``NotificationCoalescer``;
+    los urgentes se envían siempre al momento.
+    """
+
+    # Prioridad de envío por etiqueta (menor sale antes)
+    LABEL_PRIORITY = {"Urgente": 0, "Importante": 1}
+    DEFAULT_PRIORITY = 2
 
-    def __init__(self, token: str, chat_id: str):
+    def __init__(
+        self,
+        token: str,
+        chat_id: str,
+        pool_size: int = 8,
+        keepalive_expiry: float = 300.0,
+        global_rate: float = 30.0,
+        chat_rate: float = 60.0,
+        group_rate: float = 20.0,
+        max_retries: int = 5,
+        digest_window: float = 30.0,
+        digest_max: int = 20,
+        digest_key: str = "sender",
+    ):
         self.token = token
         self.chat_id = chat_id
-        self.bot = Bot(token=token)
+        self.pool_size = pool_size
+        self.keepalive_expiry = keepalive_expiry
+        self.queue_settings = {
+            "global_rate": global_rate,
+            "chat_rate": chat_rate,
+            "group_rate": group_rate,
+            "workers": pool_size,
+            "max_retries": max_retries,
+        }
+        self.digest_settings = {
+            "window": digest_window,
+            "max_batch": digest_max,
+            "group_by": digest_key,
+        }
+        self.bot = self._build_bot()
+        self.queue = self._build_queue()
+        self.coalescer = self._build_coalescer()
         self.logger = logging.getLogger(__name__)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._initialized = False
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, str]) -> "TelegramNotifier":
+        """Crea el notificador a partir de la configuración"""
+        return cls(
+            config["TELEGRAM_TOKEN"],
+            config["TELEGRAM_CHAT_ID"],
+            pool_size=int(config.get("TELEGRAM_POOL_SIZE", 8)),
+            keepalive_expiry=float(config.get("TELEGRAM_KEEPALIVE", 300)),
+            global_rate=float(config.get("TELEGRAM_GLOBAL_RATE", 30)),
+            chat_rate=float(config.get("TELEGRAM_CHAT_RATE", 60)),
+            group_rate=float(config.get("TELEGRAM_GROUP_RATE", 20)),
+            max_retries=int(config.get("TELEGRAM_MAX_RETRIES", 5)),
+            digest_window=float(config.get("TELEGRAM_DIGEST_WINDOW", 30)),
+            digest_max=int(config.get("TELEGRAM_DIGEST_MAX", 20)),
+            digest_key=config.get("TELEGRAM_DIGEST_KEY", "sender"),
+        )
+
+    def _build_queue(self) -> NotificationQueue:
+        return NotificationQueue(self._send, **self.queue_settings)
+
+    def _build_coalescer(self) -> NotificationCoalescer:
+        return NotificationCoalescer(self._emit, **self.digest_settings)
+
+    async def _send(self, message: OutgoingMessage) -> None:
+        await self.bot.send_message(
+            chat_id=message.chat_id,
+            text=message.text,
+            parse_mode=message.parse_mode,
+        )
+
+    def _build_bot(self) -> Bot:
+        """Crea el bot con un pool de conexiones persistentes"""
+        try:
+            request = HTTPXRequest(
+                connection_pool_size=self.pool_size,
+                httpx_kwargs={
+                    "limits": httpx.Limits(
+                        max_connections=self.pool_size,
+                        max_keepalive_connections=self.pool_size,
+                        keepalive_expiry=self.keepalive_expiry,
+                    )
+                },
+            )
+        except TypeError:
+            # python-telegram-bot < 21 no admite httpx_kwargs
+            request = HTTPXRequest(connection_pool_size=self.pool_size)
+        return Bot(token=self.token, request=request)
+
+    async def start(self) -> None:
+        """Asocia el notificador al loop actual y abre el pool de conexiones"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None:
+                # El cliente HTTP y la cola anteriores pertenecen a otro loop
+                if self._initialized:
+                    self.bot = self._build_bot()
+                self.queue = self._build_queue()
+                self.coalescer = self._build_coalescer()
+            self._loop = loop
+            self._initialized = False
+
+        if not self._initialized:
+            try:
+                # initialize() hace getMe: deja una conexión TLS abierta
+                await self.bot.initialize()
+                self._initialized = True
+                self.logger.info("🔌 Conexión con Telegram inicializada")
+            except Exception as e:
+                self.logger.warning(f"No se pudo inicializar el bot de Telegram: {e}")
+
+        await self.queue.start()
+
+    async def _call(self, coro):
+        """Ejecuta una corrutina en el loop del notificador"""
+        running = asyncio.get_running_loop()
+        if self._loop is None or (
+            self._loop is not running and not self._loop.is_running()
+        ):
+            await self.start()
+        if self._loop is running:
+            return await coro
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return await asyncio.wrap_future(future)
+
+    def _ensure_background_loop(self) -> asyncio.AbstractEventLoop:
+        """Arranca un loop propio en un hilo para los usos síncronos"""
+        with self._start_lock:
+            if self._loop is not None and self._loop.is_running():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(
+                target=loop.run_forever, name="telegram-loop", daemon=True
+            )
+            self._loop_thread.start()
+            asyncio.run_coroutine_threadsafe(self.start(), loop).result()
+            return loop
+
+    def run_sync(self, coro, timeout: Optional[float] = None):
+        """Ejecuta una corrutina del notificador desde código síncrono"""
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            loop = self._ensure_background_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+    async def aclose(self) -> None:
+        """Envía lo pendiente y cierra el pool de conexiones de manera ordenada"""
+        if self._loop is None:
+            return
+        try:
+            await self._call(self._shutdown())
+        except Exception as e:
+            self.logger.warning(f"Error cerrando el bot de Telegram: {e}")
+
+    async def _shutdown(self) -> None:
+        await self.coalescer.flush_all()
+        await self.queue.close()
+        if self._initialized:
+            await self.bot.shutdown()
+            self._initialized = False
+
+    def close(self) -> None:
+        """Cierra el pool y detiene el loop propio si existe"""
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(30)
+            except Exception as e:
+                self.logger.warning(f"Error cerrando el bot de Telegram: {e}")
+            if self._loop_thread is not None:
+                loop.call_soon_threadsafe(loop.stop)
+                self._loop_thread.join(timeout=5)
+                self._loop_thread = None
+        self._loop = None
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que se envíen las notificaciones en cola"""
+        if self._loop is None:
+            return True
+        return await self._call(self._drain(timeout))
+
+    async def _drain(self, timeout: Optional[float]) -> bool:
+        # Los resúmenes a medio acumular también deben salir
+        await self.coalescer.flush_all()
+        return await self.queue.drain(timeout)
+
+    async def _enqueue(self, message: OutgoingMessage, wait: bool) -> bool:
+        """Encola un mensaje en el loop del notificador"""
+        future = await self.queue.submit(message)
+        if not wait:
+            return True
+        return await future
+
+    def _format_notification(self, item: PendingNotification) -> str:
+        """Mensaje HTML de un único correo"""
+        subject_esc = html.escape(item.subject)
+        sender_esc = html.escape(item.sender)
+        snippet_esc = html.escape(item.snippet)
+        label_esc = html.escape(str(item.label))
+
+        group_info = f" ({item.sender_group})" if item.sender_group != "Otros" else ""
+
+        return (
+            f"📩 <b>Correo importante - {label_esc}</b>\n"
+            f"<b>De:</b> <code>{sender_esc}</code>{group_info}\n"
+            f"<b>Asunto:</b> <code>{subject_esc}</code>\n\n"
+            f"<code>{snippet_esc}</code>"
+        )
+
+    def _format_digest(
+        self, items: List[PendingNotification], key: str, elapsed: float
+    ) -> str:
+        """Mensaje HTML que resume una ráfaga de correos"""
+        show_sender = self.coalescer.group_by != "sender"
+        lines = [
+            f"📦 <b>{len(items)} correos de {html.escape(key)} "
+            f"en {elapsed:.0f}s</b>\n"
+        ]
+        for item in items:
+            subject = item.subject if len(item.subject) <= 100 else item.subject[:97] + "..."
+            line = f"• [{html.escape(str(item.label))}] <code>{html.escape(subject)}</code>"
+            if show_sender:
+                line += f" — {html.escape(item.sender)}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def _priority(self, item: PendingNotification) -> int:
+        """Prioridad de la regla si la hay y si no la de la etiqueta"""
+        if item.priority is not None:
+            return item.priority
+        return self.LABEL_PRIORITY.get(item.label, self.DEFAULT_PRIORITY)
+
+    async def _emit(
+        self,
+        items: List[PendingNotification],
+        key: str,
+        elapsed: float,
+        wait: bool,
+    ) -> bool:
+        """Pone en la cola de salida un correo suelto o un resumen de ráfaga"""
+        priority = min(self._priority(item) for item in items)
+        if len(items) == 1:
+            text = self._format_notification(items[0])
+            description = items[0].subject
+        else:
+            text = self._format_digest(items, key, elapsed)
+            description = f"resumen de {len(items)} correos de {key}"
+
+        message = OutgoingMessage(
+            chat_id=self.chat_id,
+            text=text,
+            priority=priority,
+            description=description,
+        )
+        sent = await self._enqueue(message, wait)
+        if sent and wait:
+            self.logger.info(f"✅ Notificación enviada para: {description}")
+        elif sent:
+            self.logger.info(f"📤 Notificación en cola para: {description}")
+        return sent
 
     async def send_notification(
         self,
@@ -171,60 +1049,97 @@ class TelegramNotifier:
         snippet: str,
         label: str = "Otros",
         sender_group: str = "Otros",
+        wait: bool = True,
+        priority: Optional[int] = None,
     ) -> bool:
-        """Envía notificación a Telegram de manera asíncrona"""
+        """
+        Envía notificación a Telegram de manera asíncrona
+
+        Con ``wait=False`` retorna en cuanto el mensaje está en la cola de
+        salida; los fallos definitivos se registran al procesarse. Si el
+        remitente está en plena ráfaga el correo se acumula para el resumen y,
+        con ``wait=True``, se espera a que salga ese resumen (hasta la ventana
+        de agrupación) para devolver si se envió. ``priority`` sustituye a la
+        prioridad que corresponde a la etiqueta.
+        """
         try:
-            subject_esc = html.escape(subject)
-            sender_esc = html.escape(sender)
-            snippet_esc = html.escape(snippet)
-            label_esc = html.escape(str(label))
-
-            group_info = f" ({sender_group})" if sender_group != "Otros" else ""
-
-            mensaje = (
-                f"📩 <b>Correo importante - {label_esc}</b>\n"
-                f"<b>De:</b> <code>{sender_esc}</code>{group_info}\n"
-                f"<b>Asunto:</b> <code>{subject_esc}</code>\n\n"
-                f"<code>{snippet_esc}</code>"
-            )
-
-            await self.bot.send_message(
-                chat_id=self.chat_id, text=mensaje, parse_mode="HTML"
+            item = PendingNotification(
+                subject, sender, snippet, label, sender_group, priority
             )
-            self.logger.info(f"✅ Notificación enviada para: {subject}")
-            return True
+            if self._priority(item) == 0:
+                # Los urgentes nunca esperan a la ventana de agrupación
+                return await self._call(self._emit([item], sender, 0.0, wait))
+            return await self._call(self.coalescer.add(item, wait))
 
         except Exception as e:
             self.logger.error(f"No se pudo enviar mensaje a Telegram: {e}")
             return False
 
     async def send_daily_summary(self, summary_text: str) -> bool:
-        """Envía el resumen diario a Telegram"""
+        """
+        Envía el resumen diario (o una de sus partes) a Telegram
+
+        Retorna False si no se pudo enviar por un error transitorio. Si
+        Telegram rechaza el mensaje (``BadRequest``, ``Forbidden``) se lanza
+        el error, porque reintentarlo no serviría de nada.
+        """
+        message = OutgoingMessage(
+            chat_id=self.chat_id,
+            text=summary_text,
+            priority=self.LABEL_PRIORITY["Importante"],
+            description="resumen diario",
+        )
         try:
-            await self.bot.send_message(
-                chat_id=self.chat_id,
-                text=summary_text,
-                parse_mode="HTML"
-            )
-            self.logger.info("✅ Resumen diario enviado correctamente")
-            return True
+            sent = await self._call(self._enqueue(message, wait=True))
         except Exception as e:
             self.logger.error(f"No se pudo enviar resumen diario: {e}")
             return False
+        if sent:
+            self.logger.info("✅ Resumen diario enviado correctamente")
+        elif isinstance(message.error, PERMANENT_ERRORS):
+            raise message.error
+        return sent
 
 
 class DailySummaryManager:
-    """Gestor de resúmenes diarios de correos"""
+    """
+    Gestor de resúmenes diarios de correos
+
+    Los correos procesados se guardan en ``store`` (SQLite), así que el
+    resumen sobrevive a un reinicio y ``send_summary`` lo ve desde otro
+    proceso. Tras enviarlo se borran los registros incluidos. El resumen se
+    parte en mensajes que caben en Telegram y el detalle se limita a
+    ``MAX_DETAIL`` correos.
+    """
+
+    # Límite de caracteres de un mensaje de Telegram
+    MAX_MESSAGE_LENGTH = 4096
+    # Correos que se listan en el detalle (el resto solo se cuenta)
+    MAX_DETAIL = 100
 
     def __init__(
-        self, telegram_notifier: TelegramNotifier, summary_time: str = "21:00"
+        self,
+        telegram_notifier: TelegramNotifier,
+        summary_time: str = "21:00",
+        store: Optional[SummaryStore] = None,
     ):
         self.telegram_notifier = telegram_notifier
         self.summary_time = summary_time
-        self.daily_emails: List[Dict] = []
+        self.store = store or SummaryStore()
         self.logger = logging.getLogger(__name__)
         self._setup_scheduler()
 
+    @classmethod
+    def from_config(
+        cls, telegram_notifier: TelegramNotifier, config: Dict[str, str]
+    ) -> "DailySummaryManager":
+        """Crea el gestor con la hora y el fichero del resumen de la configuración"""
+        return cls(
+            telegram_notifier,
+            config.get("DAILY_SUMMARY_TIME", "21:00"),
+            SummaryStore(config.get("SUMMARY_FILE") or None),
+        )
+
     def _setup_scheduler(self):
         """Configura el scheduler para enviar resúmenes diarios"""
         try:
@@ -237,69 +1152,109 @@ class DailySummaryManager:
 
     def add_email(self, email_data: Dict):
         """Agrega un email al registro diario"""
-        self.daily_emails.append(email_data)
+        self.store.add(email_data)
 
     def _send_daily_summary(self):
         """Envía el resumen diario de correos"""
-        if not self.daily_emails:
-            self.logger.info("📊 No hay correos para incluir en el resumen diario")
-            return
-
         try:
-            today = date.today().strftime("%d/%m/%Y")
-            summary_text = self._generate_summary_text(today)
+            # Los correos que lleguen mientras se envía quedan para el siguiente
+            up_to = self.store.last_id()
+            if up_to is None:
+                self.logger.info("📊 No hay correos para incluir en el resumen diario")
+                return
 
-            # Enviar resumen de manera asíncrona
-            asyncio.run(self.telegram_notifier.send_daily_summary(summary_text))
+            today = date.today().strftime("%d/%m/%Y")
+            try:
+                # Enviar cada parte en el loop del notificador (reutiliza la conexión)
+                for part in self._generate_summary_parts(today, up_to):
+                    sent = self.telegram_notifier.run_sync(
+                        self.telegram_notifier.send_daily_summary(part)
+                    )
+                    if not sent:
+                        self.logger.warning(
+                            "📊 Resumen no enviado, se conserva para el siguiente"
+                        )
+                        return
+            except PERMANENT_ERRORS as e:
+                # Reintentarlo bloquearía los resúmenes de los días siguientes
+                self.logger.error(
+                    f"📊 Telegram rechazó el resumen, se descartan sus registros: {e}"
+                )
+                self.store.clear(up_to)
+                return
 
-            # Limpiar la lista después de enviar
-            self.daily_emails.clear()
+            # Borrar los registros incluidos después de enviar
+            self.store.clear(up_to)
             self.logger.info(f"📊 Resumen diario enviado para {today}")
 
         except Exception as e:
             self.logger.error(f"Error enviando resumen diario: {e}")
 
-    def _generate_summary_text(self, date_str: str) -> str:
-        """Genera el texto del resumen diario"""
-        total_emails = len(self.daily_emails)
-
-        # Agrupar por clasificación
-        by_label = {}
-        by_sender_group = {}
-
-        for email_data in self.daily_emails:
-            label = email_data.get("label", "Otros")
-            sender_group = email_data.get("sender_group", "Otros")
-
-            by_label[label] = by_label.get(label, 0) + 1
-            by_sender_group[sender_group] = by_sender_group.get(sender_group, 0) + 1
+    def _summary_lines(self, date_str: str, up_to: int) -> Iterator[str]:
+        """Líneas del resumen; el detalle se lee del almacén por bloques"""
+        # Agrupar por clasificación (en SQLite, sin cargar los registros)
+        counts = self.store.counts(up_to)
+        total_emails = counts.total
 
-        # Generar texto del resumen
-        summary = f"📊 <b>Resumen Diario - {date_str}</b>\n\n"
-        summary += f"📧 <b>Total de correos procesados:</b> {total_emails}\n\n"
+        yield f"📊 <b>Resumen Diario - {date_str}</b>\n\n"
+        yield f"📧 <b>Total de correos procesados:</b> {total_emails}\n\n"
 
         # Resumen por clasificación
-        summary += "🏷️ <b>Por clasificación:</b>\n"
-        for label, count in by_label.items():
-            summary += f"  • {label}: {count}\n"
-
-        summary += "\n👥 <b>Por grupos de remitentes:</b>\n"
-        for group, count in by_sender_group.items():
-            summary += f"  • {group}: {count}\n"
-
-        # Lista de correos
-        summary += f"\n📋 <b>Detalle de correos ({total_emails}):</b>\n"
-        for i, email_data in enumerate(self.daily_emails, 1):
-            sender = email_data.get("sender", "Desconocido")
-            subject = email_data.get("subject", "Sin asunto")
-            label = email_data.get("label", "Otros")
-            sender_group = email_data.get("sender_group", "Otros")
-
-            summary += f"{i}. <b>{sender}</b> ({sender_group})\n"
-            summary += f"   📝 {subject}\n"
-            summary += f"   🏷️ {label}\n\n"
+        yield "🏷️ <b>Por clasificación:</b>\n"
+        for label, count in counts.by_label.items():
+            yield f"  • {html.escape(str(label))}: {count}\n"
+
+        yield "\n👥 <b>Por grupos de remitentes:</b>\n"
+        for group, count in counts.by_sender_group.items():
+            yield f"  • {html.escape(str(group))}: {count}\n"
+
+        if counts.by_reason:
+            yield (
+                f"\n🔔 <b>Notificados ({sum(counts.by_reason.values())}) "
+                "por motivo:</b>\n"
+            )
+            for reason, count in counts.by_reason.items():
+                yield f"  • {html.escape(str(reason))}: {count}\n"
+
+        # Lista de correos (como mucho MAX_DETAIL)
+        yield f"\n📋 <b>Detalle de correos ({total_emails}):</b>\n"
+        for i, email_data in enumerate(self.store.iter_records(up_to), 1):
+            if i > self.MAX_DETAIL:
+                yield f"… y {total_emails - self.MAX_DETAIL} correos más\n"
+                return
+            sender = email_data.get("sender") or "Desconocido"
+            subject = email_data.get("subject") or "Sin asunto"
+            label = email_data.get("label") or "Otros"
+            sender_group = email_data.get("sender_group") or "Otros"
+            if len(subject) > 200:
+                subject = subject[:197] + "..."
+
+            yield (
+                f"{i}. <b>{html.escape(sender)}</b> ({html.escape(sender_group)})\n"
+                f"   📝 {html.escape(subject)}\n"
+                f"   🏷️ {html.escape(label)}\n\n"
+            )
 
-        return summary
+    def _generate_summary_parts(
+        self, date_str: str, up_to: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Texto del resumen diario con los registros hasta ``up_to``
+
+        Se genera por partes de como mucho ``MAX_MESSAGE_LENGTH`` caracteres
+        (el límite de un mensaje de Telegram), sin cortar ninguna línea.
+        """
+        if up_to is None:
+            up_to = self.store.last_id() or 0
+
+        part = ""
+        for line in self._summary_lines(date_str, up_to):
+            if part and len(part) + len(line) > self.MAX_MESSAGE_LENGTH:
+                yield part
+                part = ""
+            part += line
+        if part:
+            yield part
 
     def run_scheduler(self):
         """Ejecuta el scheduler en un hilo separado"""
@@ -307,32 +1262,59 @@ class DailySummaryManager:
         def run_schedule():
             while True:
                 schedule.run_pending()
+                # Guardar lo pendiente aunque no lleguen más correos
+                self.store.flush()
                 time.sleep(60)  # Revisar cada minuto
 
         scheduler_thread = threading.Thread(target=run_schedule, daemon=True)
         scheduler_thread.start()
         self.logger.info("🔄 Scheduler de resumen diario iniciado")
 
+    def close(self) -> None:
+        """Guarda los registros pendientes y cierra el almacén"""
+        self.store.close()
+
 
 class EmailMonitor:
     """Monitor principal de correos electrónicos"""
 
-    def __init__(self, config: Dict[str, str]):
+    # Cabeceras que se piden en el modo de descarga parcial
+    HEADER_FIELDS = ("SUBJECT", "FROM", "DATE", "MESSAGE-ID")
+    # Palabras clave que siempre notifican si no se configura NOTIFY_KEYWORDS
+    DEFAULT_KEYWORDS = ("urgente", "problema", "factura", "fallo", "error grave")
+
+    def __init__(
+        self,
+        config: Dict[str, str],
+        mailbox: str = "inbox",
+        classifier: Optional[EmailClassifier] = None,
+        sender_groups: Optional[SenderGroupManager] = None,
+        telegram_notifier: Optional[TelegramNotifier] = None,
+        daily_summary: Optional[DailySummaryManager] = None,
+        state_store: Optional[MailboxStateStore] = None,
+        cpu_executor: Optional[Executor] = None,
+        rule_table: Optional[RuleTable] = None,
+    ):
         self.config = config
+        self.mailbox = mailbox
         self.logger = logging.getLogger(__name__)
 
-        # Inicializar componentes
-        self.classifier = EmailClassifier(
-            config.get("LABEL_CANDIDATES", "Urgente,Importante,Otros")
-        )
-        self.sender_groups = SenderGroupManager()
-        self.telegram_notifier = TelegramNotifier(
-            config["TELEGRAM_TOKEN"], config["TELEGRAM_CHAT_ID"]
+        # Inicializar componentes (compartidos si se inyectan, p. ej. multicuenta)
+        self._owns_classifier = classifier is None
+        self.classifier = classifier or EmailClassifier.from_config(config)
+        self.sender_groups = sender_groups or SenderGroupManager()
+        self._owns_notifier = telegram_notifier is None
+        self.telegram_notifier = telegram_notifier or TelegramNotifier.from_config(
+            config
         )
 
         # Inicializar gestor de resumen diario
-        summary_time = config.get("DAILY_SUMMARY_TIME", "21:00")
-        self.daily_summary = DailySummaryManager(self.telegram_notifier, summary_time)
+        self._owns_summary = daily_summary is None
+        if daily_summary is None:
+            daily_summary = DailySummaryManager.from_config(
+                self.telegram_notifier, config
+            )
+        self.daily_summary = daily_summary
 
         # Configuración
         self.notify_domains = [
@@ -340,9 +1322,92 @@ class EmailMonitor:
             for d in config.get("NOTIFY_DOMAINS", "").split(",")
             if d.strip()
         ]
-        self.keywords = ["urgente", "problema", "factura", "fallo", "error grave"]
+        self.keywords = parse_keywords(
+            config.get("NOTIFY_KEYWORDS", ",".join(self.DEFAULT_KEYWORDS))
+        )
+        self.keyword_matcher = KeywordMatcher.from_lists({"notify": self.keywords})
+        # Reglas de usuario (RULES_FILE) y criterios de notificación
+        if rule_table is None:
+            rule_table = load_rules(config.get("RULES_FILE") or None)
+        self.rule_table = rule_table
+        self.decisions = NotifyDecisionEngine(
+            self.keyword_matcher, self.notify_domains, table=self.rule_table
+        )
+        # La descarga parcial pide también las cabeceras que usan las reglas
+        self.header_fields = self.HEADER_FIELDS + tuple(
+            sorted(
+                h.upper() for h in self.rule_table.headers
+                if h.upper() not in self.HEADER_FIELDS
+            )
+        )
+
+        # Reglas deterministas antes del modelo (CLASSIFY_TIERS)
+        self.cascade = ClassificationCascade(
+            self.classifier,
+            self.sender_groups,
+            self.notify_domains,
+            self.keywords,
+            tiers=parse_tiers(config.get("CLASSIFY_TIERS", ",".join(TIERS))),
+        )
+
+        # Sesión IMAP persistente (se conecta de manera lazy)
+        self.session = IMAPSession(
+            config.get("IMAP_SERVER", ""),
+            config.get("MAIL", ""),
+            config.get("PASS", ""),
+            mailbox=mailbox,
+        )
+
+        # Selección de correos nuevos: CONDSTORE, marca de agua de UIDs o UNSEEN
+        self.sync_mode = str(config.get("SYNC_MODE", "uid")).lower()
+        if self.sync_mode == "unseen":
+            self.sync = UnseenSync()
+        else:
+            state_store = state_store or MailboxStateStore(
+                config.get("STATE_FILE", "data/mailbox_state.json")
+            )
+            state_key = f"{self.session.user}@{self.session.server}/{mailbox}"
+            if self.sync_mode == "condstore":
+                self.sync = CondstoreSync(state_store, state_key)
+            else:
+                self.sync = UIDWatermarkSync(state_store, state_key)
+        self.session.select_hook = self.sync.prepare_select
+        self.use_idle = str(config.get("IMAP_IDLE", "true")).lower() in (
+            "1",
+            "true",
+            "yes",
+            "si",
+        )
+        self.idle_timeout = float(config.get("IDLE_TIMEOUT", 300))
+        self.check_interval = float(config.get("CHECK_INTERVAL", 5))
+        self.fetch_batch_size = int(config.get("FETCH_BATCH_SIZE", 200))
+        self.fetch_mode = str(config.get("FETCH_MODE", "full")).lower()
+        self.body_fetch_bytes = int(config.get("BODY_FETCH_BYTES", 4096))
+
+        # Pipeline por etapas: concurrencia por etapa y tamaño de las colas
+        self.pipeline_queue_size = int(config.get("PIPELINE_QUEUE_SIZE", 16))
+        self.parse_workers = int(config.get("PARSE_WORKERS", 1))
+        self.classify_workers = int(config.get("CLASSIFY_WORKERS", 1))
+        self.classify_batch_size = int(config.get("CLASSIFY_BATCH_SIZE", 8))
+        self.notify_workers = int(config.get("NOTIFY_WORKERS", 4))
+
+        # Un único hilo para IMAP: la conexión no admite uso concurrente
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"imap-{mailbox}"
+        )
+        # Parseo e inferencia (compartido entre buzones en modo multicuenta)
+        self._owns_cpu_executor = cpu_executor is None
+        self.cpu_executor = cpu_executor or ThreadPoolExecutor(
+            max_workers=self.parse_workers + self.classify_workers,
+            thread_name_prefix="cpu",
+        )
+        # Loop persistente del modo síncrono (check_emails): el cliente de
+        # Telegram, su cola y los resúmenes en curso sobreviven entre ciclos
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
 
-    def _decode_mixed_header(self, header: str) -> str:
+    @staticmethod
+    def _decode_mixed_header(header: str) -> str:
         """Decodifica headers de email con codificación mixta"""
         decoded_parts = decode_header(header or "")
         return "".join(
@@ -354,16 +1419,23 @@ class EmailMonitor:
             for part, enc in decoded_parts
         )
 
-    def _clean_text(self, text: str) -> str:
+    @staticmethod
+    def _clean_text(text: str) -> str:
         """Limpia texto eliminando espacios extra"""
         return re.sub(r"\s+", " ", text).strip()
 
-    def _get_domain(self, email_address: str) -> str:
+    @staticmethod
+    def _get_domain(email_address: str) -> str:
         """Extrae el dominio de una dirección de email"""
         return email_address.lower().split("@")[1] if "@" in email_address else ""
 
     def _extract_email_body(self, msg: email.message.Message) -> str:
         """Extrae el cuerpo del email manejando multipart"""
+        return self._clean_text(self._extract_raw_body(msg))
+
+    @staticmethod
+    def _extract_raw_body(msg: email.message.Message) -> str:
+        """Extrae el texto plano del email conservando los saltos de línea"""
         body = ""
 
         if msg.is_multipart():
@@ -381,159 +1453,323 @@ class EmailMonitor:
             charset = msg.get_content_charset() or "utf-8"
             body = msg.get_payload(decode=True).decode(charset, errors="ignore")
 
-        return self._clean_text(body)
+        return body
 
-    def _should_notify(self, email_msg: EmailMessage, label: str) -> bool:
+    def _should_notify(
+        self,
+        email_msg: EmailMessage,
+        label: str,
+        sender_group: Optional[str] = None,
+    ) -> bool:
         """Determina si se debe enviar notificación basándose en múltiples criterios"""
-        # Verificar clasificación de IA
-        if label != "Otros":
-            return True
-
-        # Verificar palabras clave
-        contenido_relevante = any(
-            keyword.lower() in field
-            for keyword, field in [
-                (kw, email_msg.subject.lower()) for kw in self.keywords
-            ]
-            + [(kw, email_msg.body.lower()) for kw in self.keywords]
+        if sender_group is None:
+            sender_group = self.sender_groups.get_label_for_sender(email_msg.sender)
+        return self.decisions.decide(
+            email_msg, Classification(label, sender_group)
+        ).notify
+
+    @classmethod
+    def parse_email(
+        cls, msg: email.message.Message, body: Optional[str] = None, size: int = 0
+    ) -> EmailMessage:
+        """Convierte un mensaje de email en un EmailMessage (sin conexión IMAP)"""
+        subject = cls._clean_text(cls._decode_mixed_header(msg["Subject"]))
+        from_ = msg.get("From")
+        sender = email.utils.parseaddr(from_)[1]
+        sender_domain = cls._get_domain(sender)
+        raw_body = cls._extract_raw_body(msg) if body is None else body
+
+        return EmailMessage(
+            subject=subject,
+            sender=sender,
+            sender_domain=sender_domain,
+            body=cls._clean_text(raw_body),
+            message_id=msg.get("Message-ID", ""),
+            date=msg.get("Date", ""),
+            raw_body=raw_body,
+            headers=frozenset(key.lower() for key in msg.keys()),
+            size=size,
         )
-        if contenido_relevante:
-            return True
-
-        # Verificar dominio
-        if email_msg.sender_domain in self.notify_domains:
-            return True
-
-        # Verificar grupo del remitente
-        sender_group = self.sender_groups.get_label_for_sender(email_msg.sender)
-        if sender_group != "Otros":
-            return True
-
-        return False
 
     def _process_email_message(
-        self, msg: email.message.Message
+        self, msg: email.message.Message, body: Optional[str] = None, size: int = 0
     ) -> Optional[EmailMessage]:
         """Procesa un mensaje de email y retorna un objeto EmailMessage"""
         try:
-            subject = self._clean_text(self._decode_mixed_header(msg["Subject"]))
-            from_ = msg.get("From")
-            sender = email.utils.parseaddr(from_)[1]
-            sender_domain = self._get_domain(sender)
-            body = self._extract_email_body(msg)
-
-            return EmailMessage(
-                subject=subject,
-                sender=sender,
-                sender_domain=sender_domain,
-                body=body,
-                message_id=msg.get("Message-ID", ""),
-                date=msg.get("Date", ""),
-            )
+            return self.parse_email(msg, body=body, size=size)
 
         except Exception as e:
             self.logger.error(f"Error procesando mensaje: {e}")
             return None
 
-    def check_emails(self) -> None:
-        """Revisa emails no leídos y envía notificaciones según criterios definidos"""
-        mail = None
-        try:
-            self.logger.info(f"Conectando a {self.config['IMAP_SERVER']}...")
-            mail = imaplib.IMAP4_SSL(self.config["IMAP_SERVER"])
-            mail.login(self.config["MAIL"], self.config["PASS"])
-            mail.select("inbox")
-
-            status, messages = mail.search(None, "(UNSEEN)")
+    def _fetch_messages(
+        self, mail: imaplib.IMAP4_SSL, uids: List[int]
+    ) -> Iterator[Tuple[int, Fetched]]:
+        """
+        Descarga los mensajes según FETCH_MODE y los produce en streaming como
+        ``(uid, (bytes, cuerpo, tamaño))``; el cuerpo solo viene ya extraído en
+        modo parcial
+        """
+        if self.fetch_mode == "partial":
+            return self._fetch_partial(mail, uids)
+        return self._fetch_full(mail, uids)
+
+    def _uid_fetch(
+        self, mail: imaplib.IMAP4_SSL, uids: List[int], items: str
+    ) -> Iterator[Dict]:
+        """Ejecuta UID FETCH por bloques y produce la respuesta de cada mensaje"""
+        for uid_set in chunk_uid_sets(uids, self.fetch_batch_size):
+            status, data = mail.uid("FETCH", uid_set, items)
             if status != "OK":
-                self.logger.warning("No se pudieron buscar correos.")
-                return
+                self.logger.warning(f"No se pudieron descargar los UIDs {uid_set}")
+                continue
+            for item in iter_fetch_responses(data):
+                if item.get("UID") is not None:
+                    yield item
+
+    def _fetch_full(
+        self, mail: imaplib.IMAP4_SSL, uids: List[int]
+    ) -> Iterator[Tuple[int, Fetched]]:
+        """Descarga el RFC822 completo de cada mensaje"""
+        for item in self._uid_fetch(mail, uids, "(UID RFC822)"):
+            raw = item.get("RFC822")
+            if isinstance(raw, bytes):
+                yield int(item["UID"]), (raw, None, len(raw))
+
+    def _fetch_partial(
+        self, mail: imaplib.IMAP4_SSL, uids: List[int]
+    ) -> Iterator[Tuple[int, Fetched]]:
+        """
+        Descarga cabeceras, RFC822.SIZE y BODYSTRUCTURE y después solo la
+        primera parte text/plain limitada a BODY_FETCH_BYTES. Usa BODY.PEEK, así
+        que no marca los mensajes como leídos.
+        """
+        headers: Dict[int, bytes] = {}
+        sizes: Dict[int, Optional[int]] = {}
+        text_parts: Dict[int, Optional[TextPart]] = {}
+        items = (
+            "(UID RFC822.SIZE "
+            f"BODY.PEEK[HEADER.FIELDS ({' '.join(self.header_fields)})] "
+            "BODYSTRUCTURE)"
+        )
+        for item in self._uid_fetch(mail, uids, items):
+            uid = int(item["UID"])
+            header_key = next((k for k in item if k.startswith("BODY[HEADER")), None)
+            headers[uid] = item.get(header_key) or b""
+            size = item.get("RFC822.SIZE")
+            sizes[uid] = (
+                int(size) if isinstance(size, bytes) and size.isdigit() else None
+            )
+            text_parts[uid] = find_text_part(item.get("BODYSTRUCTURE"))
+
+        # Agrupar por sección para pedir todos los cuerpos iguales en un solo FETCH
+        by_section: Dict[str, List[int]] = {}
+        for uid, part in text_parts.items():
+            if part is not None:
+                by_section.setdefault(part.section, []).append(uid)
+
+        bodies: Dict[int, str] = {}
+        for section, section_uids in by_section.items():
+            items = f"(UID BODY.PEEK[{section}]<0.{self.body_fetch_bytes}>)"
+            for item in self._uid_fetch(mail, section_uids, items):
+                uid = int(item["UID"])
+                data = next(
+                    (v for k, v in item.items() if k.startswith(f"BODY[{section}]")),
+                    None,
+                )
+                part = text_parts[uid]
+                if isinstance(data, bytes) and part is not None:
+                    bodies[uid] = decode_partial_body(
+                        data, part.encoding, part.charset
+                    )
+
+        for uid in sorted(headers):
+            yield uid, (headers[uid], bodies.get(uid, ""), sizes[uid])
+
+    def _parse_message(self, fetched: Fetched) -> Optional[EmailMessage]:
+        """Etapa de parseo: convierte los bytes descargados en un EmailMessage"""
+        raw, body, size = fetched
+        if size is None:
+            # El servidor no envió RFC822.SIZE: al menos lo descargado
+            size = len(raw) + (len(body.encode("utf-8")) if body else 0)
+        return self._process_email_message(
+            email.message_from_bytes(raw), body=body, size=size
+        )
+
+    def _classify_message(self, email_msg: EmailMessage) -> Classification:
+        """Etapa de clasificación: etiqueta, grupo del remitente y nivel que decidió"""
+        return self._classify_messages([email_msg])[0]
+
+    def _classify_messages(self, email_msgs: List[EmailMessage]) -> List[Classification]:
+        """Clasifica un lote: reglas primero y el modelo solo para los ambiguos"""
+        return self.cascade.classify_batch(email_msgs)
+
+    async def _deliver(
+        self, email_msg: EmailMessage, classification: Classification
+    ) -> None:
+        """Etapa de entrega: notifica si corresponde y registra en el resumen"""
+        label = classification.label
+
+        # Una sola evaluación de los criterios para la notificación, el log y el resumen
+        decision = self.decisions.decide(email_msg, classification)
+        # Una regla ``route`` cambia el grupo con el que se notifica y se resume
+        sender_group = decision.sender_group or classification.sender_group
+        self.logger.debug(
+            f"Remitente: {email_msg.sender} | Grupo: {sender_group} | "
+            f"Etiqueta: {label} (nivel: {classification.tier}) | "
+            f"Decisión en {decision.total_ms:.3f} ms"
+        )
+
+        if decision.notify:
+            snippet = email_msg.body[:200] + ("..." if len(email_msg.body) > 200 else "")
+            self.logger.info(
+                f"✅ ENVIANDO NOTIFICACIÓN - Motivo: {decision.reason} "
+                f"({decision.rule})"
+            )
+            await self.telegram_notifier.send_notification(
+                email_msg.subject,
+                email_msg.sender,
+                snippet,
+                label,
+                sender_group,
+                wait=False,
+                priority=decision.priority,
+            )
+        else:
+            self.logger.info(
+                f"❌ NO se envía notificación - Motivo: {decision.reason}"
+                + (f" ({decision.rule})" if decision.rule else "")
+            )
 
-            email_ids = messages[0].split()
+        # Registrar email en el resumen diario
+        email_data = {
+            'sender': email_msg.sender,
+            'subject': email_msg.subject,
+            'label': label,
+            'sender_group': sender_group,
+            'date': email_msg.date,
+            'notified': decision.notify,
+            'reason': decision.reason,
+            'rule': decision.rule,
+        }
+        self.daily_summary.add_email(email_data)
+
+        self.logger.info(
+            f"Etiqueta: {label} | Grupo: {sender_group} | De: {email_msg.sender} | Asunto: {email_msg.subject[:50]}..."
+        )
+
+    async def check_emails_async(self) -> None:
+        """Revisa emails nuevos y los procesa con el pipeline por etapas"""
+        loop = asyncio.get_running_loop()
+        try:
+            mail = await loop.run_in_executor(
+                self.io_executor, self.session.ensure_connected
+            )
+            uids = await loop.run_in_executor(
+                self.io_executor, self.sync.pending_uids, mail, self.session
+            )
 
-            if not email_ids:
+            if not uids:
                 self.logger.info("No hay correos nuevos.")
+                self.classifier.adjust_for_backlog(
+                    0, source=f"{self.session.user}/{self.mailbox}"
+                )
                 return
 
-            self.logger.info(f"Procesando {len(email_ids)} correos nuevos...")
-
-            for e_id in email_ids:
-                _, msg_data = mail.fetch(e_id, "(RFC822)")
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        try:
-                            msg = email.message_from_bytes(response_part[1])
-                            email_msg = self._process_email_message(msg)
-
-                            if email_msg is None:
-                                continue
-
-                            # Clasificar email
-                            label = self.classifier.classify(
-                                email_msg.subject, email_msg.body
-                            )
-
-                            # Obtener grupo del remitente
-                            sender_group = self.sender_groups.get_label_for_sender(
-                                email_msg.sender
-                            )
-
-                            # Debug information
-                            self.logger.debug(f"Remitente: {email_msg.sender}")
-                            self.logger.debug(f"Grupo del remitente: {sender_group}")
-                            self.logger.debug(f"IA Label: {label}")
-                            self.logger.debug(
-                                f"Dominio en lista: {email_msg.sender_domain in self.notify_domains}"
-                            )
-
-                            # Verificar si debe notificar
-                            if self._should_notify(email_msg, label):
-                                snippet = email_msg.body[:200] + (
-                                    "..." if len(email_msg.body) > 200 else ""
-                                )
-                                self.logger.info(
-                                    f"✅ ENVIANDO NOTIFICACIÓN - Motivo: {'IA' if label != 'Otros' else 'Grupo' if sender_group != 'Otros' else 'Palabras clave' if any(kw in email_msg.subject.lower() or kw in email_msg.body.lower() for kw in self.keywords) else 'Dominio' if email_msg.sender_domain in self.notify_domains else 'Urgente'}"
-                                )
-
-                                asyncio.run(
-                                    self.telegram_notifier.send_notification(
-                                        email_msg.subject,
-                                        email_msg.sender,
-                                        snippet,
-                                        label,
-                                        sender_group,
-                                    )
-                                )
-                            else:
-                                self.logger.info(
-                                    f"❌ NO se envía notificación - Todos los criterios son False"
-                                )
-
-                            # Registrar email en el resumen diario
-                            email_data = {
-                                'sender': email_msg.sender,
-                                'subject': email_msg.subject,
-                                'label': label,
-                                'sender_group': sender_group,
-                                'date': email_msg.date
-                            }
-                            self.daily_summary.add_email(email_data)
-
-                            self.logger.info(
-                                f"Etiqueta: {label} | Grupo: {sender_group} | De: {email_msg.sender} | Asunto: {email_msg.subject[:50]}..."
-                            )
-
-                        except Exception as e:
-                            self.logger.error(f"Fallo al procesar correo: {e}")
+            self.logger.info(f"Procesando {len(uids)} correos nuevos...")
+            self.classifier.adjust_for_backlog(
+                len(uids), source=f"{self.session.user}/{self.mailbox}"
+            )
+
+            pipeline = EmailPipeline(
+                fetch=lambda: self._fetch_messages(mail, uids),
+                parse=self._parse_message,
+                classify=self._classify_message,
+                classify_batch=self._classify_messages,
+                classify_batch_size=self.classify_batch_size,
+                deliver=self._deliver,
+                io_executor=self.io_executor,
+                cpu_executor=self.cpu_executor,
+                queue_size=self.pipeline_queue_size,
+                parse_workers=self.parse_workers,
+                classify_workers=self.classify_workers,
+                deliver_workers=self.notify_workers,
+                on_done=self.sync.mark_processed,
+                on_failed=self.sync.mark_failed,
+            )
+            stats = await pipeline.run()
+
+            if stats.classified:
+                for report in (
+                    self.classifier.cache_report(),
+                    self.classifier.inference_report(),
+                ):
+                    if report:
+                        self.logger.info(report)
+                tiers = ", ".join(
+                    f"{TIER_REASONS[tier]}: {count}"
+                    for tier, count in self.cascade.report().items()
+                )
+                self.logger.info(f"🪜 Correos decididos por nivel: {tiers}")
 
+        except CONNECTION_ERRORS as e:
+            self.logger.error(f"Conexión IMAP interrumpida: {e}")
+            self.session.invalidate()
         except Exception as e:
             self.logger.error(f"Error al revisar correos: {e}")
         finally:
-            if mail:
-                try:
-                    mail.logout()
-                except:
-                    pass
+            # Guardar el progreso aunque el ciclo se haya interrumpido
+            self.sync.commit()
+
+    def check_emails(self) -> None:
+        """Revisa emails no leídos y envía notificaciones según criterios definidos"""
+        future = asyncio.run_coroutine_threadsafe(
+            self.check_emails_async(), self._ensure_loop()
+        )
+        future.result()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Arranca (una sola vez) el loop de los ciclos síncronos en un hilo"""
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(
+                target=loop.run_forever, name=f"monitor-{self.mailbox}", daemon=True
+            )
+            self._loop_thread.start()
+            self._loop = loop
+        return self._loop
+
+    def wait_for_new_mail(self) -> bool:
+        """Espera correo nuevo con IDLE o, si no está disponible, con polling"""
+        if not self.use_idle:
+            time.sleep(self.check_interval)
+            return False
+        return self.session.wait_for_changes(self.idle_timeout, self.check_interval)
+
+    async def wait_for_new_mail_async(self) -> bool:
+        """Versión asíncrona de wait_for_new_mail (usa el hilo IMAP del buzón)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, self.wait_for_new_mail)
+
+    def close(self) -> None:
+        """Cierra la sesión IMAP persistente y los executors propios"""
+        self.session.close()
+        self.io_executor.shutdown(wait=False)
+        if self._owns_cpu_executor:
+            self.cpu_executor.shutdown(wait=False)
+        if self._owns_notifier:
+            self.telegram_notifier.close()
+        if self._owns_classifier:
+            self.classifier.close()
+        if self._owns_summary:
+            self.daily_summary.close()
+        # El notificador ya envió lo pendiente en este loop: ahora se detiene
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+            self._loop_thread = None
 
     async def test_telegram_connection(self) -> bool:
         """Prueba la conexión a Telegram"""
@@ -0,0 +1,231 @@
+"""
+Utilidades del protocolo IMAP: conjuntos de mensajes, parseo de respuestas FETCH
+y localización de partes en BODYSTRUCTURE
+"""
+
+import base64
+import binascii
+import itertools
+import quopri
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Tokens de una respuesta FETCH. Los átomos admiten secciones entre corchetes
+# con espacios y paréntesis, p. ej. BODY[HEADER.FIELDS (SUBJECT FROM)]<0>
+_TOKEN_RE = re.compile(
+    rb'\s*(?:(?P<open>\()|(?P<close>\))|"(?P<quoted>(?:[^"\\]|\\.)*)"'
+    rb'|(?P<atom>(?:[^\s()"\[\]]|\[[^\]]*\])+))'
+)
+_LITERAL_RE = re.compile(rb"^\{(\d+)\}$")
+_QUOTED_ESCAPE_RE = re.compile(rb"\\(.)")
+
+
+def compress_uid_set(uids: Iterable[int]) -> str:
+    """
+    Convierte una lista de UIDs en un conjunto de mensajes IMAP compacto
+
+    Ejemplo: [1, 2, 3, 5, 7, 8] -> "1:3,5,7:8"
+    """
+    ranges: List[str] = []
+    start = prev = None
+    for uid in sorted(set(int(u) for u in uids)):
+        if start is None:
+            start = prev = uid
+        elif uid == prev + 1:
+            prev = uid
+        else:
+            ranges.append(f"{start}:{prev}" if start != prev else str(start))
+            start = prev = uid
+    if start is not None:
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+    return ",".join(ranges)
+
+
+def chunk_uid_sets(uids: Iterable[int], chunk_size: int) -> Iterator[str]:
+    """Divide los UIDs en bloques de ``chunk_size`` y los comprime como conjuntos"""
+    ordered = sorted(set(int(u) for u in uids))
+    chunk_size = max(1, int(chunk_size))
+    for i in range(0, len(ordered), chunk_size):
+        yield compress_uid_set(ordered[i : i + chunk_size])
+
+
+def count_uid_set(uid_set) -> int:
+    """Cuenta los UIDs de un conjunto como ``1:3,5`` (ignora ``(EARLIER)``)"""
+    if isinstance(uid_set, bytes):
+        uid_set = uid_set.decode("ascii", errors="ignore")
+    total = 0
+    for token in str(uid_set).replace("(EARLIER)", "").strip().split(","):
+        start, _, end = token.strip().partition(":")
+        if start.isdigit() and (not end or end.isdigit()):
+            total += abs(int(end) - int(start)) + 1 if end else 1
+    return total
+
+
+def parse_uid_list(data: List[Optional[bytes]]) -> List[int]:
+    """Parsea la respuesta de ``UID SEARCH`` como lista de enteros"""
+    uids: List[int] = []
+    for line in data or []:
+        if isinstance(line, bytes):
+            uids.extend(int(token) for token in line.split() if token.isdigit())
+    return uids
+
+
+class _FetchParser:
+    """Parser incremental de respuestas FETCH tal como las entrega imaplib"""
+
+    def __init__(self):
+        self._stack: List[list] = []
+        self._seq: Optional[int] = None
+
+    def feed(self, text: bytes, literal: Optional[bytes] = None) -> Iterator[Dict]:
+        """Procesa un fragmento de la respuesta y produce los mensajes completos"""
+        pos = 0
+        while pos < len(text):
+            match = _TOKEN_RE.match(text, pos)
+            if match is None or match.end() == pos:
+                break
+            pos = match.end()
+
+            if match.group("open") is not None:
+                self._stack.append([])
+            elif match.group("close") is not None:
+                if not self._stack:
+                    continue
+                finished = self._stack.pop()
+                if self._stack:
+                    self._stack[-1].append(finished)
+                else:
+                    yield self._build_message(finished)
+            elif match.group("quoted") is not None:
+                value = _QUOTED_ESCAPE_RE.sub(rb"\1", match.group("quoted"))
+                self._append(value)
+            else:
+                atom = match.group("atom")
+                if literal is not None and _LITERAL_RE.match(atom):
+                    self._append(literal)
+                    literal = None
+                elif not self._stack:
+                    # Número de secuencia que precede a la lista de atributos
+                    self._seq = int(atom) if atom.isdigit() else None
+                else:
+                    self._append(None if atom.upper() == b"NIL" else atom)
+
+    def _append(self, value) -> None:
+        if self._stack:
+            self._stack[-1].append(value)
+
+    def _build_message(self, items: list) -> Dict:
+        message: Dict = {"SEQ": self._seq}
+        for i in range(0, len(items) - 1, 2):
+            key = items[i]
+            if isinstance(key, bytes):
+                message[key.decode("ascii", errors="ignore").upper()] = items[i + 1]
+        self._seq = None
+        return message
+
+
+def iter_fetch_responses(data: List) -> Iterator[Dict]:
+    """
+    Recorre una respuesta FETCH de imaplib produciendo un dict por mensaje
+
+    imaplib entrega los literales como tuplas ``(cabecera, literal)`` y el resto
+    de la línea como bytes sueltos; aquí se reconstruye cada mensaje en streaming.
+    Las claves se normalizan en mayúsculas (``UID``, ``RFC822``, ``FLAGS``...).
+    """
+    parser = _FetchParser()
+    for part in data or []:
+        if isinstance(part, tuple):
+            yield from parser.feed(part[0], part[1])
+        elif isinstance(part, bytes):
+            yield from parser.feed(part)
+
+
+@dataclass
+class TextPart:
+    """Parte de texto localizada dentro de un BODYSTRUCTURE"""
+
+    section: str
+    charset: str
+    encoding: str
+    size: int
+
+
+def _as_str(value) -> str:
+    return value.decode("utf-8", errors="ignore") if isinstance(value, bytes) else ""
+
+
+def _part_params(part: list) -> Dict[str, str]:
+    params = part[2] if len(part) > 2 and isinstance(part[2], list) else []
+    return {
+        _as_str(params[i]).lower(): _as_str(params[i + 1])
+        for i in range(0, len(params) - 1, 2)
+    }
+
+
+def _is_attachment(part: list) -> bool:
+    # En partes text/* la disposición va tras el número de líneas y el MD5
+    index = 9 if _as_str(part[0]).lower() == "text" else 8
+    disposition = part[index] if len(part) > index else None
+    return (
+        isinstance(disposition, list)
+        and bool(disposition)
+        and _as_str(disposition[0]).lower() == "attachment"
+    )
+
+
+def find_text_part(
+    bodystructure: list, subtype: str = "plain", prefix: str = ""
+) -> Optional[TextPart]:
+    """
+    Busca la primera parte text/<subtype> que no sea un adjunto
+
+    Devuelve la sección IMAP a pedir (``1``, ``1.2``...) junto con el charset y
+    la codificación de transferencia necesarios para decodificarla.
+    """
+    if not isinstance(bodystructure, list) or not bodystructure:
+        return None
+
+    if isinstance(bodystructure[0], list):
+        # Multipart: las subpartes van primero, seguidas del subtipo y extensiones
+        children = itertools.takewhile(lambda c: isinstance(c, list), bodystructure)
+        for index, child in enumerate(children, 1):
+            section = f"{prefix}.{index}" if prefix else str(index)
+            found = find_text_part(child, subtype, section)
+            if found is not None:
+                return found
+        return None
+
+    if (
+        _as_str(bodystructure[0]).lower() != "text"
+        or _as_str(bodystructure[1]).lower() != subtype
+        or _is_attachment(bodystructure)
+    ):
+        return None
+
+    size = bodystructure[6] if len(bodystructure) > 6 else b"0"
+    return TextPart(
+        section=prefix or "1",
+        charset=_part_params(bodystructure).get("charset") or "utf-8",
+        encoding=_as_str(bodystructure[5]).lower() or "7bit",
+        size=int(size) if isinstance(size, bytes) and size.isdigit() else 0,
+    )
+
+
+def decode_partial_body(data: bytes, encoding: str, charset: str) -> str:
+    """Decodifica un fragmento de cuerpo que puede estar truncado"""
+    if encoding == "base64":
+        compact = re.sub(rb"[^A-Za-z0-9+/=]", b"", data)
+        # Descartar el grupo incompleto final que deja el recorte
+        compact = compact[: len(compact) - len(compact) % 4]
+        try:
+            data = base64.b64decode(compact)
+        except (binascii.Error, ValueError):
+            data = b""
+    elif encoding == "quoted-printable":
+        data = quopri.decodestring(data)
+
+    try:
+        return data.decode(charset, errors="ignore")
+    except LookupError:
+        return data.decode("utf-8", errors="ignore")
@@ -0,0 +1,273 @@
+"""
+Sesión IMAP persistente con soporte de IDLE (RFC 2177) y reconexión automática
+"""
+
+import imaplib
+import select
+import socket
+import ssl
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+# Errores que indican que la conexión ya no es utilizable y hay que reconectar
+CONNECTION_ERRORS = (imaplib.IMAP4.abort, OSError, EOFError)
+
+
+class IMAPSession:
+    """Mantiene una única conexión IMAP autenticada y con el buzón seleccionado"""
+
+    def __init__(
+        self,
+        server: str,
+        user: str,
+        password: str,
+        mailbox: str = "inbox",
+        reconnect_delay: float = 5.0,
+        max_reconnect_delay: float = 300.0,
+        select_hook: Optional[Callable[[imaplib.IMAP4_SSL, tuple], Optional[str]]] = None,
+    ):
+        self.server = server
+        self.user = user
+        self.password = password
+        self.mailbox = mailbox
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        # Permite activar extensiones y añadir parámetros a SELECT (CONDSTORE...)
+        self.select_hook = select_hook
+        self.connection: Optional[imaplib.IMAP4_SSL] = None
+        self.capabilities: tuple = ()
+        self.select_info: Dict[str, int] = {}
+        self.select_responses: Dict[str, List] = {}
+        self._failures = 0
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def connected(self) -> bool:
+        """Indica si hay una conexión abierta"""
+        return self.connection is not None
+
+    def supports(self, capability: str) -> bool:
+        """Indica si el servidor anuncia una capacidad (IDLE, CONDSTORE...)"""
+        return capability.upper() in self.capabilities
+
+    def connect(self) -> imaplib.IMAP4_SSL:
+        """Abre la conexión, se autentica y selecciona el buzón"""
+        self.close()
+        self.logger.info(f"Conectando a {self.server}...")
+        connection = imaplib.IMAP4_SSL(self.server)
+        try:
+            connection.login(self.user, self.password)
+            # Las capacidades pueden cambiar tras autenticarse
+            self.capabilities = self._read_capabilities(connection)
+
+            params = None
+            if self.select_hook is not None:
+                params = self.select_hook(connection, self.capabilities)
+            mailbox = self._quoted_mailbox()
+            if params:
+                mailbox = f"{mailbox} {params}"
+            result = connection.select(mailbox)
+            if isinstance(result, tuple) and result[0] != "OK":
+                raise imaplib.IMAP4.error(f"No se pudo seleccionar {self.mailbox}")
+
+            self.select_info = self._read_select_info(connection)
+            self.select_responses = {
+                key: self._pop_response(connection, key)
+                for key in ("FETCH", "VANISHED")
+            }
+        except Exception:
+            try:
+                connection.logout()
+            except Exception:
+                pass
+            raise
+
+        self.connection = connection
+        self._failures = 0
+        self.logger.info(f"🔌 Sesión IMAP establecida con {self.server}")
+        return connection
+
+    def _quoted_mailbox(self) -> str:
+        """Entrecomilla el nombre del buzón si contiene espacios o especiales"""
+        if self.mailbox and not any(c in self.mailbox for c in ' "()\\{%*'):
+            return self.mailbox
+        escaped = self.mailbox.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{escaped}"'
+
+    def _read_capabilities(self, connection: imaplib.IMAP4_SSL) -> tuple:
+        """Obtiene las capacidades anunciadas tras la autenticación"""
+        capabilities = getattr(connection, "capabilities", ()) or ()
+        try:
+            typ, data = connection.capability()
+            if typ == "OK" and data and isinstance(data[-1], bytes):
+                capabilities = data[-1].decode("ascii", errors="ignore").split()
+        except (TypeError, ValueError, imaplib.IMAP4.error):
+            pass
+        return tuple(str(c).upper() for c in capabilities)
+
+    def _pop_response(self, connection: imaplib.IMAP4_SSL, key: str) -> List:
+        """Retira una respuesta no etiquetada acumulada por imaplib"""
+        try:
+            _, data = connection.response(key)
+        except (TypeError, ValueError):
+            return []
+        return [item for item in data or [] if item is not None]
+
+    def take_select_responses(self) -> Dict[str, List]:
+        """Entrega una sola vez las respuestas FETCH/VANISHED recibidas al seleccionar"""
+        responses, self.select_responses = self.select_responses, {}
+        return responses
+
+    def _read_select_info(self, connection: imaplib.IMAP4_SSL) -> Dict[str, int]:
+        """Extrae UIDVALIDITY, UIDNEXT y similares de la respuesta a SELECT"""
+        info: Dict[str, int] = {}
+        for key in ("EXISTS", "UIDVALIDITY", "UIDNEXT", "HIGHESTMODSEQ"):
+            try:
+                _, data = connection.response(key)
+                value = data[-1] if data and data[-1] is not None else None
+                if isinstance(value, bytes):
+                    value = value.split()[0]
+                if value is not None:
+                    info[key] = int(value)
+            except (TypeError, ValueError, IndexError):
+                continue
+        return info
+
+    def ensure_connected(self) -> imaplib.IMAP4_SSL:
+        """Devuelve la conexión activa, reconectando si es necesario"""
+        if self.connection is not None:
+            return self.connection
+
+        # Espera exponencial tras fallos consecutivos para no saturar el servidor
+        if self._failures:
+            delay = min(
+                self.reconnect_delay * (2 ** (self._failures - 1)),
+                self.max_reconnect_delay,
+            )
+            self.logger.info(f"Reintentando conexión IMAP en {delay:.0f}s...")
+            time.sleep(delay)
+
+        try:
+            return self.connect()
+        except Exception:
+            self._failures += 1
+            raise
+
+    def invalidate(self) -> None:
+        """Descarta la conexión actual para forzar una reconexión en el próximo uso"""
+        if self.connection is not None:
+            self.logger.warning("Conexión IMAP perdida, se reconectará")
+        self.close()
+
+    def close(self) -> None:
+        """Cierra la sesión de manera ordenada"""
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        try:
+            connection.logout()
+        except Exception:
+            pass
+
+    def idle(self, timeout: float) -> bool:
+        """
+        Espera en modo IDLE hasta que llegue correo o expire el timeout
+
+        Args:
+            timeout: Segundos máximos de espera antes de renovar el IDLE
+
+        Returns:
+            True si el servidor notificó cambios en el buzón (EXISTS/RECENT)
+        """
+        connection = self.ensure_connected()
+        tag = connection._new_tag()
+        connection.send(tag + b" IDLE\r\n")
+
+        line = connection.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("conexión cerrada al iniciar IDLE")
+        if not line.startswith(b"+"):
+            raise imaplib.IMAP4.error(f"IDLE rechazado: {line!r}")
+
+        has_changes = False
+        sock = connection.socket()
+        deadline = time.monotonic() + timeout
+        while not has_changes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # select() sobre el socket evita dejar el fichero en estado de timeout,
+            # pero no ve lo que imaplib ya leyó (p. ej. EXISTS junto al "+ idling")
+            pending = getattr(sock, "pending", lambda: 0)()
+            if not pending and not self._buffered(connection, sock):
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if not readable:
+                    break
+            line = connection.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("conexión cerrada durante IDLE")
+            self.logger.debug(f"IDLE: {line.strip()!r}")
+            if line.startswith(b"* BYE"):
+                raise imaplib.IMAP4.abort("el servidor cerró la sesión durante IDLE")
+            if line.startswith(b"*") and (b"EXISTS" in line or b"RECENT" in line):
+                has_changes = True
+
+        connection.send(b"DONE\r\n")
+        self._read_tagged_response(connection, tag)
+        return has_changes
+
+    @staticmethod
+    def _buffered(connection: imaplib.IMAP4_SSL, sock: socket.socket) -> bool:
+        """Indica si hay datos esperando en el búfer de lectura de imaplib"""
+        file = getattr(connection, "file", None)
+        if file is None or not hasattr(file, "peek"):
+            return False
+        # Sin bloquear: si el búfer está vacío peek() intentaría leer del socket
+        timeout = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            return bool(file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(timeout)
+
+    def _read_tagged_response(self, connection: imaplib.IMAP4_SSL, tag: bytes) -> None:
+        """Consume las respuestas pendientes hasta la respuesta etiquetada de IDLE"""
+        while True:
+            line = connection.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("conexión cerrada al terminar IDLE")
+            if line.startswith(tag):
+                if b" OK" not in line:
+                    raise imaplib.IMAP4.error(f"IDLE terminó con error: {line!r}")
+                return
+
+    def wait_for_changes(self, idle_timeout: float, poll_interval: float) -> bool:
+        """
+        Bloquea hasta que haya correo nuevo o venza el intervalo de espera
+
+        Usa IDLE si el servidor lo soporta; si no, duerme ``poll_interval``
+        segundos. Las desconexiones invalidan la sesión para reconectar después.
+        """
+        try:
+            self.ensure_connected()
+        except Exception as e:
+            self.logger.error(f"No se pudo conectar a {self.server}: {e}")
+            return False
+
+        if not self.supports("IDLE"):
+            time.sleep(poll_interval)
+            return False
+
+        try:
+            return self.idle(idle_timeout)
+        except (socket.timeout, *CONNECTION_ERRORS) as e:
+            self.logger.warning(f"IDLE interrumpido: {e}")
+            self.invalidate()
+        except imaplib.IMAP4.error as e:
+            self.logger.warning(f"IDLE no disponible, usando polling: {e}")
+            self.capabilities = tuple(c for c in self.capabilities if c != "IDLE")
+            time.sleep(poll_interval)
+        return False
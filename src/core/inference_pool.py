@@ -0,0 +1,333 @@
+"""
+Pool de procesos de inferencia para el clasificador
+
+Cada proceso carga el modelo una sola vez y atiende peticiones por una
+``Pipe`` propia, así que la inferencia no compite por el GIL con IMAP ni con
+Telegram y puede usar varios núcleos. Una petición que supera el tiempo
+máximo mata al proceso; los procesos caídos se reinician con un límite de
+reinicios por ventana de tiempo.
+"""
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+
+class InferenceError(Exception):
+    """La inferencia falló dentro del proceso o el proceso no está disponible"""
+
+
+class InferenceTimeout(InferenceError):
+    """La petición superó el tiempo máximo y el proceso se reinició"""
+
+
+def _worker_main(conn, loader: Callable[[Dict], Any], options: Dict) -> None:
+    """
+    Bucle de un proceso de inferencia
+
+    Responde ``("loaded", error)`` tras cada carga del modelo y
+    ``("ok", resultado)`` o ``("error", mensaje)`` por cada petición. El
+    modelo se vuelve a cargar si cambian las opciones o si la petición lo
+    pide (``reload``) tras un fallo de carga.
+    """
+
+    def load(options: Dict):
+        try:
+            model = loader(options)
+            error = None if model is not None else "modelo no disponible"
+            conn.send(("loaded", error))
+            return model
+        except Exception as e:
+            conn.send(("loaded", str(e)))
+            return None
+
+    model = load(options)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if job is None:
+            break
+        job_options, texts, labels, batch_size, reload = job
+        if job_options != options or reload:
+            options = job_options
+            model = load(options)
+        if model is None:
+            conn.send(("error", "modelo no disponible"))
+            continue
+        try:
+            result = model(texts, candidate_labels=labels, batch_size=batch_size)
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+@dataclass
+class _Worker:
+    """Proceso de inferencia y su extremo de la tubería"""
+
+    index: int
+    process: Any = None
+    conn: Any = None
+    # Opciones del último modelo pedido al proceso
+    options: Optional[Dict] = None
+    # Cargas cuyo ``("loaded", ...)`` aún no se ha leído
+    pending_loads: int = 0
+    # Fallos de carga seguidos y momento a partir del cual se reintenta
+    load_failures: int = 0
+    retry_at: float = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+@dataclass
+class PoolStats:
+    """Contadores del pool desde el arranque"""
+
+    completed: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    restarts: int = 0
+
+
+class InferencePool:
+    """
+    Procesos de inferencia con reinicio de los que caen o se bloquean
+
+    ``loader(options)`` se ejecuta dentro de cada proceso y devuelve un
+    callable con el contrato del pipeline ``zero-shot-classification`` (o
+    None si no hay modelo). Debe poder importarse por nombre, ya que los
+    procesos se crean con ``spawn``. Si cambian las opciones (otro modelo),
+    el proceso recarga el modelo en la siguiente petición.
+
+    ``classify`` bloquea hasta tener el resultado, así que se llama desde
+    los hilos del executor de clasificación; como mucho hay ``workers``
+    peticiones en curso y el resto espera un proceso libre.
+
+    Si un proceso no consigue cargar el modelo, la primera petición tras
+    ``load_retry`` segundos le pide que lo intente de nuevo; la espera se
+    duplica con cada fallo seguido hasta ``max_load_retry``.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[Dict], Any],
+        workers: int = 1,
+        timeout: float = 60.0,
+        load_timeout: float = 600.0,
+        max_restarts: int = 5,
+        restart_window: float = 300.0,
+        load_retry: float = 60.0,
+        max_load_retry: float = 1800.0,
+    ):
+        self.loader = loader
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.load_timeout = load_timeout
+        self.max_restarts = max(0, int(max_restarts))
+        self.restart_window = restart_window
+        self.load_retry = max(0.0, float(load_retry))
+        self.max_load_retry = max_load_retry
+        self.stats = PoolStats()
+        self.logger = logging.getLogger(__name__)
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._restart_times: Deque[float] = deque()
+        self._lock = threading.Lock()
+        self._closed = False
+        # Peticiones en curso (no se liberan los procesos mientras haya alguna)
+        self._busy = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self, options: Dict) -> None:
+        """Arranca los procesos; cada uno empieza a cargar el modelo al momento"""
+        with self._lock:
+            self._start(options)
+
+    def _start(self, options: Dict) -> None:
+        if self._workers or self._closed:
+            return
+        for index in range(self.workers):
+            worker = _Worker(index)
+            self._spawn(worker, options)
+            self._workers.append(worker)
+            self._idle.put(worker)
+        self.logger.info(f"🧠 Pool de inferencia iniciado con {self.workers} procesos")
+
+    def _spawn(self, worker: _Worker, options: Dict) -> None:
+        parent, child = self._context.Pipe()
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(child, self.loader, options),
+            name=f"inference-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        child.close()
+        worker.conn = parent
+        worker.options = options
+        worker.pending_loads = 1
+
+    def _stop(self, worker: _Worker) -> None:
+        """Termina el proceso sin esperar a que acabe lo que esté haciendo"""
+        if worker.conn is not None:
+            worker.conn.close()
+            worker.conn = None
+        if worker.process is not None:
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.process.join(timeout=5)
+            worker.process = None
+
+    def _restart(self, worker: _Worker, reason: str) -> None:
+        """Reinicia un proceso si no se ha agotado el límite de reinicios"""
+        self._stop(worker)
+        now = time.monotonic()
+        with self._lock:
+            window_start = now - self.restart_window
+            while self._restart_times and self._restart_times[0] < window_start:
+                self._restart_times.popleft()
+            if self._closed or len(self._restart_times) >= self.max_restarts:
+                self.logger.error(
+                    f"❌ Proceso de inferencia {worker.index} caído ({reason}); "
+                    f"límite de {self.max_restarts} reinicios en "
+                    f"{self.restart_window:.0f}s alcanzado"
+                )
+                return
+            self._restart_times.append(now)
+            self.stats.restarts += 1
+        self.logger.warning(
+            f"⚠️ Reiniciando proceso de inferencia {worker.index} ({reason})"
+        )
+        self._spawn(worker, worker.options)
+
+    def _receive(self, worker: _Worker, timeout: float) -> Tuple[str, Any]:
+        """Espera la siguiente respuesta del proceso"""
+        try:
+            if worker.conn.poll(timeout):
+                return worker.conn.recv()
+        except (EOFError, OSError):
+            self.stats.errors += 1
+            self._restart(worker, "terminó inesperadamente")
+            raise InferenceError("El proceso de inferencia terminó inesperadamente")
+        self.stats.timeouts += 1
+        self._restart(worker, f"sin respuesta en {timeout:.0f}s")
+        raise InferenceTimeout(f"Inferencia sin respuesta en {timeout:.0f}s")
+
+    def classify(
+        self, options: Dict, texts: List[str], labels: List[str], batch_size: int
+    ):
+        """Clasifica ``texts`` en un proceso libre y devuelve su resultado"""
+        with self._lock:
+            if self._closed:
+                raise InferenceError("El pool de inferencia está cerrado")
+            self._start(options)
+            self._busy += 1
+
+        worker = self._idle.get()
+        try:
+            if not worker.alive:
+                self._restart(worker, "no está vivo")
+                if not worker.alive:
+                    raise InferenceError("No hay procesos de inferencia disponibles")
+
+            # Reintentar la carga si falló y ya pasó la espera
+            reload = (
+                worker.pending_loads == 0
+                and worker.load_failures > 0
+                and time.monotonic() >= worker.retry_at
+            )
+            try:
+                worker.conn.send((options, texts, labels, batch_size, reload))
+            except OSError:
+                self.stats.errors += 1
+                self._restart(worker, "tubería cerrada")
+                raise InferenceError("El proceso de inferencia no acepta peticiones")
+            if worker.options != options or reload:
+                worker.options = options
+                worker.pending_loads += 1
+            while worker.pending_loads:
+                _, error = self._receive(worker, self.load_timeout)
+                worker.pending_loads -= 1
+                self._record_load(worker, error)
+
+            status, payload = self._receive(worker, self.timeout)
+            if status != "ok":
+                self.stats.errors += 1
+                raise InferenceError(payload)
+            self.stats.completed += 1
+            return payload
+        finally:
+            self._idle.put(worker)
+            with self._lock:
+                self._busy -= 1
+
+    def _record_load(self, worker: _Worker, error: Optional[str]) -> None:
+        """Actualiza la espera de reintento del proceso tras una carga"""
+        if not error:
+            worker.load_failures = 0
+            return
+        worker.load_failures += 1
+        delay = min(
+            self.load_retry * 2 ** (worker.load_failures - 1), self.max_load_retry
+        )
+        worker.retry_at = time.monotonic() + delay
+        self.logger.warning(
+            f"No se pudo cargar el modelo en el proceso {worker.index}: {error}; "
+            f"nuevo intento en {delay:.0f}s (fallo {worker.load_failures})"
+        )
+
+    def health(self) -> Dict[str, int]:
+        """Procesos vivos y contadores del pool"""
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for w in self._workers if w.alive),
+            "completed": self.stats.completed,
+            "errors": self.stats.errors,
+            "timeouts": self.stats.timeouts,
+            "restarts": self.stats.restarts,
+        }
+
+    def release(self, timeout: float = 5.0) -> bool:
+        """
+        Detiene los procesos para liberar su memoria si no hay peticiones en curso
+
+        La siguiente petición vuelve a arrancarlos.
+        """
+        with self._lock:
+            if self._busy or not self._workers:
+                return False
+            workers, self._workers = self._workers, []
+            self._idle = queue.Queue()
+        self._terminate(workers, timeout)
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Pide a los procesos que terminen y mata los que no lo hagan"""
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, []
+        self._terminate(workers, timeout)
+
+    def _terminate(self, workers: List[_Worker], timeout: float) -> None:
+        for worker in workers:
+            try:
+                if worker.conn is not None:
+                    worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+            if worker.process is not None:
+                worker.process.join(timeout=timeout)
+            self._stop(worker)
@@ -0,0 +1,122 @@
+"""
+Reglas de palabras clave compiladas en una sola expresión regular
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+# Prefijo de las entradas que son expresiones regulares y no texto literal
+REGEX_PREFIX = "re:"
+
+
+@dataclass(frozen=True)
+class KeywordRule:
+    """Palabra clave o expresión regular y el conjunto (``tag``) al que pertenece"""
+
+    tag: str
+    pattern: str
+    regex: bool = False
+
+    @property
+    def name(self) -> str:
+        return f"{self.tag}:{self.pattern}"
+
+
+def parse_keywords(value: str) -> List[str]:
+    """Lee una lista de palabras clave separadas por comas de la configuración"""
+    return [kw.strip() for kw in (value or "").split(",") if kw.strip()]
+
+
+class KeywordMatcher:
+    """
+    Busca todas las reglas en una sola pasada por el texto
+
+    Las palabras literales se unen en una alternancia (de la más larga a la
+    más corta) dentro de un lookahead, así que se encuentran también las que
+    se solapan; las que están contenidas en otra coincidencia se resuelven
+    con una tabla precalculada. Las entradas con prefijo ``re:`` se unen en
+    otra expresión con un grupo por regla; como sus coincidencias no se
+    solapan, si la pasada encuentra alguna se comprueban por separado las
+    expresiones que no aparecieron (si no encuentra ninguna, ninguna puede
+    coincidir). Como antes, las palabras se buscan como subcadenas y sin
+    distinguir mayúsculas.
+    """
+
+    def __init__(self, rules: Iterable[KeywordRule]):
+        self.rules: List[KeywordRule] = list(dict.fromkeys(rules))
+        self._order = {rule: i for i, rule in enumerate(self.rules)}
+
+        by_literal: Dict[str, List[KeywordRule]] = {}
+        regex_rules: List[KeywordRule] = []
+        for rule in self.rules:
+            if rule.regex:
+                regex_rules.append(rule)
+            else:
+                by_literal.setdefault(rule.pattern.lower(), []).append(rule)
+
+        # Reglas de cada literal y de los literales que contiene
+        self._literal_rules: Dict[str, List[KeywordRule]] = {
+            literal: [
+                rule
+                for other, rules in by_literal.items()
+                if other in literal
+                for rule in rules
+            ]
+            for literal in by_literal
+        }
+        self._literals: Optional[re.Pattern] = None
+        if by_literal:
+            alternatives = sorted(by_literal, key=len, reverse=True)
+            self._literals = re.compile(
+                "(?=(" + "|".join(re.escape(a) for a in alternatives) + "))"
+            )
+
+        self._regex_rules = regex_rules
+        self._regexes = [re.compile(rule.pattern, re.IGNORECASE) for rule in regex_rules]
+        self._regex: Optional[re.Pattern] = None
+        if regex_rules:
+            groups = [f"(?P<r{i}>{rule.pattern})" for i, rule in enumerate(regex_rules)]
+            self._regex = re.compile("|".join(groups), re.IGNORECASE)
+
+    @classmethod
+    def from_lists(cls, lists: Dict[str, Sequence[str]]) -> "KeywordMatcher":
+        """Crea el buscador a partir de ``{tag: [palabra, "re:expresión", ...]}``"""
+        rules = []
+        for tag, entries in lists.items():
+            for entry in entries:
+                if entry.startswith(REGEX_PREFIX):
+                    rules.append(KeywordRule(tag, entry[len(REGEX_PREFIX) :], True))
+                else:
+                    rules.append(KeywordRule(tag, entry))
+        return cls(rules)
+
+    def _text(self, texts: Sequence[str]) -> str:
+        return "\n".join(t or "" for t in texts).lower()
+
+    def search(self, *texts: str) -> List[KeywordRule]:
+        """Todas las reglas que coinciden con alguno de los textos, en su orden"""
+        text = self._text(texts)
+        found: Set[KeywordRule] = set()
+        if self._literals is not None:
+            for literal in {m.group(1) for m in self._literals.finditer(text)}:
+                found.update(self._literal_rules[literal])
+        if self._regex is not None:
+            hits = {int(m.lastgroup[1:]) for m in self._regex.finditer(text)}
+            for i, rule in enumerate(self._regex_rules):
+                # Una coincidencia que se solapa con otra anterior no aparece
+                if i in hits or (hits and self._regexes[i].search(text)):
+                    found.add(rule)
+        return sorted(found, key=self._order.__getitem__)
+
+    def tags(self, *texts: str) -> Set[str]:
+        """Conjuntos de reglas con alguna coincidencia"""
+        return {rule.tag for rule in self.search(*texts)}
+
+    def matches(self, *texts: str) -> bool:
+        """Hay al menos una coincidencia (se detiene en la primera)"""
+        text = self._text(texts)
+        return bool(
+            (self._literals is not None and self._literals.search(text))
+            or (self._regex is not None and self._regex.search(text))
+        )
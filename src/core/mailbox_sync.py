@@ -0,0 +1,333 @@
+"""
+Selección de correos nuevos y estado persistente de sincronización por buzón
+"""
+
+import json
+import os
+import tempfile
+import threading
+import logging
+from typing import Dict, List, Optional
+
+from .imap_protocol import count_uid_set, iter_fetch_responses, parse_uid_list
+
+
+class MailboxStateStore:
+    """
+    Almacén JSON del estado de sincronización de cada cuenta/buzón
+
+    Varias cuentas comparten el almacén: cada cambio lleva un número de
+    versión y el fichero solo se reemplaza con una versión más reciente que
+    la ya escrita, así una escritura lenta no pisa el estado de otra cuenta.
+    """
+
+    def __init__(self, path: str = "data/mailbox_state.json"):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._version = 0
+        self._written = 0
+        self._state: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        """Carga el estado desde disco"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.warning(f"No se pudo cargar {self.path}: {e}")
+            return {}
+
+    def get(self, key: str) -> Dict:
+        """Devuelve una copia del estado de un buzón"""
+        with self._lock:
+            return dict(self._state.get(key, {}))
+
+    def update(self, key: str, **values) -> None:
+        """Actualiza el estado de un buzón (None borra el valor) y lo persiste"""
+        with self._lock:
+            entry = self._state.setdefault(key, {})
+            for name, value in values.items():
+                if value is None:
+                    entry.pop(name, None)
+                else:
+                    entry[name] = value
+            self._version += 1
+            version = self._version
+            snapshot = json.dumps(self._state, indent=2, sort_keys=True)
+
+        with self._write_lock:
+            if version <= self._written:
+                # Otra actualización ya guardó un estado que incluye este
+                return
+            try:
+                directory = os.path.dirname(self.path) or "."
+                os.makedirs(directory, exist_ok=True)
+                # Escribir en un temporal y renombrar para no dejar el fichero a medias
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(snapshot)
+                os.replace(tmp_path, self.path)
+                self._written = version
+            except Exception as e:
+                self.logger.warning(f"No se pudo guardar {self.path}: {e}")
+
+
+class UnseenSync:
+    """Selecciona los correos con ``UID SEARCH UNSEEN`` (modo clásico)"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def _search(self, mail, criteria: str) -> List[int]:
+        status, data = mail.uid("SEARCH", None, criteria)
+        if status != "OK":
+            self.logger.warning("No se pudieron buscar correos.")
+            return []
+        return parse_uid_list(data)
+
+    def prepare_select(self, connection, capabilities: tuple) -> Optional[str]:
+        """Activa extensiones antes de SELECT y devuelve parámetros adicionales"""
+        return None
+
+    def pending_uids(self, mail, session) -> List[int]:
+        """Devuelve los UIDs que hay que procesar en este ciclo"""
+        return self._search(mail, "(UNSEEN)")
+
+    def mark_processed(self, uid: int) -> None:
+        """Registra un UID como procesado"""
+
+    def mark_failed(self, uid: int) -> None:
+        """Registra un UID que no se pudo procesar"""
+
+    def commit(self) -> None:
+        """Persiste el progreso del ciclo"""
+
+
+class UIDWatermarkSync(UnseenSync):
+    """
+    Selecciona los correos por UIDVALIDITY y el mayor UID ya procesado
+
+    Cada ciclo pide solo ``UID n+1:*``, así que el coste depende de los correos
+    nuevos y no se pierden mensajes leídos en otro cliente antes del siguiente
+    ciclo. Si cambia UIDVALIDITY (o no hay estado previo) se resincroniza con
+    los no leídos y se fija la marca en el último UID del buzón.
+
+    Los UIDs que fallan se guardan aparte y se vuelven a pedir en los ciclos
+    siguientes, hasta ``MAX_RETRIES`` veces, aunque la marca ya los haya
+    pasado.
+    """
+
+    MAX_RETRIES = 3
+
+    def __init__(self, store: MailboxStateStore, key: str):
+        super().__init__()
+        self.store = store
+        self.key = key
+        self._uidvalidity: Optional[int] = None
+        self._last_uid = 0
+        # UID fallido -> reintentos ya hechos
+        self._retry: Dict[int, int] = {}
+        self._dirty = False
+
+    def _load_retry(self, state: Dict) -> None:
+        self._retry = {int(uid): int(n) for uid, n in state.get("retry", {}).items()}
+
+    def _with_retry(self, uids: List[int]) -> List[int]:
+        """Añade a ``uids`` los fallidos de ciclos anteriores que aún se reintentan"""
+        for uid, attempts in list(self._retry.items()):
+            if attempts >= self.MAX_RETRIES:
+                self.logger.warning(
+                    f"UID {uid} de {self.key} falló {attempts + 1} veces, se descarta"
+                )
+                del self._retry[uid]
+            else:
+                self._retry[uid] = attempts + 1
+            self._dirty = True
+        return sorted(set(uids) | set(self._retry))
+
+    def _state_values(self) -> Dict:
+        return {
+            "uidvalidity": self._uidvalidity,
+            "last_uid": self._last_uid,
+            "retry": {str(uid): n for uid, n in self._retry.items()} or None,
+        }
+
+    def pending_uids(self, mail, session) -> List[int]:
+        select_info = session.select_info
+        uidvalidity = select_info.get("UIDVALIDITY")
+        if uidvalidity is None:
+            # Sin UIDVALIDITY no se puede confiar en los UIDs guardados
+            self._uidvalidity = None
+            return super().pending_uids(mail, session)
+
+        state = self.store.get(self.key)
+        if state.get("uidvalidity") == uidvalidity and "last_uid" in state:
+            self._uidvalidity = uidvalidity
+            self._last_uid = int(state["last_uid"])
+            self._load_retry(state)
+            # "n+1:*" siempre incluye el último mensaje aunque su UID sea <= n
+            uids = self._search(mail, f"UID {self._last_uid + 1}:*")
+            return self._with_retry([uid for uid in uids if uid > self._last_uid])
+
+        if state:
+            self.logger.warning(
+                f"UIDVALIDITY de {self.key} cambió, resincronizando el buzón"
+            )
+        else:
+            self.logger.info(f"Sin estado previo para {self.key}, sincronizando")
+
+        uids = self._search(mail, "(UNSEEN)")
+        uidnext = select_info.get("UIDNEXT")
+        if uidnext is not None:
+            base = uidnext - 1
+        else:
+            base = max(self._search(mail, "UID *") + uids, default=0)
+
+        self._uidvalidity = uidvalidity
+        self._last_uid = base
+        # Los UIDs guardados ya no identifican los mismos mensajes
+        self._retry = {}
+        self._dirty = True
+        return uids
+
+    def mark_processed(self, uid: int) -> None:
+        if self._retry.pop(uid, None) is not None:
+            self._dirty = True
+        if self._uidvalidity is not None and uid > self._last_uid:
+            self._last_uid = uid
+            self._dirty = True
+
+    def mark_failed(self, uid: int) -> None:
+        if self._uidvalidity is not None:
+            self._retry.setdefault(uid, 0)
+            self._dirty = True
+
+    def commit(self) -> None:
+        if self._dirty and self._uidvalidity is not None:
+            self.store.update(self.key, **self._state_values())
+            self._dirty = False
+
+
+class CondstoreSync(UIDWatermarkSync):
+    """
+    Sincronización incremental con CONDSTORE/QRESYNC (RFC 7162)
+
+    Guarda además HIGHESTMODSEQ y pide solo los cambios posteriores con
+    ``CHANGEDSINCE``: correo nuevo, cambios de flags y, con QRESYNC, mensajes
+    eliminados (VANISHED). Al reconectar, QRESYNC entrega esos cambios en la
+    propia respuesta a SELECT, por lo que no hace falta otra petición. Si el
+    servidor no soporta la extensión se comporta como ``UIDWatermarkSync``.
+    """
+
+    def __init__(self, store: MailboxStateStore, key: str):
+        super().__init__(store, key)
+        self._modseq: Optional[int] = None
+        self._qresync = False
+
+    def prepare_select(self, connection, capabilities: tuple) -> Optional[str]:
+        self._qresync = False
+        if "QRESYNC" in capabilities:
+            try:
+                typ, _ = connection.enable("QRESYNC")
+                self._qresync = typ == "OK"
+            except Exception as e:
+                self.logger.warning(f"No se pudo activar QRESYNC: {e}")
+
+        state = self.store.get(self.key)
+        if self._qresync and state.get("uidvalidity") and state.get("highestmodseq"):
+            return (
+                f"(QRESYNC ({state['uidvalidity']} {state['highestmodseq']}))"
+            )
+        if self._qresync or "CONDSTORE" in capabilities:
+            return "(CONDSTORE)"
+        return None
+
+    def pending_uids(self, mail, session) -> List[int]:
+        select_info = session.select_info
+        server_modseq = select_info.get("HIGHESTMODSEQ")
+        if server_modseq is None:
+            # El servidor no soporta CONDSTORE (o NOMODSEQ en este buzón)
+            self._modseq = None
+            return super().pending_uids(mail, session)
+
+        state = self.store.get(self.key)
+        uidvalidity = select_info.get("UIDVALIDITY")
+        if (
+            state.get("uidvalidity") != uidvalidity
+            or "highestmodseq" not in state
+            or "last_uid" not in state
+        ):
+            session.take_select_responses()
+            uids = super().pending_uids(mail, session)
+            self._modseq = server_modseq
+            self._dirty = True
+            return uids
+
+        self._uidvalidity = uidvalidity
+        self._last_uid = int(state["last_uid"])
+        self._modseq = int(state["highestmodseq"])
+        self._load_retry(state)
+
+        select_responses = session.take_select_responses()
+        if select_responses and server_modseq <= self._modseq:
+            # Recién seleccionado y sin cambios desde la última sincronización
+            return self._with_retry([])
+
+        if select_responses and self._qresync:
+            # QRESYNC ya incluyó los cambios en la respuesta a SELECT
+            fetched = list(iter_fetch_responses(select_responses.get("FETCH", [])))
+            vanished = select_responses.get("VANISHED", [])
+            new_modseq = server_modseq
+        else:
+            fetched, vanished, new_modseq = self._fetch_changes(mail)
+
+        changed = [int(item["UID"]) for item in fetched if item.get("UID")]
+        new_uids = sorted(uid for uid in changed if uid > self._last_uid)
+        self.logger.debug(
+            f"Cambios desde MODSEQ {self._modseq}: {len(new_uids)} nuevos, "
+            f"{len(changed) - len(new_uids)} con flags modificados, "
+            f"{sum(count_uid_set(v) for v in vanished)} eliminados"
+        )
+
+        if new_modseq > self._modseq:
+            self._modseq = new_modseq
+            self._dirty = True
+        return self._with_retry(new_uids)
+
+    def _fetch_changes(self, mail):
+        """Pide al servidor los cambios posteriores al MODSEQ guardado"""
+        modifiers = f"CHANGEDSINCE {self._modseq}"
+        if self._qresync:
+            modifiers += " VANISHED"
+        status, data = mail.uid("FETCH", "1:*", f"(UID FLAGS) ({modifiers})")
+        if status != "OK":
+            self.logger.warning("No se pudieron obtener los cambios del buzón.")
+            return [], [], self._modseq
+
+        fetched = list(iter_fetch_responses(data))
+        vanished = []
+        if self._qresync:
+            try:
+                _, vanished = mail.response("VANISHED")
+            except (TypeError, ValueError):
+                vanished = []
+
+        modseqs = [
+            int(item["MODSEQ"][0])
+            for item in fetched
+            if isinstance(item.get("MODSEQ"), list) and item["MODSEQ"]
+        ]
+        return fetched, [v for v in vanished or [] if v], max(
+            modseqs, default=self._modseq
+        )
+
+    def _state_values(self) -> Dict:
+        values = super()._state_values()
+        if self._modseq is not None:
+            values["highestmodseq"] = self._modseq
+        return values
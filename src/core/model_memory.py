@@ -0,0 +1,54 @@
+"""
+Memoria del modelo: métricas de carga y descarga y liberación del heap
+"""
+
+import ctypes
+import gc
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ModelLifecycleStats:
+    """Cargas y descargas del modelo desde el arranque"""
+
+    loads: int = 0
+    unloads: int = 0
+    load_seconds: float = 0.0
+    # Memoria residente del proceso antes y después de la última descarga
+    rss_before_unload_mb: Optional[float] = None
+    rss_after_unload_mb: Optional[float] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "loads": self.loads,
+            "unloads": self.unloads,
+            "load_seconds": round(self.load_seconds, 3),
+            "rss_before_unload_mb": self.rss_before_unload_mb,
+            "rss_after_unload_mb": self.rss_after_unload_mb,
+        }
+
+
+def resident_memory_mb() -> Optional[float]:
+    """Memoria residente del proceso en MB (None fuera de Linux)"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def release_memory() -> bool:
+    """
+    Recoge la basura y devuelve al sistema la memoria libre del heap
+
+    Sin ``malloc_trim`` (glibc) los bloques liberados del modelo se quedan
+    en el proceso y la memoria residente apenas baja.
+    """
+    gc.collect()
+    try:
+        return bool(ctypes.CDLL("libc.so.6").malloc_trim(0))
+    except (OSError, AttributeError):
+        return False
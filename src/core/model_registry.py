@@ -0,0 +1,150 @@
+"""
+Registro de modelos de clasificación con sus costes de latencia y memoria
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tipos de modelo: NLI (zero-shot clásico) o similitud de embeddings
+MODEL_KINDS = ("nli", "embedding")
+
+
+@dataclass
+class ModelSpec:
+    """
+    Modelo disponible y su coste por correo
+
+    Las latencias son por correo con tres etiquetas candidatas en CPU y la
+    memoria es la residente del proceso tras cargar el modelo.
+    """
+
+    name: str
+    model_id: str
+    kind: str = "nli"
+    p50_ms: float = 0.0
+    p99_ms: float = 0.0
+    memory_mb: int = 0
+    multilingual: bool = False
+
+
+# Valores de referencia aproximados para una VM de 2 vCPU con PyTorch en fp32.
+# Conviene medir en el propio servidor y sustituirlos con MODEL_REGISTRY_FILE.
+DEFAULT_MODELS = [
+    ModelSpec(
+        "bart-large-mnli",
+        "facebook/bart-large-mnli",
+        p50_ms=1400,
+        p99_ms=3200,
+        memory_mb=1650,
+    ),
+    ModelSpec(
+        "mdeberta-xnli",
+        "MoritzLaurer/mDeBERTa-v3-base-mnli-xnli",
+        p50_ms=650,
+        p99_ms=1500,
+        memory_mb=1150,
+        multilingual=True,
+    ),
+    ModelSpec(
+        "distilbart-mnli",
+        "valhalla/distilbart-mnli-12-3",
+        p50_ms=600,
+        p99_ms=1400,
+        memory_mb=1050,
+    ),
+    ModelSpec(
+        "minilm-embeddings",
+        "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        kind="embedding",
+        p50_ms=35,
+        p99_ms=90,
+        memory_mb=480,
+        multilingual=True,
+    ),
+]
+
+
+class ModelRegistry:
+    """Catálogo de modelos con selección por presupuesto de latencia"""
+
+    def __init__(self, models: Optional[List[ModelSpec]] = None):
+        self.models: Dict[str, ModelSpec] = {}
+        for spec in models if models is not None else DEFAULT_MODELS:
+            self.register(spec)
+
+    def register(self, spec: ModelSpec) -> None:
+        if spec.kind not in MODEL_KINDS:
+            raise ValueError(
+                f"Tipo de modelo no válido para {spec.name}: {spec.kind} "
+                f"(opciones: {', '.join(MODEL_KINDS)})"
+            )
+        self.models[spec.name] = spec
+
+    def get(self, name: str) -> ModelSpec:
+        """
+        Busca un modelo por nombre del registro o por identificador de Hugging Face
+
+        Un identificador que no está registrado se trata como modelo NLI sin
+        métricas conocidas.
+        """
+        if name in self.models:
+            return self.models[name]
+        for spec in self.models.values():
+            if spec.model_id == name:
+                return spec
+        return ModelSpec(name=name, model_id=name)
+
+    def select(
+        self, budget_ms: float, multilingual: Optional[bool] = None
+    ) -> Optional[ModelSpec]:
+        """
+        Elige el modelo más grande cuyo p99 cabe en el presupuesto por correo
+
+        Devuelve None si ninguno cabe.
+        """
+        candidates = [
+            spec
+            for spec in self.models.values()
+            if spec.p99_ms <= budget_ms
+            and (multilingual is None or spec.multilingual == multilingual)
+        ]
+        return max(candidates, key=lambda s: (s.memory_mb, s.p99_ms), default=None)
+
+    def faster_than(self, spec: ModelSpec) -> Optional[ModelSpec]:
+        """
+        Siguiente modelo más rápido compatible
+
+        Si el modelo actual es multilingüe solo se baja a otro multilingüe.
+        """
+        candidates = [
+            other
+            for other in self.models.values()
+            if other.p99_ms < spec.p99_ms
+            and (other.multilingual or not spec.multilingual)
+        ]
+        return max(candidates, key=lambda s: s.p99_ms, default=None)
+
+
+def load_registry(path: Optional[str] = None) -> ModelRegistry:
+    """
+    Crea el registro por defecto y añade o sustituye los modelos de ``path``
+
+    El fichero es una lista JSON de objetos con los campos de ``ModelSpec``.
+    """
+    registry = ModelRegistry()
+    if not path:
+        return registry
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        for entry in entries:
+            registry.register(ModelSpec(**entry))
+    except FileNotFoundError:
+        logger.warning(f"No existe {path}, usando el registro de modelos por defecto")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Registro de modelos inválido en {path}: {e}") from e
+    return registry
@@ -0,0 +1,90 @@
+"""
+Copia local de los modelos para arrancar sin red
+
+Los modelos se descargan una vez (``python main.py download_model``) a un
+directorio fijo, que puede ir en una capa de la imagen Docker o en un volumen.
+Solo se guardan los pesos en formato safetensors: se leen por mmap, sin
+pickle, y las páginas del fichero quedan en la caché del sistema, compartida
+por todos los procesos del host que cargan el mismo modelo.
+"""
+
+import glob
+import logging
+import os
+import re
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Ficheros necesarios para el pipeline: configuración, tokenizador y pesos
+MODEL_PATTERNS: List[str] = [
+    "*.json",
+    "*.safetensors",
+    "*.txt",
+    "*.model",
+]
+
+
+def local_model_dir(base_dir: str, model_id: str) -> str:
+    """Directorio local de un modelo de Hugging Face"""
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "--", model_id)
+    return os.path.join(base_dir, slug)
+
+
+def is_complete(path: str) -> bool:
+    """Hay configuración y pesos safetensors en el directorio"""
+    return os.path.isfile(os.path.join(path, "config.json")) and bool(
+        glob.glob(os.path.join(path, "*.safetensors"))
+    )
+
+
+class ModelStore:
+    """
+    Resuelve cada modelo a su copia local si existe
+
+    Sin ``offline``, un modelo que no está en ``base_dir`` se descarga del Hub
+    como hasta ahora (a la caché de Hugging Face). Con ``offline`` es un error:
+    el contenedor no necesita red y un modelo ausente se detecta al arrancar.
+    """
+
+    def __init__(self, base_dir: str = "models/hf", offline: bool = False):
+        self.base_dir = base_dir
+        self.offline = offline
+
+    def path(self, model_id: str) -> str:
+        return local_model_dir(self.base_dir, model_id)
+
+    def resolve(self, model_id: str) -> str:
+        """Ruta local del modelo, o su identificador del Hub si no hay copia"""
+        path = self.path(model_id)
+        if is_complete(path):
+            return path
+        if self.offline:
+            raise FileNotFoundError(
+                f"El modelo {model_id} no está en {path} y MODEL_OFFLINE está "
+                f"activo. Descárgalo con: python main.py download_model {model_id}"
+            )
+        return model_id
+
+    def load_kwargs(self, source: str) -> Dict[str, object]:
+        """Argumentos de carga del modelo para ``source``"""
+        if os.path.isdir(source):
+            # Solo safetensors: nunca cae a los .bin con pickle
+            return {"use_safetensors": True, "local_files_only": True}
+        return {}
+
+    def download(self, model_id: str) -> str:
+        """Descarga el modelo (solo safetensors) y devuelve su directorio"""
+        from huggingface_hub import snapshot_download
+
+        path = self.path(model_id)
+        os.makedirs(path, exist_ok=True)
+        logger.info(f"Descargando {model_id} en {path}...")
+        snapshot_download(model_id, local_dir=path, allow_patterns=MODEL_PATTERNS)
+        if not is_complete(path):
+            raise ValueError(
+                f"{model_id} no publica pesos en formato safetensors; "
+                "conviértelo antes de usarlo sin conexión"
+            )
+        logger.info(f"Modelo {model_id} guardado en {path}")
+        return path
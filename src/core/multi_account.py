@@ -0,0 +1,212 @@
+"""
+Monitorización de varias cuentas y carpetas en un único proceso asyncio
+"""
+
+import asyncio
+import json
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from .email_monitor import (
+    DailySummaryManager,
+    EmailClassifier,
+    EmailMonitor,
+    SenderGroupManager,
+    TelegramNotifier,
+)
+from .mailbox_sync import MailboxStateStore
+from .user_rules import load_rules
+
+
+@dataclass
+class AccountConfig:
+    """Cuenta IMAP y carpetas a vigilar"""
+
+    name: str
+    imap_server: str
+    mail: str
+    password: str
+    folders: List[str] = field(default_factory=lambda: ["inbox"])
+    notify_domains: Optional[str] = None
+
+
+def load_accounts(path: str) -> List[AccountConfig]:
+    """
+    Carga las cuentas desde un fichero JSON
+
+    Formato::
+
+        {"accounts": [{"name": "personal", "imap_server": "imap.gmail.com",
+                       "mail": "yo@gmail.com", "pass_env": "PERSONAL_PASS",
+                       "folders": ["INBOX", "Facturas"]}]}
+
+    La contraseña puede ir en ``pass`` o leerse de la variable indicada en
+    ``pass_env`` para no guardarla en el fichero.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    entries = data.get("accounts", []) if isinstance(data, dict) else data
+    accounts = []
+    for i, entry in enumerate(entries, 1):
+        password = entry.get("pass")
+        if not password and entry.get("pass_env"):
+            password = os.getenv(entry["pass_env"])
+
+        missing = [
+            key
+            for key, value in (
+                ("imap_server", entry.get("imap_server")),
+                ("mail", entry.get("mail")),
+                ("pass", password),
+            )
+            if not value
+        ]
+        if missing:
+            raise ValueError(
+                f"Cuenta {entry.get('name', i)} en {path}: faltan {', '.join(missing)}"
+            )
+
+        accounts.append(
+            AccountConfig(
+                name=entry.get("name") or entry["mail"],
+                imap_server=entry["imap_server"],
+                mail=entry["mail"],
+                password=password,
+                folders=entry.get("folders") or ["inbox"],
+                notify_domains=entry.get("notify_domains"),
+            )
+        )
+
+    if not accounts:
+        raise ValueError(f"No hay cuentas definidas en {path}")
+    return accounts
+
+
+def accounts_from_config(config: Dict[str, str]) -> List[AccountConfig]:
+    """Obtiene las cuentas de ACCOUNTS_FILE o, si no existe, de IMAP_SERVER/MAIL/PASS"""
+    accounts_file = config.get("ACCOUNTS_FILE")
+    if accounts_file:
+        return load_accounts(accounts_file)
+
+    folders = [
+        f.strip() for f in config.get("IMAP_FOLDERS", "inbox").split(",") if f.strip()
+    ]
+    return [
+        AccountConfig(
+            name=config["MAIL"],
+            imap_server=config["IMAP_SERVER"],
+            mail=config["MAIL"],
+            password=config["PASS"],
+            folders=folders or ["inbox"],
+        )
+    ]
+
+
+class MultiAccountMonitor:
+    """
+    Vigila todas las cuentas y carpetas configuradas de manera concurrente
+
+    El clasificador, el gestor de grupos, el notificador de Telegram, el resumen
+    diario y el estado de sincronización se crean una sola vez y se comparten,
+    así que la memoria crece con el número de modelos y no con el de buzones.
+    """
+
+    def __init__(
+        self, config: Dict[str, str], accounts: Optional[List[AccountConfig]] = None
+    ):
+        self.config = config
+        self.accounts = accounts if accounts is not None else accounts_from_config(config)
+        self.logger = logging.getLogger(__name__)
+
+        # Componentes compartidos
+        self.classifier = EmailClassifier.from_config(config)
+        self.sender_groups = SenderGroupManager()
+        self.rule_table = load_rules(config.get("RULES_FILE") or None)
+        self.telegram_notifier = TelegramNotifier.from_config(config)
+        self.daily_summary = DailySummaryManager.from_config(
+            self.telegram_notifier, config
+        )
+        self.state_store = MailboxStateStore(
+            config.get("STATE_FILE", "data/mailbox_state.json")
+        )
+
+        # Parseo e inferencia comparten un único pool para todos los buzones
+        self.cpu_executor = ThreadPoolExecutor(
+            max_workers=int(config.get("PARSE_WORKERS", 1))
+            + int(config.get("CLASSIFY_WORKERS", 1)),
+            thread_name_prefix="cpu",
+        )
+
+        self.monitors: List[EmailMonitor] = []
+        for account in self.accounts:
+            account_config = dict(config)
+            account_config.update(
+                {
+                    "IMAP_SERVER": account.imap_server,
+                    "MAIL": account.mail,
+                    "PASS": account.password,
+                }
+            )
+            if account.notify_domains is not None:
+                account_config["NOTIFY_DOMAINS"] = account.notify_domains
+
+            for folder in account.folders:
+                self.monitors.append(
+                    EmailMonitor(
+                        account_config,
+                        mailbox=folder,
+                        classifier=self.classifier,
+                        sender_groups=self.sender_groups,
+                        telegram_notifier=self.telegram_notifier,
+                        daily_summary=self.daily_summary,
+                        state_store=self.state_store,
+                        cpu_executor=self.cpu_executor,
+                        rule_table=self.rule_table,
+                    )
+                )
+
+    async def _watch(self, monitor: EmailMonitor) -> None:
+        """Bucle de un buzón: revisar correos y esperar cambios (IDLE o polling)"""
+        name = f"{monitor.session.user}/{monitor.mailbox}"
+        self.logger.info(f"👀 Vigilando {name}")
+        while True:
+            try:
+                await monitor.check_emails_async()
+                await monitor.wait_for_new_mail_async()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Error vigilando {name}: {e}")
+                await asyncio.sleep(monitor.check_interval)
+
+    async def run(self) -> None:
+        """Vigila todos los buzones hasta que se cancele la tarea"""
+        self.logger.info(
+            f"Monitorizando {len(self.monitors)} buzones de {len(self.accounts)} cuentas"
+        )
+        # Cargar el modelo mientras se conectan los buzones
+        if self.classifier.warmup:
+            self.classifier.warm_up()
+        # Abrir el pool de Telegram en este loop para reutilizar la conexión
+        await self.telegram_notifier.start()
+        try:
+            await asyncio.gather(*(self._watch(m) for m in self.monitors))
+        finally:
+            await self.telegram_notifier.aclose()
+
+    def start_daily_summary_scheduler(self):
+        """Inicia el scheduler del resumen diario compartido"""
+        self.daily_summary.run_scheduler()
+
+    def close(self) -> None:
+        """Cierra las sesiones IMAP, Telegram, el clasificador y el resumen"""
+        for monitor in self.monitors:
+            monitor.close()
+        self.telegram_notifier.close()
+        self.classifier.close()
+        self.daily_summary.close()
+        self.cpu_executor.shutdown(wait=False, cancel_futures=True)
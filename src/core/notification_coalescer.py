@@ -0,0 +1,168 @@
+"""
+Agrupación de ráfagas de notificaciones en mensajes resumen
+"""
+
+import asyncio
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+
+@dataclass
+class PendingNotification:
+    """Datos de una notificación antes de darle formato"""
+
+    subject: str
+    sender: str
+    snippet: str
+    label: str = "Otros"
+    sender_group: str = "Otros"
+    # Prioridad fijada por una regla de usuario (None: la de la etiqueta)
+    priority: Optional[int] = None
+
+
+@dataclass
+class _Burst:
+    """Ventana abierta para una clave de agrupación"""
+
+    opened: float
+    items: List[PendingNotification] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+    # Resultado del resumen para quien añadió un aviso con wait=True
+    waiters: List[asyncio.Future] = field(default_factory=list)
+
+
+# emit(items, clave, segundos desde el primer aviso, esperar envío) -> bool
+EmitCallback = Callable[
+    [List[PendingNotification], str, float, bool], Awaitable[bool]
+]
+
+
+class NotificationCoalescer:
+    """
+    Junta las notificaciones de una misma clave que llegan dentro de una ventana
+
+    El primer aviso de una clave sale en el momento y abre una ventana de
+    ``window`` segundos; los siguientes se acumulan y se envían como un único
+    resumen al cerrarse la ventana o al llegar a ``max_batch``. Si al cerrarse
+    había mensajes acumulados la ventana se renueva, de modo que una tormenta
+    larga produce un resumen por ventana en lugar de un mensaje por correo.
+
+    La clave puede ser el remitente (``sender``), el grupo del remitente
+    (``sender_group``, que usa el remitente si no tiene grupo) o la etiqueta
+    del clasificador (``label``).
+
+    Con ``wait=True`` un aviso acumulado espera a que salga su resumen y
+    devuelve si se envió; con ``wait=False`` retorna en cuanto se acumula.
+    """
+
+    GROUP_KEYS = ("sender", "sender_group", "label")
+
+    def __init__(
+        self,
+        emit: EmitCallback,
+        window: float = 30.0,
+        max_batch: int = 20,
+        group_by: str = "sender",
+    ):
+        if group_by not in self.GROUP_KEYS:
+            raise ValueError(
+                f"Clave de agrupación no válida: {group_by} "
+                f"(opciones: {', '.join(self.GROUP_KEYS)})"
+            )
+        self.emit = emit
+        self.window = max(0.0, float(window))
+        self.max_batch = max(1, int(max_batch))
+        self.group_by = group_by
+        self.logger = logging.getLogger(__name__)
+        self.coalesced = 0
+        self._bursts: Dict[str, _Burst] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def key_for(self, item: PendingNotification) -> str:
+        """Clave de agrupación de una notificación"""
+        if self.group_by == "label":
+            return item.label
+        if self.group_by == "sender_group" and item.sender_group != "Otros":
+            return item.sender_group
+        return item.sender.lower()
+
+    async def add(self, item: PendingNotification, wait: bool = True) -> bool:
+        """Envía la notificación o la acumula si su clave tiene una ventana abierta"""
+        if not self.enabled:
+            return await self.emit([item], self.key_for(item), 0.0, wait)
+
+        key = self.key_for(item)
+        burst = self._bursts.get(key)
+        if burst is None:
+            self._open(key)
+            return await self.emit([item], key, 0.0, wait)
+
+        burst.items.append(item)
+        self.coalesced += 1
+        waiter = None
+        if wait:
+            waiter = asyncio.get_running_loop().create_future()
+            burst.waiters.append(waiter)
+        if len(burst.items) >= self.max_batch:
+            await self._flush(key)
+        if waiter is None:
+            return True
+        return await waiter
+
+    def _open(self, key: str) -> None:
+        loop = asyncio.get_running_loop()
+        burst = _Burst(opened=time.monotonic())
+        burst.timer = loop.call_later(self.window, self._on_window_end, key)
+        self._bursts[key] = burst
+
+    def _on_window_end(self, key: str) -> None:
+        task = asyncio.ensure_future(self._close_window(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _close_window(self, key: str) -> None:
+        burst = self._bursts.pop(key, None)
+        if burst is None:
+            return
+        if burst.items:
+            # La ráfaga sigue: renovar la ventana y enviar el resumen
+            self._open(key)
+            await self._send(key, burst)
+
+    async def _flush(self, key: str) -> None:
+        """Envía lo acumulado de una clave sin cerrar su ventana"""
+        burst = self._bursts.get(key)
+        if burst is None or not burst.items:
+            return
+        pending = _Burst(opened=burst.opened, items=burst.items, waiters=burst.waiters)
+        burst.items = []
+        burst.waiters = []
+        await self._send(key, pending)
+
+    async def _send(self, key: str, burst: _Burst) -> None:
+        elapsed = time.monotonic() - burst.opened
+        try:
+            sent = await self.emit(burst.items, key, elapsed, bool(burst.waiters))
+        except Exception as e:
+            self.logger.error(f"No se pudo enviar el resumen de {key}: {e}")
+            sent = False
+        for waiter in burst.waiters:
+            if not waiter.done():
+                waiter.set_result(sent)
+
+    async def flush_all(self) -> None:
+        """Envía todo lo acumulado y cierra las ventanas abiertas"""
+        bursts, self._bursts = self._bursts, {}
+        for key, burst in bursts.items():
+            if burst.timer is not None:
+                burst.timer.cancel()
+            if burst.items:
+                await self._send(key, burst)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
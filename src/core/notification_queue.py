@@ -0,0 +1,260 @@
+"""
+Cola de salida de notificaciones con límite de velocidad y reintentos
+"""
+
+import asyncio
+import itertools
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+# Errores que no se arreglan reintentando (chat inexistente, HTML inválido...)
+PERMANENT_ERRORS = (BadRequest, Forbidden)
+
+
+class TokenBucket:
+    """
+    Cubo de tokens: ``rate`` mensajes por segundo con ráfagas de ``capacity``
+
+    ``pause()`` bloquea el cubo hasta un instante dado, para respetar el
+    ``retry_after`` que devuelve Telegram con un 429.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = max(float(rate), 1e-6)
+        self.capacity = max(float(capacity), 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def delay(self) -> float:
+        """Segundos que faltan para disponer de un token"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """Detiene el cubo durante ``seconds`` y vacía los tokens acumulados"""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = now
+
+
+async def acquire_tokens(*buckets: TokenBucket) -> None:
+    """Espera hasta que todos los cubos tengan token y los consume a la vez"""
+    while True:
+        wait = max(bucket.delay() for bucket in buckets)
+        if wait <= 0:
+            for bucket in buckets:
+                bucket.consume()
+            return
+        await asyncio.sleep(wait)
+
+
+@dataclass
+class OutgoingMessage:
+    """Mensaje pendiente de envío"""
+
+    chat_id: str
+    text: str
+    priority: int = 2
+    parse_mode: Optional[str] = "HTML"
+    description: str = ""
+    attempts: int = 0
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+    # Último error si el envío se dio por fallido
+    error: Optional[Exception] = field(default=None, repr=False)
+
+
+class NotificationQueue:
+    """
+    Cola de envío con prioridad, límite de velocidad y reintentos
+
+    Los mensajes salen por orden de prioridad (0 primero) y, dentro de la
+    misma prioridad, por orden de llegada. Un cubo global y otro por chat
+    mantienen el ritmo por debajo de los límites de Telegram; si aun así se
+    recibe un 429 se pausa el chat el tiempo indicado en ``retry_after`` y el
+    mensaje vuelve a la cola. Los errores de red se reintentan con espera
+    exponencial; los errores definitivos (chat inexistente, HTML inválido...)
+    se registran y el mensaje se descarta.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[OutgoingMessage], Awaitable[None]],
+        global_rate: float = 30.0,
+        chat_rate: float = 60.0,
+        group_rate: float = 20.0,
+        workers: int = 4,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        max_backoff: float = 60.0,
+        max_pending: int = 1000,
+    ):
+        self.send = send
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        # Límites por chat en mensajes por minuto (los grupos tienen id negativo)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.workers = max(1, int(workers))
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.max_pending = max(1, int(max_pending))
+        self.logger = logging.getLogger(__name__)
+
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[asyncio.Future] = set()
+        self._counter = itertools.count()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def chat_bucket(self, chat_id: str) -> TokenBucket:
+        """Devuelve (creándolo si hace falta) el cubo de un chat"""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            per_minute = self.group_rate if str(chat_id).startswith("-") else self.chat_rate
+            bucket = TokenBucket(per_minute / 60.0, capacity=1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def start(self) -> None:
+        """Arranca los workers de envío en el loop actual"""
+        if self.running:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def submit(self, message: OutgoingMessage) -> asyncio.Future:
+        """
+        Encola un mensaje y devuelve un futuro con el resultado del envío
+
+        Espera si ya hay ``max_pending`` mensajes sin enviar (contrapresión).
+        """
+        await self.start()
+        await self._slots.acquire()
+        message.future = asyncio.get_running_loop().create_future()
+        self._pending.add(message.future)
+        message.future.add_done_callback(self._release)
+        self._put(message)
+        return message.future
+
+    def _put(self, message: OutgoingMessage) -> None:
+        self._queue.put_nowait((message.priority, next(self._counter), message))
+
+    def _release(self, future: asyncio.Future) -> None:
+        self._pending.discard(future)
+        self._slots.release()
+
+    def _finish(self, message: OutgoingMessage, ok: bool) -> None:
+        if message.future is not None and not message.future.done():
+            message.future.set_result(ok)
+
+    def _retry_later(self, message: OutgoingMessage, delay: float) -> None:
+        """Vuelve a encolar el mensaje pasado ``delay`` segundos"""
+        self.retried += 1
+        asyncio.get_running_loop().call_later(delay, self._put, message)
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, message = await self._queue.get()
+            try:
+                await self._deliver(message)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message: OutgoingMessage) -> None:
+        chat_bucket = self.chat_bucket(message.chat_id)
+        await acquire_tokens(self.global_bucket, chat_bucket)
+        message.attempts += 1
+        try:
+            await self.send(message)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if hasattr(retry_after, "total_seconds"):
+                retry_after = retry_after.total_seconds()
+            self.logger.warning(
+                f"⏳ Telegram pide esperar {retry_after}s antes de enviar a {message.chat_id}"
+            )
+            chat_bucket.pause(float(retry_after))
+            # El 429 no cuenta como intento fallido
+            message.attempts -= 1
+            self._retry_later(message, float(retry_after))
+        except PERMANENT_ERRORS as e:
+            self._fail(message, e)
+        except NetworkError as e:
+            if message.attempts > self.max_retries:
+                self._fail(message, e)
+                return
+            delay = min(
+                self.backoff_base * (2 ** (message.attempts - 1)), self.max_backoff
+            )
+            self.logger.warning(
+                f"Error de red enviando a Telegram, reintento {message.attempts}/"
+                f"{self.max_retries} en {delay:.1f}s: {e}"
+            )
+            self._retry_later(message, delay)
+        except Exception as e:
+            self._fail(message, e)
+        else:
+            self.sent += 1
+            self._finish(message, True)
+
+    def _fail(self, message: OutgoingMessage, error: Exception) -> None:
+        self.failed += 1
+        message.error = error
+        self.logger.error(
+            f"No se pudo enviar mensaje a Telegram ({message.description}): {error}"
+        )
+        self._finish(message, False)
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que se envíen los mensajes pendientes"""
+        if not self._pending:
+            return True
+        _, not_done = await asyncio.wait(set(self._pending), timeout=timeout)
+        return not not_done
+
+    async def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Envía lo pendiente (hasta ``timeout``) y detiene los workers"""
+        if not self.running:
+            return
+        if not await self.drain(timeout):
+            self.logger.warning(
+                f"Se descartan {len(self._pending)} notificaciones sin enviar"
+            )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for future in list(self._pending):
+            if not future.done():
+                future.set_result(False)
@@ -0,0 +1,136 @@
+"""
+Decisión de notificar un correo, evaluada una sola vez por correo
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .classification_cascade import TIER_REASONS, Classification
+from .keyword_rules import KeywordMatcher
+from .user_rules import RuleTable
+
+# Regla de usuario: recibe el correo y su clasificación y devuelve si notifica
+UserRule = Callable[[object, Classification], bool]
+
+# Niveles de la cascada cuya regla ya implica notificar
+NOTIFY_TIERS = ("sender_group", "domain", "keywords")
+
+
+@dataclass
+class NotifyDecision:
+    """Resultado de la decisión: si se notifica, por qué y cuánto costó"""
+
+    notify: bool
+    reason: str
+    rule: Optional[str] = None
+    # Segundos de cada criterio evaluado, en orden de evaluación
+    timings: Dict[str, float] = field(default_factory=dict)
+    # Grupo y prioridad fijados por una regla del fichero de reglas
+    sender_group: Optional[str] = None
+    priority: Optional[int] = None
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.timings.values()) * 1000
+
+
+class NotifyDecisionEngine:
+    """
+    Evalúa los criterios de notificación del más barato al más caro
+
+    0. Tabla de reglas de usuario (``RULES_FILE``), la única que puede
+       suprimir la notificación, cambiar el grupo o la prioridad
+    1. Regla de la cascada que ya decidió el correo (sin coste)
+    2. Etiqueta del modelo o de las reglas del clasificador
+    3. Grupo del remitente (resuelto por la cascada)
+    4. Dominio en ``NOTIFY_DOMAINS``
+    5. Reglas de usuario, en el orden en que se registran
+    6. Palabras clave (recorre el asunto y el cuerpo)
+
+    Se detiene en el primer criterio que se cumple.
+    """
+
+    def __init__(
+        self,
+        keywords: KeywordMatcher,
+        notify_domains: Sequence[str] = (),
+        rules: Sequence[Tuple[str, UserRule]] = (),
+        table: Optional[RuleTable] = None,
+    ):
+        self.keywords = keywords
+        self.notify_domains = set(notify_domains)
+        self.rules: List[Tuple[str, UserRule]] = list(rules)
+        self.table = table or RuleTable()
+
+    def add_rule(self, name: str, rule: UserRule) -> None:
+        """Registra una regla de usuario (se evalúa antes que las palabras clave)"""
+        self.rules.append((name, rule))
+
+    def _cascade(self, email_msg, classification: Classification):
+        if classification.tier in NOTIFY_TIERS:
+            return TIER_REASONS[classification.tier], classification.rule
+        return None
+
+    def _label(self, email_msg, classification: Classification):
+        if classification.label == "Otros":
+            return None
+        reason = "IA" if classification.tier == "model" else TIER_REASONS["fallback"]
+        return reason, f"label:{classification.label}"
+
+    def _sender_group(self, email_msg, classification: Classification):
+        group = classification.sender_group
+        if group == "Otros":
+            return None
+        return TIER_REASONS["sender_group"], f"sender_group:{group}"
+
+    def _domain(self, email_msg, classification: Classification):
+        if email_msg.sender_domain not in self.notify_domains:
+            return None
+        return TIER_REASONS["domain"], f"domain:{email_msg.sender_domain}"
+
+    def _user_rules(self, email_msg, classification: Classification):
+        for name, rule in self.rules:
+            if rule(email_msg, classification):
+                return "Regla", name
+        return None
+
+    def _keywords(self, email_msg, classification: Classification):
+        matched = self.keywords.search(email_msg.subject, email_msg.body)
+        if not matched:
+            return None
+        return TIER_REASONS["keywords"], matched[0].name
+
+    def decide(self, email_msg, classification: Classification) -> NotifyDecision:
+        """Decide si se notifica el correo"""
+        timings: Dict[str, float] = {}
+        if self.table.rules:
+            start = time.perf_counter()
+            rule = self.table.match(email_msg, classification.label)
+            timings["table"] = time.perf_counter() - start
+            if rule is not None:
+                return NotifyDecision(
+                    rule.notify,
+                    "Regla" if rule.notify else "Suprimido",
+                    rule.name,
+                    timings,
+                    sender_group=rule.group,
+                    priority=rule.priority,
+                )
+
+        criteria = (
+            ("cascade", self._cascade),
+            ("label", self._label),
+            ("sender_group", self._sender_group),
+            ("domain", self._domain),
+            ("rules", self._user_rules),
+            ("keywords", self._keywords),
+        )
+        for name, criterion in criteria:
+            start = time.perf_counter()
+            hit = criterion(email_msg, classification)
+            timings[name] = time.perf_counter() - start
+            if hit is not None:
+                reason, rule = hit
+                return NotifyDecision(True, reason, rule, timings)
+        return NotifyDecision(False, "Sin coincidencias", None, timings)
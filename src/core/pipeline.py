@@ -0,0 +1,313 @@
+"""
+Pipeline asíncrono por etapas: descarga → parseo → clasificación → notificación
+"""
+
+import asyncio
+import time
+import logging
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+# Marca de fin de cola para los workers de cada etapa
+_DONE = object()
+
+
+@dataclass
+class PipelineStats:
+    """Contadores de una ejecución del pipeline"""
+
+    fetched: int = 0
+    parsed: int = 0
+    classified: int = 0
+    classify_batches: int = 0
+    delivered: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+
+class EmailPipeline:
+    """
+    Ejecuta el procesamiento de correos como etapas conectadas por colas acotadas
+
+    Mientras se descarga el siguiente mensaje se clasifica el actual y se
+    notifica el anterior. Las colas acotadas aplican contrapresión: si la
+    clasificación va lenta la descarga se detiene en lugar de acumular
+    mensajes en memoria. Las etapas bloqueantes (IMAP, parseo, inferencia)
+    se ejecutan en executors; la entrega es una corrutina.
+
+    ``on_done`` recibe los UIDs en orden de descarga a medida que todos los
+    anteriores han terminado, lo que permite avanzar marcas de agua sin saltar
+    mensajes aunque las etapas terminen fuera de orden. Los UIDs que fallan en
+    alguna etapa no pasan por ``on_done``: se entregan a ``on_failed`` para
+    reintentarlos en otro ciclo y, sin ``on_failed``, ``on_done`` se detiene
+    antes de ellos.
+
+    Con ``classify_batch`` la clasificación toma de la cola todos los mensajes
+    disponibles (hasta ``classify_batch_size``) y los procesa en una sola
+    llamada; cuanto más lenta es la inferencia, mayores son los lotes.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Iterable[Tuple[int, Any]]],
+        parse: Callable[[Any], Any],
+        classify: Callable[[Any], Any],
+        deliver: Callable[[Any, Any], Awaitable[None]],
+        io_executor: Optional[Executor] = None,
+        cpu_executor: Optional[Executor] = None,
+        queue_size: int = 16,
+        parse_workers: int = 1,
+        classify_workers: int = 1,
+        deliver_workers: int = 4,
+        on_done: Optional[Callable[[int], None]] = None,
+        on_failed: Optional[Callable[[int], None]] = None,
+        classify_batch: Optional[Callable[[List[Any]], List[Any]]] = None,
+        classify_batch_size: int = 8,
+    ):
+        self.fetch = fetch
+        self.parse = parse
+        self.classify = classify
+        self.deliver = deliver
+        self.io_executor = io_executor
+        self.cpu_executor = cpu_executor
+        self.queue_size = max(1, int(queue_size))
+        self.parse_workers = max(1, int(parse_workers))
+        self.classify_workers = max(1, int(classify_workers))
+        self.deliver_workers = max(1, int(deliver_workers))
+        self.on_done = on_done
+        self.on_failed = on_failed
+        self.classify_batch = classify_batch
+        self.classify_batch_size = max(1, int(classify_batch_size))
+        self.stats = PipelineStats()
+        self.logger = logging.getLogger(__name__)
+        self._pending: Deque[int] = deque()
+        self._completed: Set[int] = set()
+        self._failed: Set[int] = set()
+
+    def _complete(self, uid: int) -> None:
+        """Marca un UID como terminado y avanza la marca en orden de descarga"""
+        self._completed.add(uid)
+        while self._pending and self._pending[0] in self._completed:
+            done = self._pending.popleft()
+            self._completed.discard(done)
+            if done in self._failed:
+                self._failed.discard(done)
+            elif self.on_done is not None:
+                self.on_done(done)
+
+    def _fail(self, uid: int) -> None:
+        """Registra un UID que no terminó alguna etapa"""
+        self.stats.failed += 1
+        if self.on_failed is None:
+            # Sin forma de reintentarlo, la marca no debe pasar de este UID
+            return
+        self.on_failed(uid)
+        self._failed.add(uid)
+        self._complete(uid)
+
+    async def _produce(self, out_queue: asyncio.Queue) -> None:
+        """Etapa de descarga: recorre el iterador bloqueante en un hilo"""
+        loop = asyncio.get_running_loop()
+
+        async def enqueue(item) -> None:
+            self._pending.append(item[0])
+            self.stats.fetched += 1
+            await out_queue.put(item)
+
+        def run() -> None:
+            for item in self.fetch():
+                # Bloquea el hilo de descarga mientras la cola esté llena
+                asyncio.run_coroutine_threadsafe(enqueue(item), loop).result()
+
+        await loop.run_in_executor(self.io_executor, run)
+
+    async def _worker(
+        self,
+        name: str,
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue],
+        handle: Callable[[Any], Awaitable[Any]],
+    ) -> None:
+        """Consume elementos ``(uid, dato)`` y pasa el resultado a la siguiente etapa"""
+        while True:
+            item = await in_queue.get()
+            if item is _DONE:
+                return
+            uid, value = item
+            try:
+                result = await handle(value)
+            except Exception as e:
+                self.logger.error(f"Fallo en la etapa {name} (UID {uid}): {e}")
+                self._fail(uid)
+                continue
+
+            if result is None or out_queue is None:
+                self._complete(uid)
+            else:
+                await out_queue.put((uid, result))
+
+    async def _batch_worker(
+        self,
+        name: str,
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue],
+        handle_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        batch_size: int,
+    ) -> None:
+        """Como ``_worker`` pero procesa juntos los elementos ya disponibles"""
+        finished = False
+        while not finished:
+            item = await in_queue.get()
+            if item is _DONE:
+                return
+            batch = [item]
+            while len(batch) < batch_size and not in_queue.empty():
+                item = in_queue.get_nowait()
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+
+            try:
+                results = await handle_batch([value for _, value in batch])
+            except Exception as e:
+                uids = ", ".join(str(uid) for uid, _ in batch)
+                self.logger.error(f"Fallo en la etapa {name} (UIDs {uids}): {e}")
+                for uid, _ in batch:
+                    self._fail(uid)
+                continue
+
+            for (uid, _), result in zip(batch, results):
+                if result is None or out_queue is None:
+                    self._complete(uid)
+                else:
+                    await out_queue.put((uid, result))
+
+    async def _run_stage(
+        self,
+        name: str,
+        workers: int,
+        in_queue: asyncio.Queue,
+        out_queue: Optional[asyncio.Queue],
+        handle: Callable[[Any], Awaitable[Any]],
+        downstream_workers: int = 0,
+        batch_size: int = 0,
+    ) -> None:
+        """Lanza los workers de una etapa y propaga el fin a la siguiente"""
+        if batch_size:
+            workers_coros = [
+                self._batch_worker(name, in_queue, out_queue, handle, batch_size)
+                for _ in range(workers)
+            ]
+        else:
+            workers_coros = [
+                self._worker(name, in_queue, out_queue, handle) for _ in range(workers)
+            ]
+        await asyncio.gather(*workers_coros)
+        if out_queue is not None:
+            for _ in range(downstream_workers):
+                await out_queue.put(_DONE)
+
+    async def run(self) -> PipelineStats:
+        """Procesa todos los mensajes del iterador de descarga"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        fetched: asyncio.Queue = asyncio.Queue(self.queue_size)
+        parsed: asyncio.Queue = asyncio.Queue(self.queue_size)
+        classified: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        async def parse(raw):
+            result = await loop.run_in_executor(self.cpu_executor, self.parse, raw)
+            if result is not None:
+                self.stats.parsed += 1
+            return result
+
+        async def classify(email_msg):
+            result = await loop.run_in_executor(
+                self.cpu_executor, self.classify, email_msg
+            )
+            self.stats.classified += 1
+            return email_msg, result
+
+        async def classify_batch(email_msgs):
+            results = await loop.run_in_executor(
+                self.cpu_executor, self.classify_batch, email_msgs
+            )
+            self.stats.classified += len(email_msgs)
+            self.stats.classify_batches += 1
+            return list(zip(email_msgs, results))
+
+        async def deliver(item):
+            email_msg, classification = item
+            await self.deliver(email_msg, classification)
+            self.stats.delivered += 1
+
+        if self.classify_batch is None:
+            classify_handle, classify_batch_size = classify, 0
+        else:
+            classify_handle, classify_batch_size = classify_batch, self.classify_batch_size
+
+        stages = [
+            asyncio.create_task(
+                self._run_stage(
+                    "parse",
+                    self.parse_workers,
+                    fetched,
+                    parsed,
+                    parse,
+                    downstream_workers=self.classify_workers,
+                )
+            ),
+            asyncio.create_task(
+                self._run_stage(
+                    "classify",
+                    self.classify_workers,
+                    parsed,
+                    classified,
+                    classify_handle,
+                    downstream_workers=self.deliver_workers,
+                    batch_size=classify_batch_size,
+                )
+            ),
+            asyncio.create_task(
+                self._run_stage("deliver", self.deliver_workers, classified, None, deliver)
+            ),
+        ]
+
+        fetch_error: Optional[BaseException] = None
+        try:
+            await self._produce(fetched)
+        except Exception as e:
+            # Terminar lo ya descargado antes de propagar el error de conexión
+            fetch_error = e
+        finally:
+            for _ in range(self.parse_workers):
+                await fetched.put(_DONE)
+
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for task in stages:
+                task.cancel()
+            raise
+
+        self.stats.elapsed = time.perf_counter() - start
+        self.logger.info(
+            f"⏱️ Pipeline: {self.stats.delivered}/{self.stats.fetched} correos "
+            f"procesados en {self.stats.elapsed:.2f}s"
+        )
+        if fetch_error is not None:
+            raise fetch_error
+        return self.stats
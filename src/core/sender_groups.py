@@ -0,0 +1,171 @@
+"""
+Grupos de remitentes con índice inverso y recarga en caliente
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+
+class DomainTrie:
+    """
+    Trie de sufijos de dominio para patrones ``*@*.dominio``
+
+    Las etiquetas se guardan de derecha a izquierda (``com`` → ``empresa`` →
+    ...), así que la búsqueda recorre el dominio una sola vez y devuelve el
+    patrón más específico.
+    """
+
+    def __init__(self):
+        self.root: Dict = {}
+
+    def insert(self, domain: str, group: str) -> None:
+        node = self.root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        # El primer grupo que declara el patrón tiene prioridad
+        node.setdefault("", group)
+
+    def match(self, domain: str) -> Optional[str]:
+        """Grupo del sufijo más largo que es dominio padre de ``domain``"""
+        labels = domain.split(".")
+        node = self.root
+        found = None
+        for depth, label in enumerate(reversed(labels), 1):
+            node = node.get(label)
+            if node is None:
+                break
+            # Solo subdominios: debe quedar al menos una etiqueta a la izquierda
+            if depth < len(labels) and "" in node:
+                found = node[""]
+        return found
+
+
+@dataclass
+class SenderIndex:
+    """Índice de búsqueda construido a partir de ``sender_groups.json``"""
+
+    groups: Dict[str, List[str]] = field(default_factory=dict)
+    addresses: Dict[str, str] = field(default_factory=dict)
+    domains: Dict[str, str] = field(default_factory=dict)
+    subdomains: DomainTrie = field(default_factory=DomainTrie)
+
+    @classmethod
+    def build(cls, groups: Dict[str, List[str]]) -> "SenderIndex":
+        """
+        Indexa los patrones de cada grupo
+
+        - ``usuario@empresa.com``: dirección exacta
+        - ``*@empresa.com``: cualquier dirección del dominio
+        - ``*@*.empresa.com``: cualquier subdominio de ``empresa.com``
+
+        Si un patrón aparece en varios grupos gana el primero del fichero.
+        """
+        if not isinstance(groups, dict):
+            raise ValueError("el fichero debe ser un objeto {grupo: [remitentes]}")
+        index = cls(groups=groups)
+        for group, senders in groups.items():
+            if not isinstance(senders, list):
+                raise ValueError(f"el grupo {group} debe ser una lista")
+            for sender in senders:
+                pattern = str(sender).strip().lower()
+                if pattern.startswith("*@*."):
+                    index.subdomains.insert(pattern[4:], group)
+                elif pattern.startswith("*@"):
+                    index.domains.setdefault(pattern[2:], group)
+                elif pattern:
+                    index.addresses.setdefault(pattern, group)
+        return index
+
+    def lookup(self, sender: str) -> Optional[str]:
+        """Dirección exacta, después dominio y por último subdominio"""
+        sender = sender.strip().lower()
+        group = self.addresses.get(sender)
+        if group is not None:
+            return group
+        domain = sender.rpartition("@")[2]
+        if not domain:
+            return None
+        return self.domains.get(domain) or self.subdomains.match(domain)
+
+
+class SenderGroupManager:
+    """
+    Gestor de grupos de remitentes
+
+    Las búsquedas usan un índice inverso (dirección → grupo, dominio → grupo
+    y un trie de sufijos para subdominios), así que no dependen del número de
+    remitentes. Si el fichero cambia (fecha de modificación o tamaño) se
+    vuelve a leer sin reiniciar; el índice nuevo sustituye al anterior de una
+    vez y, si el fichero no es válido, se conserva el anterior.
+    """
+
+    def __init__(
+        self, json_path: str = "sender_groups.json", reload_interval: float = 2.0
+    ):
+        self.json_path = json_path
+        # Segundos mínimos entre comprobaciones del fichero
+        self.reload_interval = reload_interval
+        self.logger = logging.getLogger(__name__)
+        self._reload_lock = threading.Lock()
+        self._next_check = 0.0
+        self._signature: Optional[Tuple[float, int]] = None
+        self._index = SenderIndex()
+        self._load(initial=True)
+
+    @property
+    def groups(self) -> Dict[str, List[str]]:
+        return self._index.groups
+
+    def _file_signature(self) -> Optional[Tuple[float, int]]:
+        try:
+            stat = os.stat(self.json_path)
+        except OSError:
+            return None
+        return (stat.st_mtime, stat.st_size)
+
+    def _load(self, initial: bool = False) -> None:
+        """Lee el fichero y sustituye el índice si es válido"""
+        signature = self._file_signature()
+        try:
+            with open(self.json_path, "r", encoding="utf-8") as f:
+                index = SenderIndex.build(json.load(f))
+        except Exception as e:
+            self.logger.warning(f"No se pudo cargar {self.json_path}: {e}")
+            self._signature = signature
+            return
+        self._index = index
+        self._signature = signature
+        if not initial:
+            self.logger.info(
+                f"🔄 Grupos de remitentes recargados de {self.json_path} "
+                f"({len(index.groups)} grupos)"
+            )
+
+    def _maybe_reload(self) -> None:
+        """Recarga el fichero si cambió desde la última lectura"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        # Un solo hilo comprueba el fichero; el resto usa el índice actual
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + self.reload_interval
+            if self._file_signature() != self._signature:
+                self._load()
+        finally:
+            self._reload_lock.release()
+
+    def get_label_for_sender(self, sender: str) -> str:
+        """Busca en qué grupo está un remitente"""
+        self._maybe_reload()
+        return self._index.lookup(sender or "") or "Otros"
+
+    def get_groups(self) -> Dict[str, List[str]]:
+        """Retorna todos los grupos"""
+        return self.groups.copy()
@@ -0,0 +1,211 @@
+"""
+Registros del resumen diario en SQLite, a salvo de reinicios
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Columnas de cada registro (las claves de ``email_data`` en el monitor)
+COLUMNS = (
+    "sender",
+    "subject",
+    "label",
+    "sender_group",
+    "date",
+    "notified",
+    "reason",
+    "rule",
+)
+
+
+@dataclass
+class SummaryCounts:
+    """Recuentos del resumen, en el orden en que apareció cada valor"""
+
+    total: int = 0
+    by_label: Dict[str, int] = field(default_factory=dict)
+    by_sender_group: Dict[str, int] = field(default_factory=dict)
+    by_reason: Dict[str, int] = field(default_factory=dict)
+
+
+class SummaryStore:
+    """
+    Correos procesados pendientes del resumen diario
+
+    Los registros se acumulan en memoria y se escriben en bloque cada
+    ``batch_size`` correos o, como tarde, ``flush_interval`` segundos después
+    del primero pendiente (un temporizador lo escribe aunque no lleguen más
+    correos); un reinicio pierde como mucho esos segundos. La base de datos va en modo WAL, así
+    que otro proceso (``python main.py send_summary``) puede leerla mientras
+    el monitor escribe. Los recuentos se calculan en SQLite y el detalle se
+    recorre con un cursor, así que la memoria no crece con los correos del
+    día. Sin ``path`` la base de datos vive en memoria.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        batch_size: int = 50,
+        flush_interval: float = 5.0,
+    ):
+        self.path = path or None
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._pending: List[Tuple] = []
+        self._last_flush = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        self._db: Optional[sqlite3.Connection] = self._open_db()
+
+    def _open_db(self) -> sqlite3.Connection:
+        """Abre (o crea) la base de datos; si no se puede, usa una en memoria"""
+        if self.path:
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False)
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+                self._create_table(db)
+                return db
+            except (OSError, sqlite3.Error) as e:
+                self.logger.warning(
+                    f"No se pudo abrir {self.path}, el resumen no sobrevivirá "
+                    f"a un reinicio: {e}"
+                )
+        db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._create_table(db)
+        return db
+
+    @staticmethod
+    def _create_table(db: sqlite3.Connection) -> None:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, added REAL NOT NULL, "
+            "sender TEXT, subject TEXT, label TEXT, sender_group TEXT, "
+            "date TEXT, notified INTEGER, reason TEXT, rule TEXT)"
+        )
+        db.commit()
+
+    def add(self, email_data: Dict) -> None:
+        """Añade un registro; se escribe al completar el bloque"""
+        row = (
+            time.time(),
+            email_data.get("sender", "Desconocido"),
+            email_data.get("subject", "Sin asunto"),
+            email_data.get("label", "Otros"),
+            email_data.get("sender_group", "Otros"),
+            email_data.get("date", ""),
+            int(bool(email_data.get("notified"))),
+            email_data.get("reason"),
+            email_data.get("rule"),
+        )
+        with self._lock:
+            self._pending.append(row)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+            if len(self._pending) >= self.batch_size or due:
+                self._flush()
+            elif self._timer is None and self._db is not None:
+                self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_flush(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._flush()
+
+    def flush(self) -> None:
+        """Escribe los registros pendientes"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending or self._db is None:
+            return
+        try:
+            self._db.executemany(
+                f"INSERT INTO records (added, {', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})",
+                self._pending,
+            )
+            self._db.commit()
+            self._pending.clear()
+        except sqlite3.Error as e:
+            # Se reintenta en la siguiente escritura
+            self.logger.warning(f"No se pudo guardar el resumen: {e}")
+
+    def last_id(self) -> Optional[int]:
+        """Último registro guardado (límite del resumen que se va a enviar)"""
+        self.flush()
+        with self._lock:
+            return self._db.execute("SELECT MAX(id) FROM records").fetchone()[0]
+
+    def counts(self, up_to: int) -> SummaryCounts:
+        """Recuentos por etiqueta, grupo y motivo hasta ``up_to`` incluido"""
+        result = SummaryCounts()
+        with self._lock:
+            result.total = self._db.execute(
+                "SELECT COUNT(*) FROM records WHERE id <= ?", (up_to,)
+            ).fetchone()[0]
+            for column, target in (
+                ("label", result.by_label),
+                ("sender_group", result.by_sender_group),
+            ):
+                for value, count in self._db.execute(
+                    f"SELECT {column}, COUNT(*) FROM records WHERE id <= ? "
+                    f"GROUP BY {column} ORDER BY MIN(id)",
+                    (up_to,),
+                ):
+                    target[value] = count
+            for value, count in self._db.execute(
+                "SELECT COALESCE(reason, 'Otros'), COUNT(*) FROM records "
+                "WHERE id <= ? AND notified GROUP BY 1 ORDER BY MIN(id)",
+                (up_to,),
+            ):
+                result.by_reason[value] = count
+        return result
+
+    def iter_records(self, up_to: int, chunk: int = 500) -> Iterator[Dict]:
+        """Recorre los registros hasta ``up_to`` por bloques, sin cargarlos todos"""
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    f"SELECT id, {', '.join(COLUMNS)} FROM records "
+                    "WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                    (last, up_to, chunk),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                record = dict(zip(COLUMNS, row[1:]))
+                record["notified"] = bool(record["notified"])
+                yield record
+            last = rows[-1][0]
+
+    def clear(self, up_to: int) -> None:
+        """Borra los registros ya incluidos en un resumen enviado"""
+        with self._lock:
+            self._db.execute("DELETE FROM records WHERE id <= ?", (up_to,))
+            self._db.commit()
+
+    def close(self) -> None:
+        """Escribe lo pendiente y cierra la base de datos"""
+        with self._lock:
+            if self._db is None:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._flush()
+            self._db.close()
+            self._db = None
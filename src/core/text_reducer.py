@@ -0,0 +1,113 @@
+"""
+Reducción del texto de un correo antes de la inferencia
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Tuple
+
+# Inicio de un mensaje citado: todo lo que sigue es la conversación anterior
+_REPLY_HEADERS = [
+    re.compile(r"^\s*(on|el)\s.+(wrote|escribió)\s*:\s*$", re.IGNORECASE),
+    re.compile(r"^\s*-{2,}\s*(original message|mensaje original)\s*-{2,}\s*$", re.I),
+]
+# Comienzo de la firma
+_SIGNATURE_MARKERS = [
+    re.compile(r"^--\s*$"),
+    re.compile(r"^_{5,}\s*$"),
+    re.compile(r"^\s*(enviado desde mi|sent from my)\b", re.IGNORECASE),
+]
+# Párrafos típicos de pie de newsletter o aviso legal
+_FOOTER_MARKERS = re.compile(
+    r"unsubscribe|darse de baja|darte de baja|cancelar (la )?suscripci[oó]n|"
+    r"no (desea|quiere)s? recibir|view (it )?in (your )?browser|"
+    r"ver (este correo )?en (el|tu) navegador|"
+    r"confidencial|confidential|privileged|aviso legal|"
+    r"all rights reserved|todos los derechos reservados",
+    re.IGNORECASE,
+)
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimación rápida de tokens (palabras y signos)
+
+    Los tokenizadores BPE generan al menos un token por palabra, así que la
+    estimación se queda corta y el presupuesto real es algo mayor.
+    """
+    return len(_TOKEN.findall(text))
+
+
+def strip_quoted(body: str) -> str:
+    """Elimina las líneas citadas (``>``) y la conversación anterior"""
+    kept: List[str] = []
+    for line in body.splitlines():
+        if any(pattern.match(line) for pattern in _REPLY_HEADERS) and kept:
+            break
+        if line.lstrip().startswith(">"):
+            continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+def strip_signature(body: str) -> str:
+    """Corta el cuerpo en el separador de firma"""
+    lines = body.splitlines()
+    for i, line in enumerate(lines):
+        if i and any(pattern.match(line) for pattern in _SIGNATURE_MARKERS):
+            return "\n".join(lines[:i])
+    return body
+
+
+def strip_footers(paragraphs: List[str]) -> List[str]:
+    """Quita los párrafos finales de baja, avisos legales y similares"""
+    while len(paragraphs) > 1 and _FOOTER_MARKERS.search(paragraphs[-1]):
+        paragraphs = paragraphs[:-1]
+    return paragraphs
+
+
+@dataclass
+class TextReducer:
+    """
+    Recorta un correo a un presupuesto de tokens conservando lo más útil
+
+    Quita las respuestas citadas, la firma y los pies de página, y después
+    mantiene el asunto completo y los primeros párrafos del cuerpo hasta
+    ``max_tokens``. Con ``max_tokens=0`` solo se limpia el texto.
+    """
+
+    max_tokens: int = 256
+
+    def reduce(self, subject: str, body: str) -> Tuple[str, str]:
+        """Devuelve ``(asunto, cuerpo reducido)``"""
+        body = strip_signature(strip_quoted(body or ""))
+        paragraphs = [
+            " ".join(p.split()) for p in re.split(r"\n\s*\n", body) if p.strip()
+        ]
+        paragraphs = strip_footers(paragraphs)
+
+        if self.max_tokens <= 0:
+            return subject, "\n\n".join(paragraphs)
+
+        budget = self.max_tokens - count_tokens(subject)
+        kept: List[str] = []
+        for paragraph in paragraphs:
+            if budget <= 0:
+                break
+            tokens = _TOKEN.findall(paragraph)
+            if len(tokens) > budget:
+                # Cortar el párrafo por palabras, no a mitad de una
+                words = paragraph.split()
+                cut: List[str] = []
+                for word in words:
+                    budget -= count_tokens(word)
+                    if budget < 0:
+                        break
+                    cut.append(word)
+                if cut:
+                    kept.append(" ".join(cut))
+                break
+            kept.append(paragraph)
+            budget -= len(tokens)
+        return subject, "\n\n".join(kept)
@@ -0,0 +1,324 @@
+"""
+Reglas de usuario declarativas compiladas en una tabla de decisión
+
+El fichero ``RULES_FILE`` es una lista JSON de reglas. Cada regla tiene un
+nombre, una acción y las condiciones que deben cumplirse todas (en las
+listas basta con que coincida un valor)::
+
+    [
+      {"name": "proveedor", "domain": ["proveedor.com"],
+       "subject": "factura|invoice", "action": "route", "group": "Facturas"},
+      {"name": "boletines", "header": ["List-Unsubscribe"], "action": "suppress"}
+    ]
+
+Condiciones: ``sender``, ``domain``, ``subject`` y ``body`` (expresiones
+regulares, sin distinguir mayúsculas), ``label``, ``header`` (presencia de
+la cabecera) y ``min_size``/``max_size`` (bytes). Acciones: ``notify``,
+``suppress``, ``route`` (con ``group``) y ``priority`` (con ``priority``:
+0 urgente, 1 importante, 2 normal). Gana la primera regla del fichero que
+se cumple.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ("notify", "suppress", "route", "priority")
+# Prioridades de la cola de Telegram: 0 urgente, 1 importante, 2 normal
+PRIORITIES = (0, 1, 2)
+
+RULE_FIELDS = {
+    "name",
+    "action",
+    "sender",
+    "domain",
+    "subject",
+    "body",
+    "label",
+    "header",
+    "min_size",
+    "max_size",
+    "group",
+    "priority",
+}
+
+_BACKREF = re.compile(r"\\[1-9]|\(\?P=")
+
+
+def _as_set(value, key: str) -> FrozenSet[str]:
+    """Un valor o una lista de valores, en minúsculas"""
+    if value is None:
+        return frozenset()
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        raise ValueError(f"{key} debe ser un texto o una lista")
+    return frozenset(str(v).strip().lower() for v in value if str(v).strip())
+
+
+def _as_size(value, key: str) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError(f"{key} debe ser un entero positivo")
+    return value
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Condiciones y acción de una regla del fichero"""
+
+    name: str
+    action: str = "notify"
+    senders: FrozenSet[str] = frozenset()
+    domains: FrozenSet[str] = frozenset()
+    subject: Optional[str] = None
+    body: Optional[str] = None
+    labels: FrozenSet[str] = frozenset()
+    headers: FrozenSet[str] = frozenset()
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    group: Optional[str] = None
+    priority: Optional[int] = None
+
+    @property
+    def notify(self) -> bool:
+        return self.action != "suppress"
+
+    @classmethod
+    def from_dict(cls, entry: Dict, position: int = 0) -> "Rule":
+        """Valida una entrada del fichero (``position`` da el nombre por defecto)"""
+        if not isinstance(entry, dict):
+            raise ValueError(f"la regla {position} debe ser un objeto")
+        name = str(entry.get("name") or f"regla {position}")
+        unknown = set(entry) - RULE_FIELDS
+        if unknown:
+            raise ValueError(f"{name}: campos desconocidos {sorted(unknown)}")
+
+        action = entry.get("action", "notify")
+        if action not in ACTIONS:
+            raise ValueError(f"{name}: acción {action!r} no es una de {ACTIONS}")
+        group = entry.get("group")
+        if action == "route" and not group:
+            raise ValueError(f"{name}: la acción route necesita group")
+        priority = entry.get("priority")
+        if priority is not None and priority not in PRIORITIES:
+            raise ValueError(f"{name}: priority debe ser uno de {PRIORITIES}")
+        if action == "priority" and priority is None:
+            raise ValueError(f"{name}: la acción priority necesita priority")
+
+        for key in ("subject", "body"):
+            if entry.get(key) is not None:
+                try:
+                    re.compile(entry[key])
+                except re.error as e:
+                    raise ValueError(f"{name}: expresión de {key} inválida: {e}")
+
+        return cls(
+            name=name,
+            action=action,
+            senders=_as_set(entry.get("sender"), "sender"),
+            domains=_as_set(entry.get("domain"), "domain"),
+            subject=entry.get("subject"),
+            body=entry.get("body"),
+            labels=_as_set(entry.get("label"), "label"),
+            headers=_as_set(entry.get("header"), "header"),
+            min_size=_as_size(entry.get("min_size"), "min_size"),
+            max_size=_as_size(entry.get("max_size"), "max_size"),
+            group=str(group) if group else None,
+            priority=priority,
+        )
+
+
+class _TextIndex:
+    """
+    Expresiones de un campo (asunto o cuerpo) unidas en una sola
+
+    Una pasada por el texto da las reglas con coincidencia segura; si no hay
+    ninguna, ninguna expresión del campo puede coincidir. Solo las reglas
+    candidatas que no aparecieron en la pasada se comprueban por separado.
+    """
+
+    def __init__(self, patterns: Sequence[Tuple[int, str]]):
+        self._regexes = {i: re.compile(p, re.IGNORECASE) for i, p in patterns}
+        self._combined: Optional[re.Pattern] = None
+        # Las referencias a grupos cambiarían de número al unir las expresiones
+        if patterns and not any(_BACKREF.search(p) for _, p in patterns):
+            try:
+                self._combined = re.compile(
+                    "|".join(f"(?P<r{i}>{p})" for i, p in patterns), re.IGNORECASE
+                )
+            except re.error:
+                # Grupos con nombre repetido o flags en línea: una a una
+                self._combined = None
+
+    def scan(self, text: str) -> Optional[Set[int]]:
+        """Reglas que coinciden seguro (None si no hay expresión combinada)"""
+        if self._combined is None:
+            return None
+        return {int(m.lastgroup[1:]) for m in self._combined.finditer(text)}
+
+    def matches(self, index: int, text: str, hits: Optional[Set[int]]) -> bool:
+        if hits is not None:
+            if not hits:
+                return False
+            if index in hits:
+                return True
+        return bool(self._regexes[index].search(text))
+
+
+class RuleTable:
+    """
+    Tabla de decisión compilada a partir de las reglas
+
+    Las reglas con ``sender`` se indexan por dirección y las que solo tienen
+    ``domain`` por dominio; el resto se evalúan siempre. Para cada correo solo
+    se recorren las candidatas, en el orden del fichero, comprobando primero
+    las condiciones baratas (etiqueta, cabeceras, tamaño) y después el texto,
+    que se recorre como mucho una vez por campo.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.rules: List[Rule] = list(rules)
+        self._by_sender: Dict[str, List[int]] = {}
+        self._by_domain: Dict[str, List[int]] = {}
+        self._always: List[int] = []
+        for i, rule in enumerate(self.rules):
+            if rule.senders:
+                for sender in rule.senders:
+                    self._by_sender.setdefault(sender, []).append(i)
+            elif rule.domains:
+                for domain in rule.domains:
+                    self._by_domain.setdefault(domain, []).append(i)
+            else:
+                self._always.append(i)
+
+        self._subject = _TextIndex(
+            [(i, r.subject) for i, r in enumerate(self.rules) if r.subject is not None]
+        )
+        self._body = _TextIndex(
+            [(i, r.body) for i, r in enumerate(self.rules) if r.body is not None]
+        )
+        # Cabeceras que usan las reglas (la descarga parcial debe pedirlas)
+        self.headers: FrozenSet[str] = frozenset(
+            h for rule in self.rules for h in rule.headers
+        )
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _candidates(self, sender: str, domain: str) -> List[int]:
+        return sorted(
+            self._by_sender.get(sender, [])
+            + self._by_domain.get(domain, [])
+            + self._always
+        )
+
+    def match(self, email_msg, label: str = "Otros") -> Optional[Rule]:
+        """Primera regla que cumple el correo, o None"""
+        sender = (email_msg.sender or "").strip().lower()
+        domain = email_msg.sender_domain or sender.rpartition("@")[2]
+        label = (label or "").lower()
+        scans: Dict[str, Optional[Set[int]]] = {}
+
+        for i in self._candidates(sender, domain):
+            rule = self.rules[i]
+            if rule.domains and domain not in rule.domains:
+                continue
+            if rule.labels and label not in rule.labels:
+                continue
+            if rule.headers and rule.headers.isdisjoint(email_msg.headers):
+                continue
+            if rule.min_size is not None and email_msg.size < rule.min_size:
+                continue
+            if rule.max_size is not None and email_msg.size > rule.max_size:
+                continue
+            if rule.subject is not None:
+                if "subject" not in scans:
+                    scans["subject"] = self._subject.scan(email_msg.subject)
+                if not self._subject.matches(i, email_msg.subject, scans["subject"]):
+                    continue
+            if rule.body is not None:
+                if "body" not in scans:
+                    scans["body"] = self._body.scan(email_msg.body)
+                if not self._body.matches(i, email_msg.body, scans["body"]):
+                    continue
+            return rule
+        return None
+
+
+def load_rules(path: Optional[str] = None) -> RuleTable:
+    """Lee y compila ``path``; sin fichero la tabla queda vacía"""
+    if not path:
+        return RuleTable()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError("el fichero debe ser una lista de reglas")
+        table = RuleTable(
+            Rule.from_dict(entry, position) for position, entry in enumerate(entries, 1)
+        )
+    except FileNotFoundError:
+        logger.warning(f"No existe {path}, no se aplican reglas de usuario")
+        return RuleTable()
+    except ValueError as e:
+        raise ValueError(f"Reglas de usuario inválidas en {path}: {e}") from e
+    logger.info(f"📋 {len(table)} reglas de usuario cargadas de {path}")
+    return table
+
+
+@dataclass
+class RuleBenchmark:
+    """Resultado de evaluar un fichero de reglas contra un corpus"""
+
+    rules: int
+    messages: int
+    compile_ms: float
+    p50_us: float
+    p99_us: float
+    max_us: float
+    # Correos decididos por cada regla (None: ninguna)
+    matches: Counter = field(default_factory=Counter)
+
+
+def benchmark_rules(
+    path: str, messages: Sequence, label: str = "Otros", repeat: int = 5
+) -> RuleBenchmark:
+    """Compila ``path`` y mide la evaluación de cada correo ``repeat`` veces"""
+    start = time.perf_counter()
+    table = load_rules(path)
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    samples: List[float] = []
+    matches: Counter = Counter()
+    for round_ in range(max(1, repeat)):
+        for email_msg in messages:
+            start = time.perf_counter()
+            rule = table.match(email_msg, label)
+            samples.append(time.perf_counter() - start)
+            if round_ == 0:
+                matches[rule.name if rule else None] += 1
+
+    samples.sort()
+
+    def percentile(q: float) -> float:
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))] * 1e6
+
+    return RuleBenchmark(
+        rules=len(table),
+        messages=len(messages),
+        compile_ms=compile_ms,
+        p50_us=percentile(0.50),
+        p99_us=percentile(0.99),
+        max_us=samples[-1] * 1e6 if samples else 0.0,
+        matches=matches,
+    )
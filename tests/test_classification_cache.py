@@ -0,0 +1,68 @@
+"""
+Tests de la caché de clasificaciones
+"""
+
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
+from src.core.classification_cache import ClassificationCache, normalize_text
+from src.core.email_monitor import EmailClassifier
+
+
+class TestClassificationCache:
+    def test_template_variants_share_key(self):
+        """Correos de la misma plantilla con otras cifras comparten clave"""
+        cache = ClassificationCache()
+        assert normalize_text("Factura  Nº 1234\n") == "factura nº 0"
+        assert cache.key("Factura 1234", "Importe: 10 EUR") == cache.key(
+            "factura 98", "Importe:  250 EUR"
+        )
+        assert cache.key("a", "b", "0.5") != cache.key("a", "b", "0.7")
+
+    def test_lru_eviction_and_stats(self):
+        """La caché descarta la entrada menos usada y cuenta aciertos y ahorro"""
+        cache = ClassificationCache(max_entries=2)
+        cache.put("a", "Urgente", 1.5)
+        cache.put("b", "Otros", 1.0)
+        assert cache.get("a") == "Urgente"
+        cache.put("c", "Importante", 1.0)
+
+        assert cache.get("b") is None
+        assert cache.get("c") == "Importante"
+        assert cache.stats.hits == 2
+        assert cache.stats.misses == 1
+        assert cache.stats.time_saved == 2.5
+
+    def test_persists_between_instances(self):
+        """Con path las entradas sobreviven a un reinicio"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.db")
+            cache = ClassificationCache(path=path, namespace="m")
+            cache.put(cache.key("Alerta", "CPU 99%"), "Urgente", 2.0)
+            cache.close()
+
+            reopened = ClassificationCache(path=path, namespace="m")
+            assert reopened.get(reopened.key("Alerta", "CPU 80%")) == "Urgente"
+            other_model = ClassificationCache(path=path, namespace="otro")
+            assert other_model.get(other_model.key("Alerta", "CPU 80%")) is None
+            reopened.close()
+            other_model.close()
+
+    @patch("src.core.email_monitor.pipeline")
+    def test_classifier_skips_model_on_hit(self, mock_pipeline):
+        """Un correo repetido no vuelve a pasar por el modelo"""
+        model = MagicMock(
+            side_effect=lambda texts, **kwargs: [
+                {"labels": ["Urgente"], "scores": [0.9]} for _ in texts
+            ]
+        )
+        mock_pipeline.return_value = model
+
+        classifier = EmailClassifier(cache_size=100)
+        assert classifier.classify("Alerta 1", "Disco lleno") == "Urgente"
+        assert classifier.classify("Alerta 2", "Disco lleno") == "Urgente"
+
+        assert model.call_count == 1
+        assert classifier.cache.stats.hits == 1
+        assert "50%" in classifier.cache_report()
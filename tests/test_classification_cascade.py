@@ -0,0 +1,110 @@
+"""
+Tests de la clasificación en cascada
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.core import EmailMessage
+from src.core.classification_cascade import ClassificationCascade, parse_tiers
+from src.core.email_monitor import EmailClassifier
+
+
+def _msg(subject, body="", sender="alguien@desconocido.com"):
+    return EmailMessage(
+        subject=subject,
+        sender=sender,
+        sender_domain=sender.split("@")[1],
+        body=body,
+        message_id="<id>",
+        date="",
+    )
+
+
+def _cascade(tiers="sender_group,domain,keywords,fallback,model"):
+    classifier = EmailClassifier()
+    classifier.classify_batch = MagicMock(
+        side_effect=lambda messages: ["Importante"] * len(messages)
+    )
+    sender_groups = MagicMock()
+    sender_groups.get_label_for_sender.side_effect = (
+        lambda sender: "Trabajo" if sender == "jefe@empresa.com" else "Otros"
+    )
+    return ClassificationCascade(
+        classifier,
+        sender_groups,
+        notify_domains=["banco.com"],
+        keywords=["fallo"],
+        tiers=parse_tiers(tiers),
+    )
+
+
+class TestClassificationCascade:
+    def test_rules_decide_before_model(self):
+        """Solo los correos que ninguna regla decide llegan al modelo"""
+        cascade = _cascade()
+        results = cascade.classify_batch(
+            [
+                _msg("Hola", sender="jefe@empresa.com"),
+                _msg("Extracto", sender="avisos@banco.com"),
+                _msg("Fallo en producción"),
+                _msg("Factura de marzo"),
+                _msg("Quedamos el viernes"),
+            ]
+        )
+
+        assert [r.tier for r in results] == [
+            "sender_group",
+            "domain",
+            "keywords",
+            "fallback",
+            "model",
+        ]
+        assert results[0].sender_group == "Trabajo"
+        assert results[3].label == "Importante"
+        cascade.classifier.classify_batch.assert_called_once_with(
+            [("Quedamos el viernes", "")]
+        )
+        assert cascade.report()["model"] == 1
+
+    def test_rule_label_computed_once(self):
+        """Las reglas del clasificador se evalúan una vez por correo, o ninguna"""
+        cascade = _cascade()
+        rule_label = MagicMock(wraps=cascade.classifier.rule_label)
+        cascade.classifier.rule_label = rule_label
+
+        results = cascade.classify_batch(
+            [
+                _msg("Fallo: factura urgente"),
+                _msg("Factura de marzo"),
+                _msg("Hola", sender="jefe@empresa.com"),
+                _msg("Quedamos el viernes"),
+            ]
+        )
+
+        assert [r.label for r in results[:2]] == ["Urgente", "Importante"]
+        assert rule_label.call_count == 4
+        assert cascade.classifier.classify_batch.call_count == 1
+
+    def test_configured_order_and_subset(self):
+        """Los niveles no listados no se evalúan"""
+        cascade = _cascade("domain,model")
+        results = cascade.classify_batch([_msg("Hola", sender="jefe@empresa.com")])
+
+        assert results[0].tier == "model"
+        assert results[0].label == "Importante"
+
+    def test_without_model_unmatched_is_otros(self):
+        """Sin el nivel del modelo lo que no decide ninguna regla queda como Otros"""
+        cascade = _cascade("keywords")
+        results = cascade.classify_batch([_msg("Quedamos el viernes")])
+
+        assert results[0].label == "Otros"
+        assert results[0].tier == "default"
+        cascade.classifier.classify_batch.assert_not_called()
+
+    def test_unknown_tier(self):
+        """Un nivel desconocido es un error de configuración"""
+        with pytest.raises(ValueError):
+            parse_tiers("domain,magia")
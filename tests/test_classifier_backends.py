@@ -0,0 +1,27 @@
+"""
+Tests de los backends de inferencia del clasificador
+"""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src.core.classifier_backends import onnx_model_dir, resolve_quantization
+
+
+class TestClassifierBackends:
+    def test_onnx_model_dir_is_per_model_and_quantization(self):
+        """Cada modelo y cuantización se exporta en su propio directorio"""
+        path = onnx_model_dir("models/onnx", "facebook/bart-large-mnli", "avx2")
+        assert path == os.path.join("models/onnx", "facebook--bart-large-mnli-avx2")
+
+    def test_resolve_quantization(self):
+        """auto elige arm64 en ARM y avx2 en x86"""
+        with patch("platform.machine", return_value="aarch64"):
+            assert resolve_quantization("auto") == "arm64"
+        with patch("platform.machine", return_value="x86_64"):
+            assert resolve_quantization("") == "avx2"
+        assert resolve_quantization("AVX512_VNNI") == "avx512_vnni"
+        with pytest.raises(ValueError):
+            resolve_quantization("fp8")
@@ -0,0 +1,109 @@
+"""
+Tests para las utilidades del protocolo IMAP
+"""
+
+import base64
+
+from src.core.imap_protocol import (
+    compress_uid_set,
+    chunk_uid_sets,
+    count_uid_set,
+    decode_partial_body,
+    find_text_part,
+    iter_fetch_responses,
+    parse_uid_list,
+)
+
+
+class TestMessageSets:
+    def test_compress_uid_set(self):
+        """Los UIDs consecutivos se agrupan en rangos"""
+        assert compress_uid_set([5, 1, 2, 3, 7, 8]) == "1:3,5,7:8"
+        assert compress_uid_set([42]) == "42"
+        assert compress_uid_set([]) == ""
+
+    def test_chunk_uid_sets(self):
+        """Los bloques respetan el tamaño configurado"""
+        chunks = list(chunk_uid_sets(list(range(1, 201)) + [305], 200))
+        assert chunks == ["1:200", "305"]
+
+    def test_count_uid_set(self):
+        """Se cuentan los UIDs de un conjunto VANISHED"""
+        assert count_uid_set(b"(EARLIER) 1:3,5") == 4
+
+    def test_parse_uid_list(self):
+        """Se parsea la respuesta de UID SEARCH"""
+        assert parse_uid_list([b"4 8 15"]) == [4, 8, 15]
+        assert parse_uid_list([b""]) == []
+
+
+class TestFetchParser:
+    def test_multi_message_response(self):
+        """Se reconstruyen varios mensajes con literales intercalados"""
+        data = [
+            (b"1 (UID 10 RFC822 {5}", b"hello"),
+            b")",
+            (b"2 (RFC822 {5}", b"world"),
+            b" UID 11 FLAGS (\\Seen))",
+        ]
+
+        items = list(iter_fetch_responses(data))
+
+        assert [item["UID"] for item in items] == [b"10", b"11"]
+        assert items[0]["RFC822"] == b"hello"
+        assert items[1]["RFC822"] == b"world"
+        assert items[1]["FLAGS"] == [b"\\Seen"]
+        assert items[1]["SEQ"] == 2
+
+    def test_section_keys_and_nil(self):
+        """Las secciones con espacios se tratan como una sola clave"""
+        data = [
+            (b'3 (UID 12 BODY[HEADER.FIELDS (SUBJECT FROM)] {9}', b"Subject:x"),
+            b' BODYSTRUCTURE ("text" "plain" NIL NIL NIL "7bit" 4 1))',
+        ]
+
+        (item,) = iter_fetch_responses(data)
+
+        assert item["BODY[HEADER.FIELDS (SUBJECT FROM)]"] == b"Subject:x"
+        assert item["BODYSTRUCTURE"][:3] == [b"text", b"plain", None]
+
+
+class TestBodyStructure:
+    def test_find_text_part_in_multipart(self):
+        """Se elige la primera parte text/plain que no es adjunto"""
+        bodystructure = [
+            [
+                [b"text", b"plain", [b"charset", b"iso-8859-1"], None, None,
+                 b"quoted-printable", b"120", b"4"],
+                [b"text", b"html", [b"charset", b"utf-8"], None, None,
+                 b"7bit", b"300", b"9"],
+                b"alternative",
+            ],
+            [b"application", b"pdf", [b"name", b"f.pdf"], None, None,
+             b"base64", b"5000000", None, [b"attachment", [b"filename", b"f.pdf"]]],
+            b"mixed",
+            [b"boundary", b"xyz"],
+        ]
+
+        part = find_text_part(bodystructure)
+
+        assert part.section == "1.1"
+        assert part.charset == "iso-8859-1"
+        assert part.encoding == "quoted-printable"
+
+    def test_find_text_part_skips_attachments(self):
+        """Un text/plain adjunto no se usa como cuerpo"""
+        bodystructure = [
+            [b"text", b"html", None, None, None, b"7bit", b"10", b"1"],
+            [b"text", b"plain", None, None, None, b"7bit", b"10", b"1",
+             None, [b"attachment", None]],
+            b"mixed",
+        ]
+        assert find_text_part(bodystructure) is None
+
+    def test_decode_truncated_base64(self):
+        """Un base64 recortado se decodifica hasta el último grupo completo"""
+        encoded = base64.b64encode("Factura vencida ñ".encode("utf-8"))
+        assert decode_partial_body(encoded[:-3], "base64", "utf-8").startswith(
+            "Factura venc"
+        )
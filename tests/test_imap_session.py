@@ -0,0 +1,97 @@
+"""
+Tests para la sesión IMAP persistente
+"""
+
+import imaplib
+import socket
+import time
+from unittest.mock import patch, MagicMock
+
+from src.core.imap_session import IMAPSession
+
+
+def _mock_connection(capabilities=("IMAP4REV1", "IDLE")):
+    connection = MagicMock()
+    connection.capabilities = capabilities
+    connection._new_tag.return_value = b"A001"
+    connection.socket.return_value.pending.return_value = 1
+    return connection
+
+
+class TestIMAPSession:
+    @patch("src.core.imap_session.imaplib.IMAP4_SSL")
+    def test_connection_is_reused(self, mock_imap):
+        """La sesión se autentica una sola vez entre usos"""
+        mock_imap.return_value = _mock_connection()
+        session = IMAPSession("imap.test", "user", "pass")
+
+        first = session.ensure_connected()
+        second = session.ensure_connected()
+
+        assert first is second
+        assert mock_imap.call_count == 1
+        first.login.assert_called_once_with("user", "pass")
+        first.select.assert_called_once_with("inbox")
+        assert session.supports("idle")
+
+    @patch("src.core.imap_session.imaplib.IMAP4_SSL")
+    def test_idle_detects_new_mail(self, mock_imap):
+        """IDLE termina al recibir EXISTS y consume la respuesta etiquetada"""
+        connection = _mock_connection()
+        connection.readline.side_effect = [
+            b"+ idling\r\n",
+            b"* 4 EXISTS\r\n",
+            b"A001 OK IDLE terminated\r\n",
+        ]
+        mock_imap.return_value = connection
+        session = IMAPSession("imap.test", "user", "pass")
+
+        assert session.idle(timeout=10)
+        sent = [call.args[0] for call in connection.send.call_args_list]
+        assert sent == [b"A001 IDLE\r\n", b"DONE\r\n"]
+
+    @patch("src.core.imap_session.time.sleep")
+    @patch("src.core.imap_session.imaplib.IMAP4_SSL")
+    def test_polling_fallback_without_idle(self, mock_imap, mock_sleep):
+        """Sin capacidad IDLE se espera el intervalo de polling"""
+        mock_imap.return_value = _mock_connection(capabilities=("IMAP4REV1",))
+        session = IMAPSession("imap.test", "user", "pass")
+
+        assert not session.wait_for_changes(idle_timeout=300, poll_interval=7)
+        mock_sleep.assert_called_once_with(7)
+
+    @patch("src.core.imap_session.imaplib.IMAP4_SSL")
+    def test_dropped_connection_is_invalidated(self, mock_imap):
+        """Una desconexión durante IDLE fuerza la reconexión posterior"""
+        connection = _mock_connection()
+        connection.readline.side_effect = imaplib.IMAP4.abort("socket error")
+        mock_imap.return_value = connection
+        session = IMAPSession("imap.test", "user", "pass")
+
+        assert not session.wait_for_changes(idle_timeout=300, poll_interval=5)
+        assert not session.connected
+
+    def test_idle_sees_lines_already_buffered(self):
+        """Un EXISTS que llega en el mismo paquete que "+ idling" no espera al timeout"""
+        client, server = socket.socketpair()
+        try:
+            file = client.makefile("rb")
+            connection = MagicMock()
+            connection._new_tag.return_value = b"A001"
+            connection.socket.return_value = client
+            connection.readline = file.readline
+            connection.file = file
+            connection.send = client.sendall
+            server.sendall(b"+ idling\r\n* 5 EXISTS\r\n")
+
+            session = IMAPSession("imap.test", "user", "pass")
+            session.connection = connection
+            server.sendall(b"A001 OK IDLE terminated\r\n")
+
+            start = time.monotonic()
+            assert session.idle(timeout=3)
+            assert time.monotonic() - start < 1
+            assert server.recv(64) == b"A001 IDLE\r\nDONE\r\n"
+        finally:
+            client.close()
+            server.close()
@@ -0,0 +1,102 @@
+"""
+Tests del pool de procesos de inferencia
+"""
+
+import os
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.core.email_monitor import EmailClassifier
+from src.core.inference_pool import InferenceError, InferencePool, InferenceTimeout
+
+
+def fake_model(texts, candidate_labels, batch_size):
+    """Modelo falso: ``lento`` se bloquea y ``caida`` mata el proceso"""
+    if "lento" in texts:
+        time.sleep(30)
+    if "caida" in texts:
+        os._exit(1)
+    return [
+        {"labels": list(candidate_labels), "scores": [0.9, 0.1], "pid": os.getpid()}
+        for _ in texts
+    ]
+
+
+def fake_loader(options):
+    return fake_model
+
+
+def flaky_loader(options):
+    """Falla la primera carga (marca en disco, compartida entre procesos)"""
+    if not os.path.exists(options["marker"]):
+        open(options["marker"], "w").close()
+        raise RuntimeError("sin memoria")
+    return fake_model
+
+
+class TestInferencePool:
+    def test_timeout_and_crash_restart_worker(self):
+        """Un proceso bloqueado o caído se reinicia y el pool sigue respondiendo"""
+        pool = InferencePool(fake_loader, workers=1, timeout=2.0)
+        try:
+            first = pool.classify({}, ["hola"], ["Urgente", "Otros"], 2)
+            assert first[0]["labels"] == ["Urgente", "Otros"]
+
+            with pytest.raises(InferenceTimeout):
+                pool.classify({}, ["lento"], ["Urgente", "Otros"], 2)
+            with pytest.raises(InferenceError):
+                pool.classify({}, ["caida"], ["Urgente", "Otros"], 2)
+
+            again = pool.classify({}, ["hola"], ["Urgente", "Otros"], 2)
+            assert again[0]["pid"] != first[0]["pid"]
+            health = pool.health()
+            assert health["alive"] == 1
+            assert health["timeouts"] == 1
+            assert health["restarts"] == 2
+        finally:
+            pool.close()
+
+    def test_restart_limit(self):
+        """Agotados los reinicios, las peticiones fallan sin relanzar procesos"""
+        pool = InferencePool(fake_loader, workers=1, timeout=5.0, max_restarts=0)
+        try:
+            with pytest.raises(InferenceError):
+                pool.classify({}, ["caida"], ["Urgente", "Otros"], 2)
+            with pytest.raises(InferenceError):
+                pool.classify({}, ["hola"], ["Urgente", "Otros"], 2)
+            assert pool.health()["alive"] == 0
+        finally:
+            pool.close()
+
+    def test_failed_load_is_retried_after_backoff(self, tmp_path):
+        """Un fallo de carga no deja el proceso sin modelo para siempre"""
+        pool = InferencePool(flaky_loader, workers=1, timeout=5.0, load_retry=1.0)
+        options = {"marker": str(tmp_path / "cargado")}
+        try:
+            with pytest.raises(InferenceError):
+                pool.classify(options, ["hola"], ["Urgente", "Otros"], 2)
+            # Durante la espera no se reintenta
+            with pytest.raises(InferenceError):
+                pool.classify(options, ["hola"], ["Urgente", "Otros"], 2)
+
+            time.sleep(1.1)
+            result = pool.classify(options, ["hola"], ["Urgente", "Otros"], 2)
+            assert result[0]["labels"] == ["Urgente", "Otros"]
+            assert pool.health()["restarts"] == 0
+        finally:
+            pool.close()
+
+    def test_classifier_falls_back_on_pool_errors(self):
+        """El clasificador usa las reglas si el pool no responde a tiempo"""
+        classifier = EmailClassifier(workers=1)
+        classifier.pool = MagicMock()
+        classifier.pool.classify.side_effect = InferenceTimeout("sin respuesta")
+
+        assert classifier.classify("URGENTE: caída", "El servidor no responde") == (
+            "Urgente"
+        )
+        options = classifier.pool.classify.call_args.args[0]
+        assert options["spec"]["model_id"] == classifier.model_name
+        assert classifier.classifier is None
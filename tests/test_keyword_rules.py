@@ -0,0 +1,61 @@
+"""
+Tests del buscador de palabras clave
+"""
+
+from src.core.email_monitor import EmailClassifier
+from src.core.keyword_rules import KeywordMatcher, KeywordRule, parse_keywords
+
+
+class TestKeywordMatcher:
+    def test_finds_every_rule_in_one_pass(self):
+        """Encuentra todas las reglas, también solapadas o contenidas en otra"""
+        matcher = KeywordMatcher.from_lists(
+            {
+                "notify": ["error grave", "error", "fallo"],
+                "Urgente": ["URGENTE", "gente"],
+            }
+        )
+        rules = matcher.search("Error grave: urgente", "")
+        assert [rule.pattern for rule in rules] == [
+            "error grave",
+            "error",
+            "URGENTE",
+            "gente",
+        ]
+        assert matcher.tags("Sin novedades", "Todo bien") == set()
+        assert matcher.matches("", "Hubo un FALLO")
+
+    def test_regex_rules(self):
+        """Las entradas con re: son expresiones regulares"""
+        matcher = KeywordMatcher.from_lists(
+            {"Importante": ["pago", r"re:factura\s+n[ºo]\s*\d+"]}
+        )
+        assert matcher.search("Factura Nº 123", "") == [
+            KeywordRule("Importante", r"factura\s+n[ºo]\s*\d+", regex=True)
+        ]
+        assert matcher.tags("facturas", "") == set()
+
+    def test_overlapping_regex_rules(self):
+        """Las expresiones que se solapan con otra coincidencia no se pierden"""
+        matcher = KeywordMatcher.from_lists(
+            {
+                "Importante": ["re:the server", "re:fo+ bar"],
+                "Urgente": ["re:server down", "re:bar"],
+            }
+        )
+        assert matcher.tags("the server down", "") == {"Importante", "Urgente"}
+        assert [rule.pattern for rule in matcher.search("fooo bar", "")] == [
+            "fo+ bar",
+            "bar",
+        ]
+        assert matcher.search("nada", "") == []
+
+    def test_keywords_from_config(self):
+        """Las listas de palabras clave se leen de la configuración"""
+        assert parse_keywords(" alerta, ,caída ") == ["alerta", "caída"]
+        classifier = EmailClassifier.from_config(
+            {"URGENT_KEYWORDS": "alerta", "IMPORTANT_KEYWORDS": "re:\\bpedido\\b"}
+        )
+        assert classifier.rule_label("ALERTA de disco", "") == "Urgente"
+        assert classifier.rule_label("Tu pedido", "") == "Importante"
+        assert classifier.rule_label("Urgente", "") is None
@@ -0,0 +1,222 @@
+"""
+Tests para la selección de correos nuevos y el estado de sincronización
+"""
+
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock
+
+from src.core.mailbox_sync import CondstoreSync, MailboxStateStore, UIDWatermarkSync
+
+
+def _session(**select_info):
+    session = MagicMock()
+    session.select_info = select_info
+    session.take_select_responses.return_value = {}
+    return session
+
+
+def _mock_mail(results):
+    mail = MagicMock()
+    mail.uid.side_effect = lambda cmd, charset, criteria: ("OK", [results[criteria]])
+    return mail
+
+
+class TestMailboxStateStore:
+    def test_state_persists_between_instances(self):
+        """El estado se guarda en disco y se recupera al reiniciar"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "state", "mailbox_state.json")
+            MailboxStateStore(path).update("cuenta/inbox", uidvalidity=9, last_uid=42)
+
+            assert MailboxStateStore(path).get("cuenta/inbox") == {
+                "uidvalidity": 9,
+                "last_uid": 42,
+            }
+
+    def test_stale_snapshot_does_not_overwrite_newer(self):
+        """Una escritura que llega tarde no pisa el estado de otra cuenta"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "mailbox_state.json")
+            store = MailboxStateStore(path)
+            newer_written = threading.Event()
+            real_lock = store._write_lock
+
+            class SlowFirstWriter:
+                # La primera actualización espera a que la segunda se guarde
+                def __enter__(self):
+                    if threading.current_thread().name == "a":
+                        newer_written.wait(5)
+                    return real_lock.__enter__()
+
+                def __exit__(self, *exc):
+                    real_lock.__exit__(*exc)
+                    if threading.current_thread().name == "b":
+                        newer_written.set()
+
+            store._write_lock = SlowFirstWriter()
+            first = threading.Thread(
+                target=store.update, args=("a/inbox",), kwargs={"last_uid": 1}, name="a"
+            )
+            first.start()
+            while store._version < 1:
+                time.sleep(0.01)
+            second = threading.Thread(
+                target=store.update, args=("b/inbox",), kwargs={"last_uid": 2}, name="b"
+            )
+            second.start()
+            first.join(5)
+            second.join(5)
+
+            reloaded = MailboxStateStore(path)
+            assert reloaded.get("a/inbox") == {"last_uid": 1}
+            assert reloaded.get("b/inbox") == {"last_uid": 2}
+
+
+class TestUIDWatermarkSync:
+    def test_first_run_uses_unseen_and_uidnext(self):
+        """Sin estado previo se procesan los no leídos y la marca pasa a UIDNEXT-1"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MailboxStateStore(os.path.join(tmp, "state.json"))
+            sync = UIDWatermarkSync(store, "cuenta/inbox")
+            mail = _mock_mail({"(UNSEEN)": b"10 12"})
+
+            uids = sync.pending_uids(mail, _session(UIDVALIDITY=7, UIDNEXT=20))
+            for uid in uids:
+                sync.mark_processed(uid)
+            sync.commit()
+
+            assert uids == [10, 12]
+            assert store.get("cuenta/inbox") == {"uidvalidity": 7, "last_uid": 19}
+
+    def test_incremental_run_fetches_only_new_uids(self):
+        """Con estado válido solo se piden los UIDs posteriores a la marca"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MailboxStateStore(os.path.join(tmp, "state.json"))
+            store.update("cuenta/inbox", uidvalidity=7, last_uid=19)
+            sync = UIDWatermarkSync(store, "cuenta/inbox")
+            # El servidor devuelve el último mensaje aunque no sea nuevo
+            mail = _mock_mail({"UID 20:*": b"19"})
+
+            assert sync.pending_uids(mail, _session(UIDVALIDITY=7)) == []
+
+            mail = _mock_mail({"UID 20:*": b"20 21"})
+            assert sync.pending_uids(mail, _session(UIDVALIDITY=7)) == [20, 21]
+            sync.mark_processed(20)
+            sync.mark_processed(21)
+            sync.commit()
+            assert store.get("cuenta/inbox")["last_uid"] == 21
+
+    def test_failed_uids_are_retried(self):
+        """Un UID que falló se vuelve a pedir aunque la marca lo haya pasado"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MailboxStateStore(os.path.join(tmp, "state.json"))
+            store.update("cuenta/inbox", uidvalidity=7, last_uid=19)
+            sync = UIDWatermarkSync(store, "cuenta/inbox")
+
+            mail = _mock_mail({"UID 20:*": b"20 21"})
+            assert sync.pending_uids(mail, _session(UIDVALIDITY=7)) == [20, 21]
+            sync.mark_failed(20)
+            sync.mark_processed(21)
+            sync.commit()
+            assert store.get("cuenta/inbox")["last_uid"] == 21
+
+            mail = _mock_mail({"UID 22:*": b"21"})
+            sync = UIDWatermarkSync(store, "cuenta/inbox")
+            assert sync.pending_uids(mail, _session(UIDVALIDITY=7)) == [20]
+            sync.mark_processed(20)
+            sync.commit()
+            assert store.get("cuenta/inbox") == {"uidvalidity": 7, "last_uid": 21}
+
+            # Un mensaje que nunca se procesa se abandona tras MAX_RETRIES ciclos
+            sync.mark_failed(30)
+            sync.commit()
+            for _ in range(UIDWatermarkSync.MAX_RETRIES):
+                assert sync.pending_uids(mail, _session(UIDVALIDITY=7)) == [30]
+                sync.commit()
+            assert sync.pending_uids(mail, _session(UIDVALIDITY=7)) == []
+
+    def test_uidvalidity_change_triggers_resync(self):
+        """Un UIDVALIDITY distinto descarta la marca guardada"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MailboxStateStore(os.path.join(tmp, "state.json"))
+            store.update("cuenta/inbox", uidvalidity=7, last_uid=500)
+            sync = UIDWatermarkSync(store, "cuenta/inbox")
+            mail = _mock_mail({"(UNSEEN)": b"3", "UID *": b"4"})
+
+            assert sync.pending_uids(mail, _session(UIDVALIDITY=8)) == [3]
+            sync.commit()
+            assert store.get("cuenta/inbox") == {"uidvalidity": 8, "last_uid": 4}
+
+
+class TestCondstoreSync:
+    def test_qresync_select_parameters(self):
+        """Con estado previo se reanuda la sesión con QRESYNC"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MailboxStateStore(os.path.join(tmp, "state.json"))
+            store.update("cuenta/inbox", uidvalidity=7, last_uid=19, highestmodseq=900)
+            sync = CondstoreSync(store, "cuenta/inbox")
+            connection = MagicMock()
+            connection.enable.return_value = ("OK", [b"QRESYNC"])
+
+            params = sync.prepare_select(connection, ("IMAP4REV1", "QRESYNC"))
+
+            assert params == "(QRESYNC (7 900))"
+            connection.enable.assert_called_once_with("QRESYNC")
+            assert sync.prepare_select(MagicMock(), ("CONDSTORE",)) == "(CONDSTORE)"
+            assert sync.prepare_select(MagicMock(), ("IMAP4REV1",)) is None
+
+    def test_reconnect_uses_select_changes_without_round_trip(self):
+        """Los cambios recibidos en SELECT (QRESYNC) no requieren otra petición"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MailboxStateStore(os.path.join(tmp, "state.json"))
+            store.update("cuenta/inbox", uidvalidity=7, last_uid=19, highestmodseq=900)
+            sync = CondstoreSync(store, "cuenta/inbox")
+            connection = MagicMock()
+            connection.enable.return_value = ("OK", [])
+            sync.prepare_select(connection, ("QRESYNC",))
+
+            session = _session(UIDVALIDITY=7, HIGHESTMODSEQ=950)
+            session.take_select_responses.return_value = {
+                "FETCH": [
+                    b"3 (UID 12 FLAGS (\\Seen) MODSEQ (910))",
+                    b"9 (UID 20 FLAGS () MODSEQ (950))",
+                ],
+                "VANISHED": [b"(EARLIER) 5:7"],
+            }
+            mail = MagicMock()
+
+            assert sync.pending_uids(mail, session) == [20]
+            mail.uid.assert_not_called()
+            sync.mark_processed(20)
+            sync.commit()
+            assert store.get("cuenta/inbox")["highestmodseq"] == 950
+            assert store.get("cuenta/inbox")["last_uid"] == 20
+
+    def test_changedsince_fetch_on_live_connection(self):
+        """En una conexión viva se piden los cambios con CHANGEDSINCE"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MailboxStateStore(os.path.join(tmp, "state.json"))
+            store.update("cuenta/inbox", uidvalidity=7, last_uid=19, highestmodseq=900)
+            sync = CondstoreSync(store, "cuenta/inbox")
+            mail = MagicMock()
+            mail.uid.return_value = ("OK", [b"9 (UID 21 FLAGS () MODSEQ (905))"])
+
+            uids = sync.pending_uids(mail, _session(UIDVALIDITY=7, HIGHESTMODSEQ=900))
+
+            assert uids == [21]
+            mail.uid.assert_called_once_with(
+                "FETCH", "1:*", "(UID FLAGS) (CHANGEDSINCE 900)"
+            )
+
+    def test_fallback_without_condstore(self):
+        """Sin HIGHESTMODSEQ se usa la marca de agua de UIDs"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = MailboxStateStore(os.path.join(tmp, "state.json"))
+            store.update("cuenta/inbox", uidvalidity=7, last_uid=19)
+            sync = CondstoreSync(store, "cuenta/inbox")
+            mail = _mock_mail({"UID 20:*": b"20"})
+
+            assert sync.pending_uids(mail, _session(UIDVALIDITY=7)) == [20]
@@ -9,9 +9,13 @@ import email
 import json
 import tempfile
 import os
+import re
+
+from telegram.error import BadRequest
 
 from src.core import EmailMonitor, EmailMessage
 from src.core.email_monitor import EmailClassifier, SenderGroupManager, TelegramNotifier
+from src.core.classification_cascade import Classification
 
 
 # Test EmailClassifier
@@ -35,6 +39,83 @@ class TestEmailClassifier:
         assert mock_pipeline.called
         assert result == "Urgente"
 
+    @patch("src.core.email_monitor.pipeline")
+    def test_warm_up_loads_model_in_background(self, mock_pipeline):
+        """El calentamiento carga el modelo, hace una inferencia y mide el tiempo"""
+        mock_pipeline.return_value = MagicMock(
+            return_value=[{"labels": ["Otros"], "scores": [0.9]}]
+        )
+        classifier = EmailClassifier()
+
+        thread = classifier.warm_up()
+        thread.join(timeout=5)
+
+        assert classifier.classifier is mock_pipeline.return_value
+        classifier.classifier.assert_called_once()
+        assert classifier.ready_seconds is not None
+
+    @patch("src.core.email_monitor.pipeline")
+    def test_load_failure_is_retried_after_backoff(self, mock_pipeline):
+        """Un fallo de carga no se reintenta con cada correo sino tras la espera"""
+        mock_pipeline.side_effect = OSError("sin red")
+        classifier = EmailClassifier(load_retry=60)
+
+        assert classifier.classify("URGENTE", "Servidor caído") == "Urgente"
+        assert classifier.classify("Hola", "Qué tal") == "Otros"
+        assert mock_pipeline.call_count == 1
+
+        # Pasada la espera se vuelve a intentar
+        classifier._retry_at = 0.0
+        mock_pipeline.side_effect = None
+        mock_pipeline.return_value = MagicMock(
+            return_value=[{"labels": ["Importante"], "scores": [0.9]}]
+        )
+        assert classifier.classify("Reunión", "Mañana a las 10") == "Importante"
+        assert mock_pipeline.call_count == 2
+        assert classifier._load_failures == 0
+
+    @patch("src.core.email_monitor.pipeline")
+    def test_classify_batch_keeps_input_order(self, mock_pipeline):
+        """classify_batch hace una sola llamada y devuelve las etiquetas en orden"""
+        label_for = {"corto": "Urgente", "un texto algo mas largo": "Importante"}
+
+        def fake_classifier(texts, candidate_labels, batch_size):
+            return [
+                {"labels": [label_for[t.split("\n")[1]]], "scores": [0.9]}
+                for t in texts
+            ]
+
+        mock_pipeline.return_value = MagicMock(side_effect=fake_classifier)
+
+        classifier = EmailClassifier(batch_size=4)
+        labels = classifier.classify_batch(
+            [("a", "un texto algo mas largo"), ("b", "corto")]
+        )
+
+        assert labels == ["Importante", "Urgente"]
+        classifier.classifier.assert_called_once()
+        assert classifier.classifier.call_args.kwargs["batch_size"] == 12
+
+    @patch("src.core.email_monitor.load_onnx_pipeline")
+    @patch("src.core.email_monitor.pipeline")
+    def test_onnx_backend(self, mock_pipeline, mock_onnx):
+        """El backend onnx usa ONNX Runtime y vuelve a PyTorch si falta la dependencia"""
+        mock_onnx.return_value = MagicMock(
+            return_value={"labels": ["Urgente"], "scores": [0.9]}
+        )
+        classifier = EmailClassifier(backend="onnx", threads=2)
+        assert classifier.classify("Caída", "Servidor caído") == "Urgente"
+        assert mock_onnx.call_args.kwargs["threads"] == 2
+        mock_pipeline.assert_not_called()
+
+        mock_onnx.side_effect = ImportError("No module named 'optimum'")
+        classifier = EmailClassifier(backend="onnx")
+        classifier._get_classifier()
+        assert mock_pipeline.called
+
+        with pytest.raises(ValueError):
+            EmailClassifier(backend="tensorrt")
+
     def test_fallback_classification(self):
         """Test de clasificación de fallback"""
         classifier = EmailClassifier()
@@ -146,6 +227,92 @@ class TestTelegramNotifier:
 
         assert not success
 
+    @patch("src.core.email_monitor.Bot")
+    @pytest.mark.asyncio
+    async def test_rejected_daily_summary_raises(self, mock_bot_class):
+        """Un resumen que Telegram rechaza no se da por transitorio"""
+        mock_bot = MagicMock()
+        mock_bot.initialize = AsyncMock()
+        mock_bot.send_message = AsyncMock(side_effect=BadRequest("Message is too long"))
+        mock_bot_class.return_value = mock_bot
+
+        notifier = TelegramNotifier("test_token", "12345")
+        with pytest.raises(BadRequest):
+            await notifier.send_daily_summary("x" * 5000)
+
+    @patch("src.core.email_monitor.Bot")
+    @pytest.mark.asyncio
+    async def test_start_initializes_bot_once(self, mock_bot_class):
+        """El pool se abre una sola vez por loop y se cierra con aclose"""
+        mock_bot = MagicMock()
+        mock_bot.initialize = AsyncMock()
+        mock_bot.shutdown = AsyncMock()
+        mock_bot.send_message = AsyncMock()
+        mock_bot_class.return_value = mock_bot
+
+        notifier = TelegramNotifier("test_token", "12345")
+        await notifier.start()
+        await notifier.send_notification("A", "a@example.com", "x")
+        await notifier.send_notification("B", "b@example.com", "y")
+        await notifier.aclose()
+
+        assert mock_bot.initialize.await_count == 1
+        assert mock_bot.send_message.await_count == 2
+        mock_bot.shutdown.assert_awaited_once()
+        assert mock_bot_class.call_count == 1
+
+    @patch("src.core.email_monitor.Bot")
+    def test_run_sync_reuses_background_loop(self, mock_bot_class):
+        """Las llamadas síncronas comparten un único loop en segundo plano"""
+        loops = []
+
+        async def send_message(**kwargs):
+            loops.append(asyncio.get_running_loop())
+
+        mock_bot = MagicMock()
+        mock_bot.initialize = AsyncMock()
+        mock_bot.shutdown = AsyncMock()
+        mock_bot.send_message = send_message
+        mock_bot_class.return_value = mock_bot
+
+        notifier = TelegramNotifier("test_token", "12345")
+        try:
+            assert notifier.run_sync(notifier.send_daily_summary("uno"))
+            # Desde otro loop la llamada se redirige al loop del notificador
+            assert asyncio.run(notifier.send_notification("S", "a@b.com", "x"))
+        finally:
+            notifier.close()
+
+        assert len(loops) == 2 and loops[0] is loops[1]
+        assert mock_bot.initialize.await_count == 1
+        mock_bot.shutdown.assert_awaited_once()
+
+    @patch("src.core.email_monitor.Bot")
+    @pytest.mark.asyncio
+    async def test_burst_is_coalesced_but_urgent_is_not(self, mock_bot_class):
+        """Una ráfaga del mismo remitente llega como resumen; los urgentes, sueltos"""
+        mock_bot = MagicMock()
+        mock_bot.initialize = AsyncMock()
+        mock_bot.shutdown = AsyncMock()
+        mock_bot.send_message = AsyncMock()
+        mock_bot_class.return_value = mock_bot
+
+        notifier = TelegramNotifier("test_token", "12345", digest_window=60)
+        sender = "alerts@ci.example.com"
+        await notifier.send_notification("Build 0 roto", sender, "x")
+        # Los acumulados esperarían al resumen de la ventana
+        for i in (1, 2):
+            await notifier.send_notification(f"Build {i} roto", sender, "x", wait=False)
+        await notifier.send_notification("Caída total", sender, "x", "Urgente")
+        await notifier.aclose()
+
+        texts = [call.kwargs["text"] for call in mock_bot.send_message.call_args_list]
+        assert len(texts) == 3
+        assert "Build 0 roto" in texts[0]
+        assert "Caída total" in texts[1]
+        assert "2 correos de alerts@ci.example.com" in texts[2]
+        assert "Build 1 roto" in texts[2] and "Build 2 roto" in texts[2]
+
 
 # Test EmailMonitor
 class TestEmailMonitor:
@@ -250,13 +417,176 @@ class TestEmailMonitor:
         # Mock IMAP responses
         mock_connection = MagicMock()
         mock_imap.return_value = mock_connection
-        mock_connection.search.return_value = ("OK", [b""])  # No messages
+        mock_connection.uid.return_value = ("OK", [b""])  # No messages
 
         monitor.check_emails()
 
         mock_connection.login.assert_called_once_with("test", "test")
         mock_connection.select.assert_called_once_with("inbox")
 
+    @patch("src.core.email_monitor.imaplib.IMAP4_SSL")
+    def test_check_emails_reuses_session(self, mock_imap):
+        """Test de reutilización de la sesión IMAP entre verificaciones"""
+        config = {
+            "IMAP_SERVER": "test",
+            "MAIL": "test",
+            "PASS": "test",
+            "TELEGRAM_TOKEN": "test",
+            "TELEGRAM_CHAT_ID": "test",
+        }
+        monitor = EmailMonitor(config)
+
+        mock_connection = MagicMock()
+        mock_imap.return_value = mock_connection
+        mock_connection.uid.return_value = ("OK", [b""])
+
+        monitor.check_emails()
+        monitor.check_emails()
+
+        assert mock_imap.call_count == 1
+        mock_connection.login.assert_called_once_with("test", "test")
+        mock_connection.logout.assert_not_called()
+
+    @patch("src.core.email_monitor.Bot")
+    @patch("src.core.email_monitor.imaplib.IMAP4_SSL")
+    def test_check_emails_keeps_telegram_client(self, mock_imap, mock_bot_class):
+        """El cliente de Telegram y su cola sobreviven entre ciclos síncronos"""
+        mock_bot = MagicMock()
+        mock_bot.initialize = AsyncMock()
+        mock_bot.shutdown = AsyncMock()
+        mock_bot.send_message = AsyncMock()
+        mock_bot_class.return_value = mock_bot
+        config = {
+            "IMAP_SERVER": "test",
+            "MAIL": "test",
+            "PASS": "test",
+            "TELEGRAM_TOKEN": "test",
+            "TELEGRAM_CHAT_ID": "test",
+            "NOTIFY_KEYWORDS": "caida",
+        }
+        monitor = EmailMonitor(config)
+
+        raw = b"Subject: caida\r\nFrom: a@b.com\r\n\r\nCuerpo"
+        responses = {
+            "SEARCH": ("OK", [b"1"]),
+            "FETCH": ("OK", [(b"1 (UID 1 RFC822 {%d}" % len(raw), raw), b")"]),
+        }
+        mock_connection = MagicMock()
+        mock_imap.return_value = mock_connection
+        mock_connection.uid.side_effect = lambda cmd, *args: responses[cmd]
+
+        notifier = monitor.telegram_notifier
+        try:
+            with patch.object(
+                monitor,
+                "_classify_messages",
+                side_effect=lambda msgs: [Classification("Otros")] * len(msgs),
+            ):
+                monitor.check_emails()
+                loop, queue = notifier._loop, notifier.queue
+                monitor.check_emails()
+
+            assert loop is monitor._loop and loop.is_running()
+            assert notifier._loop is loop
+            assert notifier.queue is queue
+            mock_bot.initialize.assert_awaited_once()
+        finally:
+            monitor.close()
+        assert mock_bot.send_message.await_count >= 1
+
+    @patch("src.core.email_monitor.imaplib.IMAP4_SSL")
+    def test_check_emails_batches_uid_fetch(self, mock_imap):
+        """Test de descarga por lotes con UID FETCH"""
+        config = {
+            "IMAP_SERVER": "test",
+            "MAIL": "test",
+            "PASS": "test",
+            "TELEGRAM_TOKEN": "test",
+            "TELEGRAM_CHAT_ID": "test",
+            "FETCH_BATCH_SIZE": "2",
+        }
+        monitor = EmailMonitor(config)
+
+        raw = b"Subject: Hola\r\nFrom: a@b.com\r\n\r\nCuerpo"
+        responses = {
+            "SEARCH": ("OK", [b"1 2 3"]),
+            "FETCH": ("OK", [(b"1 (UID 1 RFC822 {%d}" % len(raw), raw), b")"]),
+        }
+        mock_connection = MagicMock()
+        mock_imap.return_value = mock_connection
+        mock_connection.uid.side_effect = lambda cmd, *args: responses[cmd]
+
+        with patch.object(
+            monitor,
+            "_classify_messages",
+            side_effect=lambda msgs: [("Otros", "Otros")] * len(msgs),
+        ), patch.object(monitor, "_deliver", new_callable=AsyncMock) as mock_handle:
+            monitor.check_emails()
+
+        fetch_sets = [
+            call.args[1]
+            for call in mock_connection.uid.call_args_list
+            if call.args[0] == "FETCH"
+        ]
+        assert fetch_sets == ["1:2", "3"]
+        mock_connection.fetch.assert_not_called()
+        assert mock_handle.call_count == 2
+        assert mock_handle.call_args.args[0].subject == "Hola"
+
+    @patch("src.core.email_monitor.imaplib.IMAP4_SSL")
+    def test_check_emails_partial_fetch(self, mock_imap):
+        """Test de descarga parcial: cabeceras primero y cuerpo limitado"""
+        config = {
+            "IMAP_SERVER": "test",
+            "MAIL": "test",
+            "PASS": "test",
+            "TELEGRAM_TOKEN": "test",
+            "TELEGRAM_CHAT_ID": "test",
+            "FETCH_MODE": "partial",
+            "BODY_FETCH_BYTES": "16",
+        }
+        monitor = EmailMonitor(config)
+
+        headers = b"Subject: Alerta\r\nFrom: Ops <ops@empresa.com>\r\n\r\n"
+        header_response = [
+            (b"1 (UID 7 RFC822.SIZE 2500000 "
+             b"BODY[HEADER.FIELDS (SUBJECT FROM DATE MESSAGE-ID)] {%d}"
+             % len(headers), headers),
+            b' BODYSTRUCTURE ("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 20 1))',
+        ]
+        body_response = [(b"1 (UID 7 BODY[1]<0> {16}", b"Servidor caido!!"), b")"]
+
+        def uid_command(cmd, uid_set=None, items=None):
+            if cmd == "SEARCH":
+                return "OK", [b"7"]
+            return "OK", body_response if "BODY.PEEK[1]" in items else header_response
+
+        mock_connection = MagicMock()
+        mock_imap.return_value = mock_connection
+        mock_connection.uid.side_effect = uid_command
+
+        with patch.object(
+            monitor,
+            "_classify_messages",
+            side_effect=lambda msgs: [("Otros", "Otros")] * len(msgs),
+        ), patch.object(monitor, "_deliver", new_callable=AsyncMock) as mock_handle:
+            monitor.check_emails()
+
+        fetch_items = [
+            call.args[2]
+            for call in mock_connection.uid.call_args_list
+            if call.args[0] == "FETCH"
+        ]
+        # Solo se pide el tamaño, nunca el mensaje completo
+        assert not re.search(r"RFC822(?!\.SIZE)", " ".join(fetch_items))
+        assert "RFC822.SIZE" in fetch_items[0]
+        assert fetch_items[1] == "(UID BODY.PEEK[1]<0.16>)"
+        email_msg = mock_handle.call_args.args[0]
+        assert email_msg.subject == "Alerta"
+        assert email_msg.sender == "ops@empresa.com"
+        assert email_msg.body == "Servidor caido!!"
+        assert email_msg.size == 2500000
+
     def test_decode_mixed_header(self):
         """Test de decodificación de headers mixtos"""
         config = {
@@ -0,0 +1,71 @@
+"""
+Tests de la descarga del modelo por inactividad
+"""
+
+from unittest.mock import MagicMock, patch
+
+from src.core.email_monitor import EmailClassifier
+from src.core.inference_pool import InferencePool
+from src.core.model_memory import release_memory, resident_memory_mb
+
+
+def _classifier(**kwargs):
+    classifier = EmailClassifier(idle_unload=60, min_residency=300, **kwargs)
+    # Sin hilo de vigilancia: los tests llaman a unload_if_idle directamente
+    classifier._watch_idle = lambda: None
+    return classifier
+
+
+class TestIdleUnload:
+    @patch("src.core.email_monitor.pipeline")
+    def test_unload_after_idle_and_reload(self, mock_pipeline):
+        """El modelo se libera tras el tiempo sin uso y se recarga al clasificar"""
+        mock_pipeline.return_value = MagicMock(
+            return_value={"labels": ["Urgente"], "scores": [0.9]}
+        )
+        classifier = _classifier()
+        assert classifier.classify("Caída", "Servidor caído") == "Urgente"
+        assert not classifier.unload_if_idle()
+
+        # Inactivo, pero aún dentro de la residencia mínima
+        classifier._last_used -= 120
+        assert not classifier.unload_if_idle()
+
+        classifier._loaded_at -= 600
+        assert classifier.unload_if_idle()
+        assert classifier.classifier is None
+        assert classifier.model_metrics()["resident"] is False
+
+        assert classifier.classify("Caída", "Servidor caído") == "Urgente"
+        metrics = classifier.model_metrics()
+        assert metrics["loads"] == 2
+        assert metrics["unloads"] == 1
+        assert metrics["resident"] is True
+
+    def test_disabled_by_default(self):
+        """Sin CLASSIFIER_IDLE_UNLOAD el modelo no se descarga nunca"""
+        classifier = EmailClassifier()
+        classifier.classifier = MagicMock()
+        classifier._last_used -= 10**6
+        assert not classifier.unload_if_idle()
+        assert classifier.classifier is not None
+
+    def test_pool_is_not_released_while_busy(self):
+        """Los procesos de inferencia no se detienen con peticiones en curso"""
+        pool = InferencePool(MagicMock())
+        pool._workers = [MagicMock()]
+        pool._busy = 1
+        assert not pool.release()
+        assert pool.running
+
+        pool._busy = 0
+        with patch.object(pool, "_terminate") as terminate:
+            assert pool.release()
+        terminate.assert_called_once()
+        assert not pool.running
+
+    def test_memory_helpers(self):
+        """Las utilidades de memoria funcionan (o se degradan) sin errores"""
+        assert isinstance(release_memory(), bool)
+        rss = resident_memory_mb()
+        assert rss is None or rss > 0
@@ -0,0 +1,150 @@
+"""
+Tests del registro de modelos y de la selección por latencia
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+import pytest
+
+from src.core.classifier_backends import EmbeddingZeroShotPipeline
+from src.core.email_monitor import EmailClassifier
+from src.core.model_registry import ModelRegistry, ModelSpec, load_registry
+
+
+def _registry():
+    return ModelRegistry(
+        [
+            ModelSpec("grande", "org/grande", p50_ms=900, p99_ms=2000, memory_mb=1600),
+            ModelSpec("medio", "org/medio", p50_ms=300, p99_ms=700, memory_mb=900),
+            ModelSpec(
+                "multi", "org/multi", p50_ms=400, p99_ms=800, memory_mb=1000,
+                multilingual=True,
+            ),
+            ModelSpec(
+                "mini", "org/mini", kind="embedding", p50_ms=20, p99_ms=50,
+                memory_mb=400, multilingual=True,
+            ),
+        ]
+    )
+
+
+class TestModelRegistry:
+    def test_select_largest_within_budget(self):
+        """Se elige el modelo más grande cuyo p99 cabe en el presupuesto"""
+        registry = _registry()
+        assert registry.select(5000).name == "grande"
+        assert registry.select(750).name == "medio"
+        assert registry.select(750, multilingual=True).name == "mini"
+        assert registry.select(10) is None
+
+    def test_faster_than_keeps_language_support(self):
+        """Un modelo multilingüe solo baja a otro multilingüe"""
+        registry = _registry()
+        assert registry.faster_than(registry.get("grande")).name == "multi"
+        assert registry.faster_than(registry.get("multi")).name == "mini"
+        assert registry.faster_than(registry.get("mini")) is None
+
+    def test_get_unknown_model_id(self):
+        """Un identificador de Hugging Face no registrado se usa tal cual"""
+        spec = _registry().get("org/otro-modelo")
+        assert spec.model_id == "org/otro-modelo"
+        assert spec.kind == "nli"
+
+    def test_load_registry_overrides_defaults(self):
+        """El fichero añade modelos y sustituye métricas de los existentes"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "models.json")
+            with open(path, "w") as f:
+                json.dump(
+                    [{"name": "bart-large-mnli", "model_id": "facebook/bart-large-mnli",
+                      "p50_ms": 100, "p99_ms": 200, "memory_mb": 1600}],
+                    f,
+                )
+            registry = load_registry(path)
+        assert registry.get("bart-large-mnli").p99_ms == 200
+        assert "distilbart-mnli" in registry.models
+
+        with pytest.raises(ValueError):
+            ModelRegistry([ModelSpec("x", "x", kind="rnn")])
+
+
+class TestModelSelection:
+    def test_latency_budget_picks_model(self):
+        """El presupuesto de latencia elige el modelo al crear el clasificador"""
+        classifier = EmailClassifier(
+            model="grande", registry=_registry(), latency_budget_ms=1000
+        )
+        assert classifier.model_name == "org/multi"
+
+    def test_backlog_downgrade_and_recovery(self):
+        """Con mucha cola se baja de modelo y se vuelve al vaciarse"""
+        classifier = EmailClassifier(
+            model="grande", registry=_registry(), downgrade_backlog=100
+        )
+        classifier.adjust_for_backlog(80, source="a")
+        assert classifier.model_spec.name == "grande"
+
+        classifier.adjust_for_backlog(40, source="b")
+        assert classifier.model_spec.name == "multi"
+        assert classifier.classifier is None
+
+        classifier.adjust_for_backlog(0, source="a")
+        assert classifier.model_spec.name == "multi"
+        classifier.adjust_for_backlog(10, source="b")
+        assert classifier.model_spec.name == "grande"
+
+    def test_backlog_downgrades_one_level_per_crossing(self):
+        """Mientras la cola sigue alta no se baja más de un nivel"""
+        classifier = EmailClassifier(
+            model="grande", registry=_registry(), downgrade_backlog=200
+        )
+        classifier.adjust_for_backlog(300, source="a")
+        classifier.adjust_for_backlog(5, source="b")
+        classifier.adjust_for_backlog(300, source="a")
+        assert classifier.model_spec.name == "multi"
+
+        # Entre la marca de vuelta y el umbral se mantiene el modelo rápido
+        classifier.adjust_for_backlog(100, source="a")
+        assert classifier.model_spec.name == "multi"
+        classifier.adjust_for_backlog(250, source="a")
+        assert classifier.model_spec.name == "multi"
+
+    def test_backlog_does_not_wait_for_inference(self):
+        """Ajustar la cola no espera al lock de la inferencia"""
+        classifier = EmailClassifier(
+            model="grande", registry=_registry(), downgrade_backlog=100
+        )
+        with classifier._lock:
+            thread = threading.Thread(
+                target=classifier.adjust_for_backlog, args=(500, "a")
+            )
+            thread.start()
+            thread.join(timeout=2)
+            assert not thread.is_alive()
+        assert classifier.model_spec.name == "multi"
+
+
+class TestEmbeddingZeroShotPipeline:
+    def test_returns_zero_shot_contract(self):
+        """Devuelve etiquetas ordenadas por similitud con el formato zero-shot"""
+        vectors = {
+            "Este correo es Urgente.": [1.0, 0.0],
+            "Este correo es Otros.": [0.0, 1.0],
+            "servidor caido": [0.9, 0.1],
+            "newsletter": [0.1, 0.9],
+        }
+
+        def extractor(texts, **kwargs):
+            return [[[vectors[text]]] for text in texts]
+
+        model = EmbeddingZeroShotPipeline("fake", extractor=extractor)
+        results = model(["servidor caido", "newsletter"], ["Urgente", "Otros"])
+
+        assert results[0]["labels"][0] == "Urgente"
+        assert results[1]["labels"][0] == "Otros"
+        assert sum(results[0]["scores"]) == pytest.approx(1.0)
+        single = model("newsletter", candidate_labels=["Urgente", "Otros"])
+        assert single["labels"] == ["Otros", "Urgente"]
@@ -0,0 +1,68 @@
+"""
+Tests de la copia local de modelos
+"""
+
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.core.email_monitor import EmailClassifier
+from src.core.model_store import ModelStore, is_complete, local_model_dir
+
+
+def _fake_model(path):
+    os.makedirs(path, exist_ok=True)
+    for name in ("config.json", "model.safetensors"):
+        with open(os.path.join(path, name), "w") as f:
+            f.write("{}")
+
+
+class TestModelStore:
+    def test_resolve_prefers_local_copy(self):
+        """Con copia local se usa su ruta; sin ella, el Hub o un error offline"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = ModelStore(temp_dir)
+            assert store.resolve("org/modelo") == "org/modelo"
+            assert store.load_kwargs("org/modelo") == {}
+
+            path = local_model_dir(temp_dir, "org/modelo")
+            _fake_model(path)
+            assert is_complete(path)
+            assert store.resolve("org/modelo") == path
+            assert store.load_kwargs(path)["use_safetensors"] is True
+
+            with pytest.raises(FileNotFoundError):
+                ModelStore(temp_dir, offline=True).resolve("org/otro")
+
+    @patch("huggingface_hub.snapshot_download")
+    def test_download_requires_safetensors(self, mock_download):
+        """La descarga solo pide safetensors y falla si el modelo no los tiene"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = ModelStore(temp_dir)
+            with pytest.raises(ValueError):
+                store.download("org/solo-bin")
+
+            mock_download.side_effect = lambda repo, local_dir, **kw: _fake_model(
+                local_dir
+            )
+            assert store.download("org/modelo") == store.path("org/modelo")
+            assert "*.safetensors" in mock_download.call_args.kwargs["allow_patterns"]
+
+    @patch("src.core.email_monitor.pipeline")
+    def test_classifier_loads_local_copy(self, mock_pipeline):
+        """El clasificador carga la copia local y no intenta nada sin ella en offline"""
+        mock_pipeline.return_value = MagicMock(
+            return_value={"labels": ["Urgente"], "scores": [0.9]}
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            classifier = EmailClassifier(model_dir=temp_dir, offline=True)
+            assert classifier.classify("Hola", "Qué tal") == "Otros"
+            mock_pipeline.assert_not_called()
+
+            path = local_model_dir(temp_dir, classifier.model_name)
+            _fake_model(path)
+            classifier = EmailClassifier(model_dir=temp_dir, offline=True)
+            assert classifier.classify("Hola", "Qué tal") == "Urgente"
+            assert mock_pipeline.call_args.kwargs["model"] == path
@@ -0,0 +1,100 @@
+"""
+Tests para la monitorización multicuenta
+"""
+
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from src.core.multi_account import MultiAccountMonitor, load_accounts
+
+BASE_CONFIG = {
+    "TELEGRAM_TOKEN": "test",
+    "TELEGRAM_CHAT_ID": "test",
+}
+
+
+def _write_accounts(tmp, accounts):
+    path = os.path.join(tmp, "accounts.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"accounts": accounts}, f)
+    return path
+
+
+class TestLoadAccounts:
+    def test_password_from_environment(self):
+        """La contraseña puede leerse de una variable de entorno"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = _write_accounts(
+                tmp,
+                [
+                    {
+                        "name": "trabajo",
+                        "imap_server": "imap.empresa.com",
+                        "mail": "yo@empresa.com",
+                        "pass_env": "TRABAJO_PASS",
+                        "folders": ["INBOX", "Facturas"],
+                    }
+                ],
+            )
+            with patch.dict(os.environ, {"TRABAJO_PASS": "secreto"}):
+                (account,) = load_accounts(path)
+
+        assert account.password == "secreto"
+        assert account.folders == ["INBOX", "Facturas"]
+
+    def test_missing_fields(self):
+        """Una cuenta incompleta produce un error claro"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = _write_accounts(tmp, [{"name": "x", "imap_server": "imap"}])
+            with pytest.raises(ValueError, match="mail, pass"):
+                load_accounts(path)
+
+
+class TestMultiAccountMonitor:
+    def test_monitors_share_components(self):
+        """Cada carpeta tiene su sesión pero todos comparten modelo y notificador"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = _write_accounts(
+                tmp,
+                [
+                    {"imap_server": "imap.a.com", "mail": "a@a.com", "pass": "1",
+                     "folders": ["INBOX", "Alertas"]},
+                    {"imap_server": "imap.b.com", "mail": "b@b.com", "pass": "2"},
+                ],
+            )
+            config = dict(
+                BASE_CONFIG,
+                ACCOUNTS_FILE=path,
+                STATE_FILE=os.path.join(tmp, "state.json"),
+            )
+
+            app = MultiAccountMonitor(config)
+
+        assert [(m.session.user, m.mailbox) for m in app.monitors] == [
+            ("a@a.com", "INBOX"),
+            ("a@a.com", "Alertas"),
+            ("b@b.com", "inbox"),
+        ]
+        assert all(m.classifier is app.classifier for m in app.monitors)
+        assert all(m.telegram_notifier is app.telegram_notifier for m in app.monitors)
+        assert all(m.sync.store is app.state_store for m in app.monitors)
+        assert len({m.sync.key for m in app.monitors}) == 3
+
+    def test_single_account_from_environment(self):
+        """Sin ACCOUNTS_FILE se usa la cuenta de IMAP_SERVER/MAIL/PASS"""
+        config = dict(
+            BASE_CONFIG,
+            IMAP_SERVER="imap.test",
+            MAIL="yo@test.com",
+            PASS="x",
+            IMAP_FOLDERS="inbox, Trabajo",
+            SYNC_MODE="unseen",
+        )
+
+        app = MultiAccountMonitor(config)
+
+        assert [m.mailbox for m in app.monitors] == ["inbox", "Trabajo"]
@@ -0,0 +1,107 @@
+"""
+Tests de la agrupación de ráfagas de notificaciones
+"""
+
+import asyncio
+
+import pytest
+
+from src.core.notification_coalescer import NotificationCoalescer, PendingNotification
+
+
+def _item(subject, sender="monitoring@ci.example.com", label="Otros", group="Otros"):
+    return PendingNotification(subject, sender, "...", label, group)
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, items, key, elapsed, wait):
+        self.calls.append(([item.subject for item in items], key))
+        return True
+
+
+class TestNotificationCoalescer:
+    @pytest.mark.asyncio
+    async def test_burst_becomes_digest(self):
+        """El primer aviso sale al momento y el resto se agrupa al cerrar la ventana"""
+        emit = _Recorder()
+        coalescer = NotificationCoalescer(emit, window=0.1)
+
+        for i in range(4):
+            assert await coalescer.add(_item(f"alerta {i}"), wait=False)
+        assert emit.calls == [(["alerta 0"], "monitoring@ci.example.com")]
+
+        await asyncio.sleep(0.15)
+        assert emit.calls[1] == (
+            ["alerta 1", "alerta 2", "alerta 3"],
+            "monitoring@ci.example.com",
+        )
+        assert coalescer.coalesced == 3
+        await coalescer.flush_all()
+
+    @pytest.mark.asyncio
+    async def test_max_batch_flushes_early(self):
+        """Al llegar a max_batch el resumen se envía sin esperar a la ventana"""
+        emit = _Recorder()
+        coalescer = NotificationCoalescer(emit, window=60, max_batch=2)
+
+        for i in range(3):
+            await coalescer.add(_item(f"alerta {i}"), wait=False)
+
+        assert [subjects for subjects, _ in emit.calls] == [
+            ["alerta 0"],
+            ["alerta 1", "alerta 2"],
+        ]
+        await coalescer.flush_all()
+
+    @pytest.mark.asyncio
+    async def test_group_by_label(self):
+        """Con group_by=label se agrupan remitentes distintos con la misma etiqueta"""
+        emit = _Recorder()
+        coalescer = NotificationCoalescer(emit, window=60, group_by="label")
+
+        for subject, sender, label in (
+            ("a", "uno@example.com", "Importante"),
+            ("b", "dos@example.com", "Importante"),
+            ("c", "tres@example.com", "Otros"),
+        ):
+            await coalescer.add(_item(subject, sender=sender, label=label), wait=False)
+        await coalescer.flush_all()
+
+        assert emit.calls == [
+            (["a"], "Importante"),
+            (["c"], "Otros"),
+            (["b"], "Importante"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_disabled_window_sends_everything(self):
+        """Con ventana 0 no se agrupa nada"""
+        emit = _Recorder()
+        coalescer = NotificationCoalescer(emit, window=0)
+
+        for i in range(3):
+            await coalescer.add(_item(f"alerta {i}"))
+
+        assert len(emit.calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_waiting_item_reports_digest_result(self):
+        """Con wait=True un aviso acumulado devuelve si se envió su resumen"""
+
+        async def emit(items, key, elapsed, wait):
+            assert wait
+            # El primer aviso sale; el resumen falla
+            return items[0].subject == "alerta 0"
+
+        coalescer = NotificationCoalescer(emit, window=0.05)
+        assert await coalescer.add(_item("alerta 0"))
+        assert not await coalescer.add(_item("alerta 1"))
+        await coalescer.flush_all()
+
+    def test_invalid_group_key(self):
+        """Una clave de agrupación desconocida es un error de configuración"""
+        with pytest.raises(ValueError):
+            NotificationCoalescer(_Recorder(), group_by="subject")
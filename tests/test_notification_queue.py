@@ -0,0 +1,125 @@
+"""
+Tests de la cola de notificaciones con límite de velocidad
+"""
+
+import asyncio
+import time
+
+import pytest
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from src.core.notification_queue import NotificationQueue, OutgoingMessage, TokenBucket
+
+
+def _message(text, priority=2, chat_id="123"):
+    return OutgoingMessage(chat_id=chat_id, text=text, priority=priority)
+
+
+class TestTokenBucket:
+    def test_delay_after_burst(self):
+        """Agotada la ráfaga hay que esperar 1/rate segundos"""
+        bucket = TokenBucket(rate=10, capacity=2)
+        assert bucket.delay() == 0
+        bucket.consume()
+        bucket.consume()
+        assert 0.05 < bucket.delay() <= 0.1
+
+    def test_pause_blocks_bucket(self):
+        """pause() bloquea el cubo aunque haya tokens"""
+        bucket = TokenBucket(rate=100, capacity=5)
+        bucket.pause(0.5)
+        assert bucket.delay() > 0.4
+
+
+class TestNotificationQueue:
+    @pytest.mark.asyncio
+    async def test_priority_order(self):
+        """Los mensajes urgentes salen antes que los de menor prioridad"""
+        sent = []
+        release = asyncio.Event()
+
+        async def send(message):
+            if not sent:
+                # Retener el primer envío mientras se encola el resto
+                await release.wait()
+            sent.append(message.text)
+
+        queue = NotificationQueue(send, workers=1, chat_rate=6000)
+        futures = [await queue.submit(_message("primero", 2))]
+        await asyncio.sleep(0.01)
+        for text, priority in (("otros", 2), ("urgente", 0), ("importante", 1)):
+            futures.append(await queue.submit(_message(text, priority)))
+        release.set()
+
+        assert await asyncio.wait_for(asyncio.gather(*futures), 5) == [True] * 4
+        assert sent == ["primero", "urgente", "importante", "otros"]
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_retry_after_is_respected(self):
+        """Un 429 pausa el chat y el mensaje se reenvía sin perderse"""
+        calls = []
+
+        async def send(message):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise RetryAfter(0.2)
+
+        queue = NotificationQueue(send, chat_rate=6000)
+        future = await queue.submit(_message("hola"))
+
+        assert await asyncio.wait_for(future, 5)
+        assert len(calls) == 2
+        assert calls[1] - calls[0] >= 0.19
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_network_errors_are_retried(self):
+        """Los errores de red se reintentan con espera exponencial"""
+        attempts = []
+
+        async def send(message):
+            attempts.append(message.attempts)
+            if len(attempts) < 3:
+                raise NetworkError("timeout")
+
+        queue = NotificationQueue(send, chat_rate=6000, backoff_base=0.01)
+        future = await queue.submit(_message("hola"))
+
+        assert await asyncio.wait_for(future, 5)
+        assert attempts == [1, 2, 3]
+        assert queue.retried == 2
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_permanent_errors_are_not_retried(self):
+        """Un BadRequest descarta el mensaje sin reintentar"""
+        attempts = []
+
+        async def send(message):
+            attempts.append(message.attempts)
+            raise BadRequest("can't parse entities")
+
+        queue = NotificationQueue(send, chat_rate=6000, backoff_base=0.01)
+        future = await queue.submit(_message("<b>"))
+
+        assert await asyncio.wait_for(future, 5) is False
+        assert attempts == [1]
+        assert queue.failed == 1
+        await queue.close()
+
+    @pytest.mark.asyncio
+    async def test_chat_rate_limit(self):
+        """El cubo por chat espacia los envíos al mismo chat"""
+        times = []
+
+        async def send(message):
+            times.append(time.monotonic())
+
+        # 600 mensajes/minuto = uno cada 0.1s
+        queue = NotificationQueue(send, chat_rate=600)
+        futures = [await queue.submit(_message(str(i))) for i in range(3)]
+        await asyncio.wait_for(asyncio.gather(*futures), 5)
+
+        assert times[2] - times[0] >= 0.18
+        await queue.close()
@@ -0,0 +1,93 @@
+"""
+Tests del motor de decisión de notificaciones
+"""
+
+from unittest.mock import MagicMock
+
+from src.core import EmailMessage
+from src.core.classification_cascade import Classification
+from src.core.email_monitor import DailySummaryManager
+from src.core.keyword_rules import KeywordMatcher
+from src.core.notify_decision import NotifyDecisionEngine
+
+
+def _msg(subject="Hola", body="", sender="alguien@desconocido.com"):
+    return EmailMessage(
+        subject=subject,
+        sender=sender,
+        sender_domain=sender.split("@")[1],
+        body=body,
+        message_id="<id>",
+        date="",
+    )
+
+
+def _engine():
+    return NotifyDecisionEngine(
+        KeywordMatcher.from_lists({"notify": ["fallo"]}), notify_domains=["banco.com"]
+    )
+
+
+class TestNotifyDecisionEngine:
+    def test_reason_and_rule_per_criterion(self):
+        """Cada criterio devuelve su motivo y la regla concreta"""
+        engine = _engine()
+
+        decision = engine.decide(_msg(), Classification("Urgente", tier="model"))
+        assert (decision.notify, decision.reason, decision.rule) == (
+            True,
+            "IA",
+            "label:Urgente",
+        )
+
+        decision = engine.decide(_msg(), Classification("Otros", "Trabajo"))
+        assert (decision.reason, decision.rule) == ("Grupo", "sender_group:Trabajo")
+
+        decision = engine.decide(
+            _msg(sender="avisos@banco.com"), Classification("Otros")
+        )
+        assert (decision.reason, decision.rule) == ("Dominio", "domain:banco.com")
+
+        decision = engine.decide(_msg(body="Hubo un FALLO"), Classification("Otros"))
+        assert (decision.reason, decision.rule) == ("Palabras clave", "notify:fallo")
+
+        decision = engine.decide(_msg(), Classification("Otros"))
+        assert not decision.notify
+        assert list(decision.timings) == [
+            "cascade",
+            "label",
+            "sender_group",
+            "domain",
+            "rules",
+            "keywords",
+        ]
+
+    def test_short_circuits_on_cascade_rule(self):
+        """Lo que ya decidió la cascada no vuelve a evaluarse"""
+        engine = _engine()
+        engine.keywords = MagicMock()
+        decision = engine.decide(
+            _msg(body="fallo"),
+            Classification("Otros", tier="keywords", rule="notify:fallo"),
+        )
+        assert (decision.reason, decision.rule) == ("Palabras clave", "notify:fallo")
+        assert list(decision.timings) == ["cascade"]
+        engine.keywords.search.assert_not_called()
+
+    def test_user_rules(self):
+        """Las reglas de usuario se evalúan antes que las palabras clave"""
+        engine = _engine()
+        engine.add_rule("asunto_largo", lambda msg, c: len(msg.subject) > 20)
+        decision = engine.decide(
+            _msg(subject="Un asunto muy largo con fallo"), Classification("Otros")
+        )
+        assert (decision.reason, decision.rule) == ("Regla", "asunto_largo")
+
+    def test_summary_counts_notified_by_reason(self):
+        """El resumen diario muestra los notificados por motivo"""
+        manager = DailySummaryManager(MagicMock())
+        manager.add_email({"label": "Urgente", "notified": True, "reason": "IA"})
+        manager.add_email({"label": "Otros", "notified": False})
+        text = "".join(manager._generate_summary_parts("01/01/2024"))
+        assert "Notificados (1) por motivo" in text
+        assert "• IA: 1" in text
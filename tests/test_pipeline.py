@@ -0,0 +1,196 @@
+"""
+Tests para el pipeline asíncrono por etapas
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.core.pipeline import EmailPipeline
+
+
+class TestEmailPipeline:
+    @pytest.mark.asyncio
+    async def test_processes_all_messages_and_marks_in_order(self):
+        """Todos los mensajes pasan por las etapas y on_done respeta el orden"""
+        delivered = []
+        done = []
+
+        async def deliver(msg, label):
+            # El primer mensaje tarda más: termina fuera de orden
+            await asyncio.sleep(0.05 if msg == "m1" else 0)
+            delivered.append((msg, label))
+
+        pipeline = EmailPipeline(
+            fetch=lambda: [(1, "r1"), (2, "r2"), (3, "r3")],
+            parse=lambda raw: raw.replace("r", "m"),
+            classify=lambda msg: msg.upper(),
+            deliver=deliver,
+            deliver_workers=3,
+            on_done=done.append,
+        )
+
+        stats = await pipeline.run()
+
+        assert sorted(delivered) == [("m1", "M1"), ("m2", "M2"), ("m3", "M3")]
+        assert delivered[-1] == ("m1", "M1")
+        assert done == [1, 2, 3]
+        assert stats.delivered == 3
+
+    @pytest.mark.asyncio
+    async def test_stages_overlap(self):
+        """La descarga continúa mientras se clasifica el mensaje anterior"""
+        events = []
+        lock = threading.Lock()
+
+        def fetch():
+            for i in range(3):
+                with lock:
+                    events.append(f"fetch{i}")
+                time.sleep(0.02)
+                yield i, i
+
+        def classify(msg):
+            with lock:
+                events.append(f"classify{msg}")
+            time.sleep(0.02)
+            return "Otros"
+
+        async def deliver(msg, label):
+            pass
+
+        await EmailPipeline(
+            fetch=fetch, parse=lambda raw: raw, classify=classify, deliver=deliver
+        ).run()
+
+        assert events.index("classify0") < events.index("fetch2")
+
+    @pytest.mark.asyncio
+    async def test_failures_are_isolated(self):
+        """Un fallo en una etapa descarta solo ese mensaje y no lo da por hecho"""
+        delivered = []
+        done = []
+        failed = []
+
+        def parse(raw):
+            if raw == "malo":
+                raise ValueError("mensaje corrupto")
+            return raw
+
+        async def deliver(msg, label):
+            delivered.append(msg)
+
+        pipeline = EmailPipeline(
+            fetch=lambda: [(1, "bueno"), (2, "malo"), (3, "otro")],
+            parse=parse,
+            classify=lambda msg: "Otros",
+            deliver=deliver,
+            on_done=done.append,
+            on_failed=failed.append,
+        )
+        stats = await pipeline.run()
+
+        assert delivered == ["bueno", "otro"]
+        assert done == [1, 3]
+        assert failed == [2]
+        assert stats.failed == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_stage_stops_marks_without_on_failed(self):
+        """Si falla la clasificación o la entrega, on_done no pasa de ese UID"""
+
+        def classify_batch(msgs):
+            if "m2" in msgs:
+                raise RuntimeError("modelo caído")
+            return ["Otros"] * len(msgs)
+
+        async def deliver(msg, label):
+            if msg == "m4":
+                raise ConnectionError("Telegram no responde")
+
+        for kwargs, expected in (
+            ({"classify": lambda msg: "Otros", "deliver": deliver}, [1, 2, 3]),
+            (
+                {
+                    "classify": None,
+                    "classify_batch": classify_batch,
+                    "classify_batch_size": 1,
+                    "deliver": lambda msg, label: asyncio.sleep(0),
+                },
+                [1],
+            ),
+        ):
+            done = []
+            pipeline = EmailPipeline(
+                fetch=lambda: [(i, f"m{i}") for i in range(1, 6)],
+                parse=lambda raw: raw,
+                on_done=done.append,
+                **kwargs,
+            )
+            stats = await pipeline.run()
+            assert done == expected
+            assert stats.failed == 1
+
+    @pytest.mark.asyncio
+    async def test_fetch_error_is_raised_after_draining(self):
+        """Un error de descarga se propaga tras procesar lo ya descargado"""
+        delivered = []
+
+        def fetch():
+            yield 1, "m1"
+            raise ConnectionError("socket cerrado")
+
+        async def deliver(msg, label):
+            delivered.append(msg)
+
+        pipeline = EmailPipeline(
+            fetch=fetch,
+            parse=lambda raw: raw,
+            classify=lambda msg: "Otros",
+            deliver=deliver,
+        )
+
+        with pytest.raises(ConnectionError):
+            await pipeline.run()
+        assert delivered == ["m1"]
+
+    @pytest.mark.asyncio
+    async def test_classify_batch_groups_available_messages(self):
+        """Con classify_batch se clasifican juntos los mensajes ya parseados"""
+        batches = []
+        delivered = []
+        fetched = threading.Event()
+
+        def fetch():
+            for uid in range(1, 6):
+                yield uid, f"r{uid}"
+            fetched.set()
+
+        def classify_batch(msgs):
+            # Esperar a que esté todo en cola para que el lote sea completo
+            fetched.wait(1)
+            time.sleep(0.05)
+            batches.append(list(msgs))
+            return [msg.upper() for msg in msgs]
+
+        async def deliver(msg, label):
+            delivered.append((msg, label))
+
+        pipeline = EmailPipeline(
+            fetch=fetch,
+            parse=lambda raw: raw.replace("r", "m"),
+            classify=lambda msg: None,
+            classify_batch=classify_batch,
+            classify_batch_size=4,
+            deliver=deliver,
+        )
+
+        stats = await pipeline.run()
+
+        assert sorted(delivered) == [(f"m{i}", f"M{i}") for i in range(1, 6)]
+        assert sum(len(batch) for batch in batches) == 5
+        assert max(len(batch) for batch in batches) > 1
+        assert all(len(batch) <= 4 for batch in batches)
+        assert stats.classify_batches == len(batches)
@@ -0,0 +1,68 @@
+"""
+Tests del índice de grupos de remitentes
+"""
+
+import json
+import os
+import tempfile
+
+from src.core.sender_groups import SenderGroupManager, SenderIndex
+
+
+def _write(path, groups, mtime=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(groups, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestSenderIndex:
+    def test_exact_domain_and_subdomain_patterns(self):
+        """Dirección exacta antes que dominio y el subdominio más específico"""
+        index = SenderIndex.build(
+            {
+                "Jefe": ["Jefe@Empresa.com"],
+                "Trabajo": ["*@empresa.com", "*@*.empresa.com"],
+                "Soporte": ["*@*.soporte.empresa.com"],
+            }
+        )
+        assert index.lookup("jefe@empresa.com") == "Jefe"
+        assert index.lookup("ana@empresa.com") == "Trabajo"
+        assert index.lookup("bot@ci.empresa.com") == "Trabajo"
+        assert index.lookup("x@eu.soporte.empresa.com") == "Soporte"
+        # El patrón de subdominios no incluye el propio dominio
+        assert index.lookup("x@soporte.empresa.com") == "Trabajo"
+        assert index.lookup("x@otraempresa.com") is None
+        assert index.lookup("sin-arroba") is None
+
+    def test_first_group_wins_on_duplicates(self):
+        """Un remitente repetido pertenece al primer grupo, como antes"""
+        index = SenderIndex.build({"A": ["x@y.com"], "B": ["x@y.com"]})
+        assert index.lookup("x@y.com") == "A"
+
+    def test_large_index(self):
+        """Decenas de miles de remitentes se indexan sin recorrer listas"""
+        groups = {f"G{g}": [f"u{i}@d{g}.com" for i in range(10000)] for g in range(5)}
+        index = SenderIndex.build(groups)
+        assert len(index.addresses) == 50000
+        assert index.lookup("u9999@d4.com") == "G4"
+
+
+class TestSenderGroupManagerReload:
+    def test_reloads_when_file_changes(self):
+        """Los cambios del fichero se aplican sin reiniciar"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "sender_groups.json")
+            _write(path, {"Trabajo": ["a@empresa.com"]}, mtime=1000)
+            manager = SenderGroupManager(path, reload_interval=0)
+            assert manager.get_label_for_sender("b@empresa.com") == "Otros"
+
+            _write(path, {"Trabajo": ["*@empresa.com"]}, mtime=2000)
+            assert manager.get_label_for_sender("b@empresa.com") == "Trabajo"
+
+            # Un fichero inválido no borra los grupos cargados
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("{no es json")
+            os.utime(path, (3000, 3000))
+            assert manager.get_label_for_sender("b@empresa.com") == "Trabajo"
+            assert manager.get_groups() == {"Trabajo": ["*@empresa.com"]}
@@ -0,0 +1,122 @@
+"""
+Tests del almacén persistente del resumen diario
+"""
+
+import time
+from unittest.mock import MagicMock
+
+from telegram.error import BadRequest
+
+from src.core.email_monitor import DailySummaryManager
+from src.core.summary_store import SummaryStore
+
+
+def _record(i, label="Otros", notified=False):
+    return {
+        "sender": f"user{i}@empresa.com",
+        "subject": f"Asunto {i}",
+        "label": label,
+        "sender_group": "Trabajo",
+        "notified": notified,
+        "reason": "IA" if notified else "Sin coincidencias",
+    }
+
+
+class TestSummaryStore:
+    def test_batched_writes_survive_restart(self, tmp_path):
+        """Los registros se escriben por bloques y otro proceso los lee"""
+        path = str(tmp_path / "summary.db")
+        store = SummaryStore(path, batch_size=3, flush_interval=3600)
+        for i in range(4):
+            store.add(_record(i))
+
+        # Solo el primer bloque está en disco
+        reader = SummaryStore(path)
+        assert reader.counts(reader.last_id()).total == 3
+
+        store.close()
+        assert reader.counts(reader.last_id()).total == 4
+        assert [r["subject"] for r in reader.iter_records(4, chunk=2)] == [
+            f"Asunto {i}" for i in range(4)
+        ]
+        reader.close()
+
+    def test_pending_rows_flushed_on_timer(self, tmp_path):
+        """Un solo registro llega a disco tras flush_interval sin más llamadas"""
+        path = str(tmp_path / "summary.db")
+        store = SummaryStore(path, batch_size=50, flush_interval=0.2)
+        store.add(_record(1))
+
+        reader = SummaryStore(path)
+        deadline = time.monotonic() + 5
+        while reader.last_id() is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert reader.counts(reader.last_id()).total == 1
+        store.close()
+        reader.close()
+
+    def test_counts_and_clear(self):
+        """Los recuentos se hacen en SQLite y el envío borra lo incluido"""
+        store = SummaryStore()
+        store.add(_record(1, "Urgente", notified=True))
+        store.add(_record(2))
+        store.add(_record(3, "Urgente"))
+        up_to = store.last_id()
+
+        counts = store.counts(up_to)
+        assert counts.total == 3
+        assert counts.by_label == {"Urgente": 2, "Otros": 1}
+        assert counts.by_reason == {"IA": 1}
+
+        store.add(_record(4))
+        store.clear(up_to)
+        assert store.counts(store.last_id()).total == 1
+
+
+class TestDailySummaryManagerStore:
+    def test_summary_sent_from_store(self, tmp_path):
+        """El resumen se genera desde el fichero y se borra solo si se envía"""
+        path = str(tmp_path / "summary.db")
+        monitor_side = DailySummaryManager(MagicMock(), store=SummaryStore(path))
+        monitor_side.add_email(_record(1, "Urgente", notified=True))
+        monitor_side.close()
+
+        notifier = MagicMock()
+        notifier.run_sync.return_value = False
+        cli_side = DailySummaryManager(notifier, store=SummaryStore(path))
+        cli_side._send_daily_summary()
+        text = notifier.send_daily_summary.call_args.args[0]
+        assert "Total de correos procesados:</b> 1" in text
+        assert "user1@empresa.com" in text
+        assert cli_side.store.last_id() is not None
+
+        notifier.run_sync.return_value = True
+        cli_side._send_daily_summary()
+        assert cli_side.store.last_id() is None
+        cli_side.close()
+
+    def test_long_summary_split_and_escaped(self):
+        """El resumen se parte en mensajes válidos y escapa el HTML"""
+        manager = DailySummaryManager(MagicMock())
+        for i in range(150):
+            manager.add_email(
+                {"sender": f"<user{i}@empresa.com>", "subject": f"a < b {i}"}
+            )
+
+        parts = list(manager._generate_summary_parts("01/01/2024"))
+        assert len(parts) > 1
+        assert all(len(part) <= DailySummaryManager.MAX_MESSAGE_LENGTH for part in parts)
+        text = "".join(parts)
+        assert "&lt;user0@empresa.com&gt;" in text and "<user" not in text
+        assert "a &lt; b 99" in text and "a &lt; b 100" not in text
+        assert "y 50 correos más" in text
+
+    def test_rejected_summary_is_discarded(self):
+        """Un rechazo definitivo de Telegram no bloquea los resúmenes siguientes"""
+        notifier = MagicMock()
+        notifier.run_sync.side_effect = BadRequest("Message is too long")
+        manager = DailySummaryManager(notifier)
+        manager.add_email(_record(1))
+
+        manager._send_daily_summary()
+        assert manager.store.last_id() is None
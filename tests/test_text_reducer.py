@@ -0,0 +1,65 @@
+"""
+Tests de la reducción del texto antes de la inferencia
+"""
+
+from unittest.mock import MagicMock, patch
+
+from src.core.email_monitor import EmailClassifier
+from src.core.text_reducer import TextReducer, count_tokens, strip_quoted
+
+
+class TestTextReducer:
+    def test_strips_quoted_reply(self):
+        """Se quitan las líneas citadas y la conversación anterior"""
+        body = (
+            "Confirmo la reunión del lunes.\n"
+            "> ¿Podemos vernos el lunes?\n"
+            "\n"
+            "El vie, 3 may 2024 a las 10:00, Ana <ana@example.com> escribió:\n"
+            "Hola, ¿podemos vernos el lunes?"
+        )
+        assert strip_quoted(body) == "Confirmo la reunión del lunes.\n"
+
+    def test_strips_signature_and_footers(self):
+        """La firma y los pies de baja o avisos legales no llegan al modelo"""
+        body = (
+            "El servidor de producción no responde.\n\n"
+            "Para darte de baja de estas alertas pulsa aquí.\n\n"
+            "Este mensaje es confidencial.\n"
+            "--\n"
+            "Juan Pérez\nAdministrador de sistemas"
+        )
+        subject, reduced = TextReducer(max_tokens=0).reduce("Caída", body)
+        assert subject == "Caída"
+        assert reduced == "El servidor de producción no responde."
+
+    def test_budget_keeps_subject_and_first_paragraphs(self):
+        """Con presupuesto se conservan el asunto y los primeros párrafos"""
+        body = "uno dos tres\n\ncuatro cinco seis siete\n\nocho nueve diez"
+        subject, reduced = TextReducer(max_tokens=9).reduce("Asunto largo", body)
+        assert subject == "Asunto largo"
+        assert reduced == "uno dos tres\n\ncuatro cinco seis siete"
+        assert count_tokens(subject) + count_tokens(reduced) <= 9
+
+        _, reduced = TextReducer(max_tokens=7).reduce("Asunto largo", body)
+        assert reduced == "uno dos tres\n\ncuatro cinco"
+
+    @patch("src.core.email_monitor.pipeline")
+    def test_classifier_receives_reduced_text(self, mock_pipeline):
+        """El modelo recibe el texto recortado y se registra la latencia"""
+        mock_pipeline.return_value = MagicMock(
+            return_value=[{"labels": ["Urgente"], "scores": [0.9]}]
+        )
+        classifier = EmailClassifier(token_budget=5)
+        assert classifier.inference_report() is None
+
+        label = classifier.classify(
+            "Caída", "El servidor no responde desde las 10\n> mensaje anterior"
+        )
+
+        assert label == "Urgente"
+        texts = classifier.classifier.call_args.args[0]
+        assert texts == ["Caída\nEl servidor no responde"]
+        report = classifier.inference_report()
+        assert "ms/correo" in report
+        assert "11 → 5 tokens" in report
@@ -0,0 +1,120 @@
+"""
+Tests de las reglas de usuario compiladas en tabla de decisión
+"""
+
+import json
+
+import pytest
+
+from src.core import EmailMessage
+from src.core.classification_cascade import Classification
+from src.core.keyword_rules import KeywordMatcher
+from src.core.notify_decision import NotifyDecisionEngine
+from src.core.user_rules import Rule, RuleTable, benchmark_rules, load_rules
+
+
+def _msg(subject="Hola", body="", sender="alguien@desconocido.com", headers=(), size=0):
+    return EmailMessage(
+        subject=subject,
+        sender=sender,
+        sender_domain=sender.split("@")[1],
+        body=body,
+        message_id="<id>",
+        date="",
+        headers=frozenset(headers),
+        size=size,
+    )
+
+
+def _table(*entries):
+    return RuleTable(Rule.from_dict(entry, i) for i, entry in enumerate(entries, 1))
+
+
+class TestRuleTable:
+    def test_conditions_and_first_match_wins(self):
+        """Todas las condiciones deben cumplirse y gana la primera regla"""
+        table = _table(
+            {"name": "jefe", "sender": "Jefe@Empresa.com", "action": "notify"},
+            {"name": "facturas", "domain": "proveedor.com", "subject": "factura|invoice"},
+            {"name": "boletines", "header": "List-Unsubscribe", "action": "suppress"},
+            {"name": "grandes", "min_size": 1000, "label": "Otros", "action": "suppress"},
+        )
+
+        assert table.match(_msg(sender="jefe@empresa.com")).name == "jefe"
+        assert (
+            table.match(_msg("Nueva FACTURA", sender="a@proveedor.com")).name
+            == "facturas"
+        )
+        assert table.match(_msg("Hola", sender="a@proveedor.com")) is None
+        assert (
+            table.match(_msg(headers={"list-unsubscribe"})).name == "boletines"
+        )
+        assert table.match(_msg(size=5000)).name == "grandes"
+        assert table.match(_msg(size=5000), "Urgente") is None
+
+    def test_combined_regex_matches_each_rule(self):
+        """La expresión combinada no pierde reglas que se solapan"""
+        table = _table(
+            {"name": "a", "subject": "pago", "label": "Urgente"},
+            {"name": "b", "subject": "pago pendiente"},
+            {"name": "c", "body": r"(\d+)\s+\1"},
+        )
+        assert table.match(_msg("Pago pendiente")).name == "b"
+        assert table.match(_msg(body="42 42")).name == "c"
+        assert table.match(_msg(body="42 43")) is None
+
+    def test_invalid_rules(self):
+        """Los errores del fichero se detectan al cargar"""
+        with pytest.raises(ValueError):
+            Rule.from_dict({"name": "x", "action": "route"})
+        with pytest.raises(ValueError):
+            Rule.from_dict({"name": "x", "subjet": "typo"})
+        with pytest.raises(ValueError):
+            Rule.from_dict({"name": "x", "subject": "("})
+
+    def test_load_and_benchmark(self, tmp_path):
+        """El fichero se compila y se mide contra un corpus"""
+        path = tmp_path / "rules.json"
+        path.write_text(
+            json.dumps(
+                [{"name": f"r{i}", "domain": f"d{i}.com"} for i in range(300)]
+                + [{"name": "alertas", "subject": "alerta", "priority": 0}]
+            )
+        )
+        assert len(load_rules(str(tmp_path / "no_existe.json"))) == 0
+
+        messages = [_msg(sender="x@d7.com"), _msg("Alerta"), _msg("Nada")]
+        result = benchmark_rules(str(path), messages, repeat=3)
+        assert result.rules == 301
+        assert result.matches == {"r7": 1, "alertas": 1, None: 1}
+        assert result.p50_us < 1000
+
+
+class TestRuleTableDecision:
+    def test_table_overrides_other_criteria(self):
+        """Una regla puede suprimir, cambiar el grupo o la prioridad"""
+        engine = NotifyDecisionEngine(
+            KeywordMatcher.from_lists({"notify": ["fallo"]}),
+            table=_table(
+                {"name": "ruido", "sender": "bot@ci.com", "action": "suppress"},
+                {"name": "proveedor", "domain": "p.com", "action": "route",
+                 "group": "Facturas", "priority": 1},
+            ),
+        )
+
+        decision = engine.decide(
+            _msg("Fallo", sender="bot@ci.com"), Classification("Urgente", tier="model")
+        )
+        assert (decision.notify, decision.reason, decision.rule) == (
+            False,
+            "Suprimido",
+            "ruido",
+        )
+
+        decision = engine.decide(_msg(sender="a@p.com"), Classification("Otros"))
+        assert decision.notify
+        assert (decision.sender_group, decision.priority) == ("Facturas", 1)
+        assert "table" in decision.timings
+
+        decision = engine.decide(_msg("Fallo"), Classification("Otros"))
+        assert (decision.reason, decision.sender_group) == ("Palabras clave", None)